@@ -0,0 +1,216 @@
+import csv
+import io
+import json
+import re
+import urllib.parse
+
+from batch import canonical_ndcs, dedupe, resolve_concurrently
+from circuit_breaker import CircuitOpenError
+from instrumentation import record_error
+from lookup_config import NAME_INDEX_PATH
+from ndc_expansion import EDGE_FIELDS, expand_rxcuis
+from name_search import suggest_response
+from ndc_normalize import InvalidNDCError
+from rxnorm_graph import ROLLUP_FIELDS, RxNormGraph, rollup_codes
+from rxnav_client import HISTORY, NotFoundError, get_rxcui_info, ndc_to_rxcui, rxcui_to_ndc
+
+# Bulk endpoint limits (change these if needed)
+MAX_BULK_CODES = 50000  # Codes accepted in one POST /api/bulk body
+BULK_WORKERS = 16  # Lookups in flight per bulk request
+
+
+def _bulk_ndc(ndc):
+    rxcui, _ = ndc_to_rxcui(ndc)
+    return {"rxcui": rxcui}
+
+
+def _bulk_rxcui(rxcui):
+    ndcs, _ = rxcui_to_ndc(rxcui)
+    return {"ndcs": ndcs}
+
+
+# Codes listed under key in a parsed request body. Raises TypeError unless the
+# body is a JSON object and the codes a JSON array, so a string such as
+# {"ndcs": "00002322730"} is refused instead of read one character at a time.
+def _code_list(request, key):
+    if not isinstance(request, dict):
+        raise TypeError("request body must be a JSON object")
+    codes = request.get(key, [])
+    if not isinstance(codes, list):
+        raise TypeError(f"{key} must be a JSON array")
+    return [str(code).strip() for code in codes]
+
+
+# JSON endpoints shared by the converter servers. Mix into a request handler
+# and route paths starting with /api/ to do_GET_api / do_POST_api:
+#   GET  /api/ndc/{ndc}            RXCUI and properties for an NDC
+#   GET  /api/rxcui/{rxcui}/ndcs   NDCs for an RXCUI
+#   GET  /api/suggest?q=...&k=...  top k drug names (RXCUI, name, TTY) for a typed
+#                                  prefix or misspelling, from the local index
+#   POST /api/bulk                 {"ndcs": [...], "rxcuis": [...]}; streams one
+#                                  NDJSON line per unique code as it resolves
+#   POST /api/expand               {"rxcuis": [...], "history": 0|1|2}; streams the
+#                                  RXCUI-NDC edge list as CSV
+#   POST /api/rollup               {"ndcs": [...], "rxcuis": [...]}; streams the
+#                                  product/ingredient/brand rollup table as CSV
+class JsonApiMixin:
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Run a lookup for an API response and map failures to HTTP statuses
+    def send_lookup(self, lookup):
+        try:
+            result = lookup()
+        except InvalidNDCError as e:
+            record_error(e)
+            return self.send_json(400, {"error": str(e)})
+        except NotFoundError as e:
+            record_error(e)
+            return self.send_json(404, {"error": str(e)})
+        except CircuitOpenError as e:
+            record_error(e)
+            return self.send_json(503, {"error": str(e)})
+        except Exception as e:
+            record_error(e)
+            return self.send_json(502, {"error": str(e)})
+        self.send_json(200, result)
+
+    def do_GET_api(self):
+        path = urllib.parse.unquote(urllib.parse.urlparse(self.path).path)
+
+        match = re.fullmatch(r"/api/ndc/([^/]+)", path)
+        if match:
+            ndc = match.group(1)
+
+            def lookup():
+                rxcui, _ = ndc_to_rxcui(ndc)
+                properties, _ = get_rxcui_info(rxcui)
+                return {"ndc": ndc, "rxcui": rxcui, "properties": properties}
+
+            return self.send_lookup(lookup)
+
+        match = re.fullmatch(r"/api/rxcui/([^/]+)/ndcs", path)
+        if match:
+            rxcui = match.group(1)
+
+            def lookup():
+                ndcs, _ = rxcui_to_ndc(rxcui)
+                return {"rxcui": rxcui, "ndcs": ndcs}
+
+            return self.send_lookup(lookup)
+
+        if path == "/api/suggest":
+            return self.send_json(*suggest_response(urllib.parse.urlparse(self.path).query, NAME_INDEX_PATH))
+
+        self.send_json(404, {"error": f"Unknown API path: {path}"})
+
+    def do_POST_api(self):
+        path = urllib.parse.urlparse(self.path).path
+        if path == "/api/bulk":
+            return self.do_POST_bulk()
+        if path == "/api/expand":
+            return self.do_POST_expand()
+        if path == "/api/rollup":
+            return self.do_POST_rollup()
+        self.send_json(404, {"error": f"Unknown API path: {self.path}"})
+
+    def do_POST_bulk(self):
+        content_length = int(self.headers['Content-Length'])
+        try:
+            request = json.loads(self.rfile.read(content_length))
+            ndcs = _code_list(request, "ndcs")
+            rxcuis = _code_list(request, "rxcuis")
+        except (ValueError, AttributeError, TypeError):
+            return self.send_json(400, {"error": 'Body must be JSON like {"ndcs": [...], "rxcuis": [...]}'})
+        if len(ndcs) + len(rxcuis) > MAX_BULK_CODES:
+            return self.send_json(413, {"error": f"At most {MAX_BULK_CODES} codes per request"})
+
+        self.start_stream("application/x-ndjson")
+        for key, codes, lookup in (("ndc", canonical_ndcs(ndcs), _bulk_ndc), ("rxcui", rxcuis, _bulk_rxcui)):
+            for row in resolve_concurrently(dedupe(codes, set()), lookup, key, BULK_WORKERS):
+                self.write_chunk(json.dumps(row) + "\n")
+        self.write_chunk("")
+
+    def do_POST_expand(self):
+        content_length = int(self.headers['Content-Length'])
+        try:
+            request = json.loads(self.rfile.read(content_length))
+            rxcuis = _code_list(request, "rxcuis")
+            history = int(request.get("history", HISTORY))
+        except (ValueError, AttributeError, TypeError):
+            return self.send_json(400, {"error": 'Body must be JSON like {"rxcuis": [...], "history": 2}'})
+        if history not in (0, 1, 2):
+            return self.send_json(400, {"error": "history must be 0, 1 or 2"})
+        if len(rxcuis) > MAX_BULK_CODES:
+            return self.send_json(413, {"error": f"At most {MAX_BULK_CODES} codes per request"})
+
+        # RXCUIs that fail to expand produce no edges; their errors go in
+        # trailing comment lines so the edge list itself stays plain CSV
+        self.start_stream("text/csv; charset=utf-8")
+        self.write_chunk(",".join(EDGE_FIELDS) + "\n")
+        failures = []
+        for row, edges in expand_rxcuis(rxcuis, history, BULK_WORKERS):
+            if edges:
+                out = io.StringIO()
+                csv.writer(out, lineterminator="\n").writerows(edges)
+                self.write_chunk(out.getvalue())
+            else:
+                failures.append(row)
+        for row in failures:
+            self.write_chunk(f"# {row['rxcui']} {row['status']}: {row['error']}\n")
+        self.write_chunk("")
+
+    def do_POST_rollup(self):
+        content_length = int(self.headers['Content-Length'])
+        try:
+            request = json.loads(self.rfile.read(content_length))
+            ndcs = _code_list(request, "ndcs")
+            rxcuis = _code_list(request, "rxcuis")
+        except (ValueError, AttributeError, TypeError):
+            return self.send_json(400, {"error": 'Body must be JSON like {"ndcs": [...], "rxcuis": [...]}'})
+        if len(ndcs) + len(rxcuis) > MAX_BULK_CODES:
+            return self.send_json(413, {"error": f"At most {MAX_BULK_CODES} codes per request"})
+
+        # One graph for the whole request, so shared products and ingredients
+        # are looked up once; failures go in trailing comment lines
+        self.start_stream("text/csv; charset=utf-8")
+        self.write_chunk(",".join(ROLLUP_FIELDS) + "\n")
+        graph = RxNormGraph()
+        failures = []
+        for key, codes in (("ndc", ndcs), ("rxcui", rxcuis)):
+            for row, rows in rollup_codes(codes, key, BULK_WORKERS, graph):
+                if rows:
+                    out = io.StringIO()
+                    csv.DictWriter(out, ROLLUP_FIELDS, lineterminator="\n").writerows(rows)
+                    self.write_chunk(out.getvalue())
+                else:
+                    failures.append((row[key], row))
+        for code, row in failures:
+            self.write_chunk(f"# {code} {row['status']}: {row['error']}\n")
+        self.write_chunk("")
+
+    # Stream with chunked encoding when the connection speaks HTTP/1.1,
+    # otherwise write plain lines and close the connection at the end
+    def start_stream(self, content_type):
+        self.chunked = self.protocol_version == "HTTP/1.1" and self.request_version == "HTTP/1.1"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        if self.chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.close_connection = True
+        self.end_headers()
+
+    # Write one chunk of a streamed response; an empty chunk ends the response
+    def write_chunk(self, text):
+        data = text.encode('utf-8')
+        if self.chunked:
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        else:
+            self.wfile.write(data)
+        self.wfile.flush()
@@ -0,0 +1,234 @@
+import asyncio
+import collections
+import random
+import time
+
+import aiohttp
+
+from circuit_breaker import CircuitBreaker
+from lookup_cache import NEGATIVE_TTL, STALE_SERVED
+from ndc_normalize import normalize_ndc
+from rxnav_client import (BACKOFF_FACTOR, BASE_URL, CONNECT_TIMEOUT, POOL_SIZE, READ_TIMEOUT, RETRIES,
+                          RETRY_STATUSES, NotFoundError, quote, record_call)
+from single_flight import AsyncSingleFlight
+
+# Resolver defaults (change these if needed)
+CONCURRENCY = 16  # Lookups in flight at once
+RATE_LIMIT = 20  # Requests per second; RxNav allows 20 per second per IP address
+
+_MISSING = object()
+
+
+# A retryable status (5xx, 429) that was still returned after the last retry
+class RetryableStatusError(Exception):
+    pass
+
+
+# Token bucket that lets at most `rate` requests per second through, with
+# bursts of up to `capacity` requests
+class TokenBucket:
+    def __init__(self, rate=RATE_LIMIT, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# Async counterpart of rxnav_client.RxNavClient. Lookups share one aiohttp
+# connection pool and return the same (value, url) shapes. An optional cache
+# (lookup_cache.TTLCache or disk_cache.SQLiteCache) is consulted first and
+# uses the same keys as CachedRxNavClient, so sync and async code can share it.
+# Concurrent lookups of the same code share one upstream fetch.
+class AsyncRxNavClient:
+    def __init__(self, base_url=BASE_URL, pool_size=POOL_SIZE, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, retries=RETRIES, backoff_factor=BACKOFF_FACTOR,
+                 rate_limit=RATE_LIMIT, cache=None, negative_ttl=NEGATIVE_TTL, breaker=None):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(connect=connect_timeout, sock_read=read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.rate_limiter = TokenBucket(rate_limit) if rate_limit else None
+        self.cache = cache
+        self.negative_ttl = negative_ttl
+        self.single_flight = AsyncSingleFlight()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _session(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    # GET url and return the decoded JSON, retrying failed requests with
+    # backoff. The circuit breaker sees the outcome after the retries.
+    async def get_json(self, url):
+        self.breaker.check()
+        try:
+            data = await self._get_json(url)
+        except (aiohttp.ClientError, asyncio.TimeoutError, RetryableStatusError):
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            self.breaker.record_success()
+            raise
+        except BaseException:
+            # Cancelled (client went away, resolve() cleaning up): no outcome to record
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return data
+
+    async def _get_json(self, url):
+        for attempt in range(self.retries + 1):
+            if self.rate_limiter:
+                await self.rate_limiter.acquire()
+            started = time.perf_counter()
+            status = "error"
+            try:
+                async with self._session().get(url) as response:
+                    status = response.status
+                    if response.status == 200:
+                        return await response.json(content_type=None)
+                    if response.status in RETRY_STATUSES and attempt == self.retries:
+                        raise RetryableStatusError(f"API request failed with status code {response.status}")
+                    if response.status not in RETRY_STATUSES:
+                        raise Exception(f"API request failed with status code {response.status}")
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+            finally:
+                record_call(url, started, status)
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt) * random.uniform(0.5, 1))
+
+    async def _lookup(self, kind, code, fetch):
+        key = (kind, str(code).strip())
+        if self.cache is not None:
+            cached = self.cache.get(key, _MISSING)
+            if cached is not _MISSING:
+                if isinstance(cached, NotFoundError):
+                    raise NotFoundError(*cached.args)
+                return cached
+
+        try:
+            result = await self.single_flight.do(key, lambda: fetch(code))
+        except NotFoundError as e:
+            if self.cache is not None:
+                self.cache.set(key, NotFoundError(*e.args), ttl=self.negative_ttl)
+            raise
+        except Exception:
+            # RxNav failed or the breaker is open: answer from an expired entry if one is kept
+            stale = self.cache.get_stale(key, _MISSING) if self.cache is not None else _MISSING
+            if stale is _MISSING:
+                raise
+            STALE_SERVED.inc(kind=kind)
+            if isinstance(stale, NotFoundError):
+                raise NotFoundError(*stale.args)
+            return stale
+        if self.cache is not None:
+            self.cache.set(key, result)
+        return result
+
+    async def _ndc_to_rxcui(self, ndc):
+        url = f"{self.base_url}/ndcstatus.json?ndc={ndc}"
+        data = await self.get_json(url)
+
+        if 'ndcStatus' in data and 'rxcui' in data['ndcStatus']:
+            return data['ndcStatus']['rxcui'], url
+        else:
+            raise NotFoundError("RXCUI not found for the given NDC")
+
+    async def _get_rxcui_info(self, rxcui):
+        url = f"{self.base_url}/rxcui/{quote(rxcui)}/properties.json"
+        data = await self.get_json(url)
+
+        if 'properties' in data:
+            return data['properties'], url
+        else:
+            raise NotFoundError("Properties not found for the given RXCUI")
+
+    async def _rxcui_to_ndc(self, rxcui):
+        url = f"{self.base_url}/rxcui/{quote(rxcui)}/ndcs.json"
+        data = await self.get_json(url)
+
+        if 'ndcGroup' in data and 'ndcList' in data['ndcGroup'] and 'ndc' in data['ndcGroup']['ndcList']:
+            return data['ndcGroup']['ndcList']['ndc'], url
+        else:
+            raise NotFoundError("NDC not found for the given RXCUI")
+
+    async def ndc_to_rxcui(self, ndc):
+        return await self._lookup("ndcstatus", normalize_ndc(ndc), self._ndc_to_rxcui)
+
+    async def get_rxcui_info(self, rxcui):
+        return await self._lookup("properties", rxcui, self._get_rxcui_info)
+
+    async def rxcui_to_ndc(self, rxcui):
+        return await self._lookup("ndcs", rxcui, self._rxcui_to_ndc)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+# Run one lookup and capture its outcome as (code, result, error)
+async def _resolve_one(lookup, code):
+    try:
+        return code, await lookup(code), None
+    except Exception as e:
+        return code, None, e
+
+
+# Resolve codes with at most `concurrency` lookups in flight and yield
+# (code, result, error) tuples. lookup is an async function such as
+# AsyncRxNavClient.ndc_to_rxcui. With ordered=True results come back in input
+# order; otherwise each is yielded as soon as it finishes. Codes are read from
+# the iterable lazily, a bounded window at a time.
+async def resolve(codes, lookup, concurrency=CONCURRENCY, ordered=False):
+    codes = iter(codes)
+    pending = collections.deque() if ordered else set()
+
+    def fill():
+        while len(pending) < concurrency:
+            code = next(codes, _MISSING)
+            if code is _MISSING:
+                return
+            task = asyncio.ensure_future(_resolve_one(lookup, code))
+            if ordered:
+                pending.append(task)
+            else:
+                pending.add(task)
+
+    try:
+        fill()
+        while pending:
+            if ordered:
+                yield await pending.popleft()
+            else:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.discard(task)
+                    yield task.result()
+            fill()
+    finally:
+        for task in pending:
+            task.cancel()
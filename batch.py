@@ -0,0 +1,196 @@
+import csv
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ndc_normalize import InvalidNDCError, normalize_ndc
+from rxnav_client import NotFoundError
+
+# Batch defaults (change these if needed)
+WORKERS = 8  # Lookups in flight at once
+
+
+# Stream codes from a CSV, JSONL or plain text file ("-" reads stdin).
+# column picks the CSV column / JSON key holding the code (default: the first one).
+def read_codes(path, column=None):
+    f = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    try:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield str(record[column] if column else next(iter(record.values())))
+        elif path.endswith(".csv") or column:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            index = header.index(column) if column and header else 0
+            # Without a named column, a first row that already looks like a code is data, not a header
+            if not column and header and header[0].strip().replace("-", "").isdigit():
+                yield header[0].strip()
+            for row in reader:
+                if len(row) > index and row[index].strip():
+                    yield row[index].strip()
+        else:
+            for line in f:
+                if line.strip():
+                    yield line.strip()
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+# Canonicalize NDCs so different spellings of one NDC are looked up once.
+# Malformed codes pass through unchanged and come out with status "invalid".
+def canonical_ndcs(codes):
+    for code in codes:
+        try:
+            yield normalize_ndc(code)
+        except InvalidNDCError:
+            yield code
+
+
+# Drop blank codes and codes already seen (including ones finished in an earlier run)
+def dedupe(codes, seen):
+    for code in codes:
+        if code and code not in seen:
+            seen.add(code)
+            yield code
+
+
+# Run lookup on one code and turn the outcome into an output row
+def _resolve_one(lookup, key, code):
+    try:
+        row = {key: code, "status": "ok", **lookup(code), "error": ""}
+    except InvalidNDCError as e:
+        row = {key: code, "status": "invalid", "error": str(e)}
+    except NotFoundError as e:
+        row = {key: code, "status": "not_found", "error": str(e)}
+    except Exception as e:
+        row = {key: code, "status": "error", "error": str(e)}
+    return row
+
+
+# Resolve codes with at most `workers` lookups in flight, yielding rows as they
+# finish. Only a bounded window of codes is read ahead of the results.
+def resolve_concurrently(codes, lookup, key, workers=WORKERS):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for code in codes:
+            pending.add(pool.submit(_resolve_one, lookup, key, code))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+# Codes already finished in an existing output file. Rows with status "error"
+# do not count, so failed lookups are retried; they are removed from the file
+# (rewritten through a temporary file) so each retried code ends up with only
+# its new row. A line cut off by a crash is truncated away so the resumed run
+# can append cleanly.
+def completed_codes(path, fmt, key):
+    if not os.path.exists(path):
+        return set()
+
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "jsonl":
+            rows = [json.loads(line) for line in f if line.strip()]
+            fields = None
+        else:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+            fields = reader.fieldnames
+    kept = [row for row in rows if row["status"] != "error"]
+
+    if len(kept) < len(rows):
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", newline="", encoding="utf-8") as f:
+            if fmt == "jsonl":
+                for row in kept:
+                    f.write(json.dumps(row) + "\n")
+            else:
+                writer = csv.DictWriter(f, fieldnames=fields, lineterminator="\n")
+                writer.writeheader()
+                writer.writerows(kept)
+        os.replace(temp_path, path)
+    return {row[key] for row in kept}
+
+
+# Write rows to output as CSV or JSONL, flushing each line so a crash loses nothing finished
+class RowWriter:
+    def __init__(self, path, fmt, fields, append=False):
+        self.fmt = fmt
+        self.fields = fields
+        exists = append and path != "-" and os.path.exists(path) and os.path.getsize(path) > 0
+        if path == "-":
+            self.f = sys.stdout
+        else:
+            self.f = open(path, "a" if append else "w", newline="", encoding="utf-8", buffering=1)
+        if fmt == "csv":
+            self.writer = csv.DictWriter(self.f, fieldnames=fields, extrasaction="ignore", lineterminator="\n")
+            if not exists:
+                self.writer.writeheader()
+
+    def write(self, row):
+        if self.fmt == "jsonl":
+            self.f.write(json.dumps({field: row.get(field, "") for field in self.fields}) + "\n")
+        else:
+            self.writer.writerow({field: _csv_value(row.get(field, "")) for field in self.fields})
+        if self.f is sys.stdout:
+            self.f.flush()
+
+    def close(self):
+        if self.f is not sys.stdout:
+            self.f.close()
+
+
+def _csv_value(value):
+    return " ".join(value) if isinstance(value, list) else value
+
+
+# Stream codes from input_path through lookup and write one row per unique code
+# (after canonicalize, e.g. canonical_ndcs, if given).
+# With resume=True, codes already present in output_path are skipped and new
+# rows are appended. Returns counts of rows written by status.
+def run_batch(lookup, key, fields, input_path, output_path="-", fmt=None, workers=WORKERS,
+              resume=False, column=None, canonicalize=None):
+    if fmt is None:
+        fmt = "jsonl" if output_path.endswith(".jsonl") else "csv"
+    if resume and output_path == "-":
+        raise Exception("--resume needs an output file")
+
+    seen = completed_codes(output_path, fmt, key) if resume else set()
+    counts = {"skipped": len(seen)}
+    writer = RowWriter(output_path, fmt, [key, "status"] + fields + ["error"], append=resume)
+    try:
+        codes = read_codes(input_path, column)
+        if canonicalize:
+            codes = canonicalize(codes)
+        codes = dedupe(codes, seen)
+        for row in resolve_concurrently(codes, lookup, key, workers):
+            writer.write(row)
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+    finally:
+        writer.close()
+    return counts
+
+
+# Command-line options shared by the batch modes of the CLIs
+def add_batch_arguments(parser):
+    parser.add_argument("--input", help="file of codes (CSV, JSONL or one per line; '-' for stdin)")
+    parser.add_argument("--output", default="-", help="CSV or JSONL file to write (default: stdout)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="output format (default: from --output)")
+    parser.add_argument("--column", help="CSV column or JSON key holding the codes")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="lookups in flight at once")
+    parser.add_argument("--resume", action="store_true", help="skip codes already in --output and append")
+    parser.add_argument("--index", help="answer lookups from a local RxNorm index instead of RxNav")
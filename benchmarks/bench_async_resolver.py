@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+import time
+
+from async_resolver import AsyncRxNavClient, resolve
+from benchmarks.mock_rxnav import add_mock_arguments, start_mock_server
+
+# Throughput of the async resolver against a mock RxNav with a fixed response
+# latency, for a range of concurrency limits.
+# Run from the repository root: python -m benchmarks.bench_async_resolver
+
+
+async def run(base_url, count, concurrency):
+    codes = (f"00002{i:06d}" for i in range(count))
+    async with AsyncRxNavClient(base_url=base_url, pool_size=concurrency, rate_limit=None) as client:
+        start = time.perf_counter()
+        errors = 0
+        async for _, _, error in resolve(codes, client.ndc_to_rxcui, concurrency=concurrency):
+            errors += error is not None
+        elapsed = time.perf_counter() - start
+    return count / elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async resolver throughput benchmark against a mock RxNav")
+    parser.add_argument("--count", type=int, default=400, help="codes to resolve per run")
+    add_mock_arguments(parser, latency=0.05)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                         stall_rate=args.stall_rate)
+    try:
+        for concurrency in args.concurrency:
+            throughput, errors = asyncio.run(run(base_url, args.count, concurrency))
+            print(f"concurrency {concurrency:>4}: {throughput:8.1f} codes/s   errors {errors}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
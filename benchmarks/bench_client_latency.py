@@ -0,0 +1,56 @@
+import argparse
+import statistics
+import time
+
+import requests
+
+from benchmarks.mock_rxnav import start_mock_server
+from rxnav_client import RxNavClient
+
+# Compare per-lookup latency of bare requests.get against the pooled RxNavClient.
+# Run from the repository root: python -m benchmarks.bench_client_latency
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label, samples):
+    print(f"{label:<22} mean {statistics.mean(samples) * 1000:7.3f} ms   "
+          f"p50 {percentile(samples, 50) * 1000:7.3f} ms   "
+          f"p99 {percentile(samples, 99) * 1000:7.3f} ms")
+
+
+def time_lookups(lookup, count):
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        lookup(f"00002{i:06d}")
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RxNav client latency benchmark against a local stub server")
+    parser.add_argument("--count", type=int, default=500, help="number of lookups per run")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server()
+
+    def bare_lookup(ndc):
+        requests.get(f"{base_url}/ndcstatus.json?ndc={ndc}").json()
+
+    client = RxNavClient(base_url=base_url)
+
+    try:
+        report("requests.get (bare)", time_lookups(bare_lookup, args.count))
+        report("RxNavClient (pooled)", time_lookups(client.ndc_to_rxcui, args.count))
+    finally:
+        client.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
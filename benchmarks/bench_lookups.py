@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import metrics
+import pages
+from benchmarks.mock_rxnav import start_mock_server
+from disk_cache import SQLiteCache
+from lookup_cache import CachedRxNavClient, TTLCache
+from ndc_map import CompactNdcMap, build_map_from_index
+from ndc_normalize import normalize_ndc, normalize_ndcs
+from rxnav_client import RxNavClient
+from rxnorm_index import LocalRxNormIndex, build_index
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Microbenchmarks for the lookup path, in the style of pytest-benchmark: each
+# function is called in rounds of enough iterations to take ~10 ms, and the
+# per-call min/mean/median/stddev and operations per second are reported.
+# Run from the repository root: python -m benchmarks.bench_lookups
+# Save results with --json and compare them across changes.
+
+RRF_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "rxnorm_sample", "rrf")
+
+
+# Call fn repeatedly and return per-call times in seconds, one per round
+def measure(fn, rounds, round_time=0.01):
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= round_time:
+            break
+        iterations *= 2
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - start) / iterations)
+    return samples
+
+
+def report(name, samples):
+    mean = statistics.mean(samples)
+    row = {
+        "name": name,
+        "min": min(samples),
+        "max": max(samples),
+        "mean": mean,
+        "stddev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "median": statistics.median(samples),
+        "ops": 1 / mean,
+    }
+    print(f"{name:<36} {row['min'] * 1e6:10.2f} {row['max'] * 1e6:10.2f} {row['mean'] * 1e6:10.2f} "
+          f"{row['stddev'] * 1e6:10.2f} {row['median'] * 1e6:10.2f} {row['ops']:12.1f}")
+    return row
+
+
+# Build each benchmark as (name, function). Setup (servers, temp files) is
+# done here, outside the timed calls; cleanups are returned for the caller.
+def build_benchmarks(tmp_dir, base_url):
+    template = pages.Template("<h2>The RXCUI for NDC {{ndc}} is {{rxcui}}</h2><h3>Name: {{name}}</h3>" * 4)
+    histogram = metrics.Histogram("bench_seconds", "benchmark histogram", ("endpoint",))
+
+    memory = TTLCache()
+    memory.set(("ndcstatus", "00002322730"), ("861007", "url"))
+
+    disk = SQLiteCache(os.path.join(tmp_dir, "cache.sqlite3"))
+    disk.set(("ndcstatus", "00002322730"), ("861007", "url"))
+
+    index_path = os.path.join(tmp_dir, "index.sqlite3")
+    build_index(RRF_DIR, index_path, release="bench")
+    index = LocalRxNormIndex(index_path)
+    build_map_from_index(index_path, os.path.join(tmp_dir, "ndc_map.bin"))
+    ndc_map = CompactNdcMap(os.path.join(tmp_dir, "ndc_map.bin"))
+
+    client = RxNavClient(base_url=base_url)
+    cached = CachedRxNavClient(client)
+    cached.ndc_to_rxcui("00002322730")
+
+    benchmarks = [
+        ("normalize_ndc (4-4-2)", lambda: normalize_ndc("0002-3227-30")),
+        ("normalize_ndcs (list of 1000)", lambda: normalize_ndcs(["0002-3227-30"] * 1000)),
+        ("TTLCache.get (hit)", lambda: memory.get(("ndcstatus", "00002322730"))),
+        ("SQLiteCache.get (hit)", lambda: disk.get(("ndcstatus", "00002322730"))),
+        ("CachedRxNavClient.ndc_to_rxcui (hit)", lambda: cached.ndc_to_rxcui("0002-3227-30")),
+        ("LocalRxNormIndex.ndc_to_rxcui", lambda: index.ndc_to_rxcui("00002322730")),
+        ("LocalRxNormIndex.rxcui_to_ndc", lambda: index.rxcui_to_ndc("198440")),
+        ("CompactNdcMap.ndc_to_rxcui", lambda: ndc_map.ndc_to_rxcui("00002322730")),
+        ("CompactNdcMap.rxcui_to_ndc", lambda: ndc_map.rxcui_to_ndc("198440")),
+        ("RxNavClient.ndc_to_rxcui (mock)", lambda: client.ndc_to_rxcui("00002322730")),
+        ("Template.render", lambda: template.render(ndc="00002322730", rxcui="861007", name="metformin")),
+        ("Histogram.observe", lambda: histogram.observe(0.004, endpoint="ndcstatus")),
+    ]
+    if np is not None:
+        array = np.array(["0002-3227-30"] * 1000)
+        benchmarks.insert(2, ("normalize_ndcs (numpy 1000)", lambda: normalize_ndcs(array)))
+    return benchmarks, [client.close, index.close, ndc_map.close]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the lookup functions")
+    parser.add_argument("--rounds", type=int, default=20, help="timed rounds per benchmark")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        benchmarks, cleanups = build_benchmarks(tmp_dir, base_url)
+        try:
+            print(f"{'Name (time in us)':<36} {'Min':>10} {'Max':>10} {'Mean':>10} {'StdDev':>10} {'Median':>10} "
+                  f"{'OPS':>12}")
+            for name, fn in benchmarks:
+                if args.filter.lower() in name.lower():
+                    results.append(report(name, measure(fn, args.rounds)))
+        finally:
+            for cleanup in cleanups:
+                cleanup()
+            server.shutdown()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"benchmarks": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
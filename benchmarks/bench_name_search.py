@@ -0,0 +1,103 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from name_search import NameIndex, read_index_names
+from rxnorm_index import build_index
+
+# Latency of drug-name suggestions (name_search.NameIndex.suggest) over every
+# name in the index: for each name, the query a user has typed after 2, 4 and 8
+# characters, plus the first word with two letters swapped (answered by the
+# trigram fallback). Runs on a built RxNorm index (--index; a full release has
+# a few hundred thousand names), or on the sample release plus --synthetic
+# RxNorm-style names.
+# Run from the repository root: python -m benchmarks.bench_name_search
+
+SAMPLE_RRF = os.path.join(os.path.dirname(__file__), "fixtures", "rxnorm_sample", "rrf")
+
+SYLLABLES = ("ab", "ace", "al", "am", "ben", "car", "cef", "cyc", "dex", "di", "flu", "gli", "hydro", "ibu", "lo",
+             "met", "mor", "ox", "pra", "pro", "quin", "ris", "ser", "sul", "ta", "tri", "val", "xa", "zo")
+SUFFIXES = ("mab", "pril", "olol", "statin", "cillin", "azole", "oxacin", "tidine", "pine", "sartan", "done",
+            "profen", "phen", "mide", "vir")
+STRENGTHS = ("0.5 MG", "1 MG", "2.5 MG", "5 MG", "10 MG", "20 MG", "25 MG", "50 MG", "100 MG", "250 MG", "500 MG",
+             "5 MG/ML", "10 MG/ML", "40 MG/ML")
+DOSE_FORMS = ("Oral Tablet", "Oral Capsule", "Extended Release Oral Tablet", "Injectable Solution",
+              "Oral Solution", "Topical Cream", "Delayed Release Oral Capsule", "Prefilled Syringe")
+
+
+# RxNorm-style (rxcui, name, tty) rows: ingredients, brands and the clinical
+# and branded drugs made from them
+def synthetic_names(count, seed=0):
+    rng = random.Random(seed)
+    rxcui = 10000000
+    ingredients = []
+    while rxcui - 10000000 < count:
+        ingredient = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))) + rng.choice(SUFFIXES)
+        brand = ingredient[:rng.randint(3, 5)].capitalize() + rng.choice(("ex", "ol", "ia", "ra", "on"))
+        ingredients.append(ingredient)
+        rows = [(ingredient, "IN"), (brand, "BN")]
+        others = rng.sample(ingredients, 1) if rng.random() < 0.2 else []
+        for strength in rng.sample(STRENGTHS, 3):
+            for form in rng.sample(DOSE_FORMS, 2):
+                parts = " / ".join(f"{name} {strength}" for name in [ingredient] + others)
+                rows.append((f"{parts} {form}", "SCD"))
+                rows.append((f"{parts} {form} [{brand}]", "SBD"))
+        for name, tty in rows:
+            rxcui += 1
+            yield str(rxcui), name, tty
+
+
+def make_queries(names, rng):
+    queries = {"2 chars": [], "4 chars": [], "8 chars": [], "typo": []}
+    for name in names:
+        for length in (2, 4, 8):
+            queries[f"{length} chars"].append(name[:length])
+        word = name.split(" ")[0]
+        if len(word) >= 5:
+            i = rng.randrange(1, len(word) - 2)
+            queries["typo"].append(word[:i] + word[i + 1] + word[i] + word[i + 2:])
+    return queries
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drug-name suggestion latency over every name in the index")
+    parser.add_argument("--index", help="built RxNorm index (default: the sample release)")
+    parser.add_argument("--synthetic", type=int, default=50000, help="extra RxNorm-style names to add")
+    parser.add_argument("-k", type=int, default=10, help="suggestions per query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_path = args.index
+        if not index_path:
+            index_path = os.path.join(tmp_dir, "rxnorm_index.sqlite3")
+            build_index(SAMPLE_RRF, index_path)
+        rows = list(read_index_names(index_path)) + list(synthetic_names(args.synthetic))
+
+    start = time.perf_counter()
+    name_index = NameIndex(rows)
+    print(f"built index of {len(name_index)} names ({len(name_index.keys)} prefix entries, "
+          f"{len(name_index.words)} words) in {time.perf_counter() - start:.2f}s")
+
+    queries = make_queries(name_index.names, random.Random(0))
+    for kind, kind_queries in queries.items():
+        timings = []
+        found = 0
+        for query in kind_queries:
+            start = time.perf_counter()
+            found += bool(name_index.suggest(query, args.k))
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        under = sum(t < 0.001 for t in timings) / len(timings)
+        print(f"{kind:>8}: {len(timings):7d} queries  p50 {percentile(timings, 0.5) * 1e6:7.1f}us  "
+              f"p99 {percentile(timings, 0.99) * 1e6:7.1f}us  max {timings[-1] * 1e3:6.2f}ms  "
+              f"under 1ms {under:6.1%}  answered {found / len(timings):6.1%}")
+
+
+if __name__ == "__main__":
+    main()
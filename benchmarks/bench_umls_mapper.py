@@ -0,0 +1,64 @@
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.mock_rxnav import add_mock_arguments
+from benchmarks.mock_uts import start_mock_server
+from umls_mapper import TermMapper, build_proxy, map_terms
+
+# Throughput of the bulk term mapper against a mock UTS with a fixed response
+# latency, for a range of worker counts. Each run maps the terms twice on a
+# fresh persistent cache: the first pass searches UTS, the second is answered
+# from the cache. Duplicate spellings in the input are searched once.
+# Run from the repository root: python -m benchmarks.bench_umls_mapper
+
+
+def make_terms(count):
+    for i in range(count):
+        term = f"problem list term {i % (count // 2 or 1)}"
+        yield term.upper() if i % 2 else f"  {term}. "
+
+
+def run(base_url, count, workers, rate_limit, cache_path):
+    proxy = build_proxy(base_url=base_url, api_key="benchmark", cache_path=cache_path, rate_limit=rate_limit,
+                        pool_size=workers)
+    mapper = TermMapper(proxy)
+    try:
+        results = []
+        for _ in range(2):
+            start = time.perf_counter()
+            statuses = {}
+            for row, _ in map_terms(make_terms(count), mapper, workers):
+                statuses[row["status"]] = statuses.get(row["status"], 0) + 1
+            results.append((count / (time.perf_counter() - start), statuses))
+            proxy.cache.clear()  # the second pass exercises the persistent cache
+        return results
+    finally:
+        proxy.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk UMLS term mapper throughput against a mock UTS")
+    parser.add_argument("--count", type=int, default=400, help="input terms per run (half are duplicates)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--rate-limit", type=float, default=0, help="searches per second (0 = unlimited)")
+    add_mock_arguments(parser, latency=0.05)
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                         stall_rate=args.stall_rate)
+    try:
+        for workers in args.workers:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                cache_path = os.path.join(tmp_dir, "umls_cache.sqlite3")
+                (cold, statuses), (warm, _) = run(base_url, args.count, workers, args.rate_limit or None,
+                                                  cache_path)
+            print(f"workers {workers:>3}: {cold:8.1f} terms/s cold  {warm:9.1f} terms/s cached   {statuses}")
+        print(f"mock UTS requests: {server.RequestHandlerClass.requests}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tempfile
+import urllib.parse
+
+from benchmarks.mock_rxnav import add_mock_arguments, start_mock_server
+
+# Load test for the converter web servers against a stubbed RxNav.
+# Starts the server with each worker count in turn, drives it with keep-alive
+# clients and reports requests/sec and latency percentiles. With --alloc the
+# server runs under benchmarks/profiled_server.py and allocation counts for
+# the load are reported too (tracemalloc slows the server, so compare
+# throughput only between runs with the same setting).
+# Run from the repository root: python -m benchmarks.load_test
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise Exception(f"server did not start on port {port}")
+
+
+# One client: a keep-alive connection sending POSTs for unique NDCs
+def client_loop(port, path, field, requests_per_client, offset, latencies, errors):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    for i in range(requests_per_client):
+        body = urllib.parse.urlencode({field: f"{offset + i:011d}"})
+        start = time.perf_counter()
+        try:
+            conn.request("POST", path, body, {"Content-Type": "application/x-www-form-urlencoded"})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(e)
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def run(args, workers, base_url, run_number):
+    env = dict(os.environ, RXNAV_BASE_URL=base_url, RXNAV_CACHE_PATH="")
+    command = [args.server, "--port", str(args.port), "--mode", args.mode, "--workers", str(workers)]
+    stats_path = None
+    if args.alloc:
+        fd, stats_path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        command = ["-m", "benchmarks.profiled_server", stats_path] + command
+    server = subprocess.Popen([sys.executable] + command, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(args.port)
+        if args.alloc:
+            server.send_signal(signal.SIGUSR1)
+        latencies, errors = [], []
+        per_client = args.requests // args.clients
+        threads = [
+            threading.Thread(target=client_loop, args=(args.port, "/", args.field, per_client,
+                                                       (run_number * args.clients + c) * per_client,
+                                                       latencies, errors))
+            for c in range(args.clients)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+    line = (f"workers {workers:>3}: {len(latencies) / elapsed:8.1f} req/s   "
+            f"p50 {statistics.median(latencies) * 1000:7.1f} ms   "
+            f"p95 {percentile(latencies, 95) * 1000:7.1f} ms   "
+            f"p99 {percentile(latencies, 99) * 1000:7.1f} ms   errors {len(errors)}")
+    if stats_path:
+        line += "   " + alloc_summary(stats_path, len(latencies))
+    print(line)
+
+
+# Format the allocation stats written by benchmarks/profiled_server.py
+def alloc_summary(stats_path, request_count):
+    try:
+        with open(stats_path, encoding="utf-8") as f:
+            stats = json.load(f)
+    except (OSError, ValueError):
+        return "alloc n/a"
+    finally:
+        os.unlink(stats_path)
+    return (f"gc0/1k req {stats['gc0_collections'] * 1000 / request_count:6.1f}   "
+            f"peak {stats['peak_kib']:8.1f} KiB   retained {stats['retained_kib']:8.1f} KiB   "
+            f"blocks +{stats['allocated_blocks']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a converter server against a stubbed RxNav")
+    parser.add_argument("--server", default="ndc_to_rxcui_web_v3.py", help="server script to start")
+    parser.add_argument("--field", default="ndc", help="form field holding the code (rxcui for rxcui_to_ndc_web.py)")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--mode", choices=["thread", "fork"], default="thread")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--clients", type=int, default=32, help="concurrent keep-alive clients")
+    parser.add_argument("--requests", type=int, default=640, help="requests per run")
+    parser.add_argument("--alloc", action="store_true", help="report server allocation counts (thread mode)")
+    add_mock_arguments(parser, latency=0.05)
+    args = parser.parse_args()
+    if args.alloc and args.mode != "thread":
+        parser.error("--alloc measures a single server process; use --mode thread")
+
+    mock, base_url = start_mock_server(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                       stall_rate=args.stall_rate)
+    try:
+        for run_number, workers in enumerate(args.workers):
+            run(args, workers, base_url, run_number)
+    finally:
+        mock.shutdown()
+
+
+if __name__ == "__main__":
+    main()
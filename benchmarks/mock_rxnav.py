@@ -0,0 +1,184 @@
+import argparse
+import http.server
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+
+# Local stand-in for rxnav.nlm.nih.gov so benchmarks never touch the real service.
+# Requests found in the recorded fixtures (see benchmarks/record_fixtures.py)
+# get the recorded JSON; any other code gets a deterministic synthetic answer,
+# so bulk runs can use as many distinct codes as they like.
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "rxnav", "responses.json")
+
+
+# Load recorded responses keyed by request path and query string
+def load_fixtures(path=FIXTURES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Build a deterministic fake RXCUI for an NDC
+def fake_rxcui(ndc):
+    digits = re.sub(r"\D", "", ndc) or "0"
+    return str(100000 + int(digits) % 900000)
+
+
+# Build a deterministic fake NDC history: two current NDCs, one obsolete one
+# (history >= 1) and one inherited from a remapped concept (history 2)
+def fake_history(rxcui, history):
+    current = [{"ndc": [f"{rxcui:0>9}01", f"{rxcui:0>9}02"], "startDate": "200706", "endDate": "202409"}]
+    obsolete = [{"ndc": [f"{rxcui:0>9}99"], "startDate": "200706", "endDate": "201512"}]
+    direct = {"status": "direct", "rxcui": rxcui, "ndcTime": current + (obsolete if history >= 1 else [])}
+    if history < 2:
+        return [direct]
+    remapped = [{"ndc": [f"{rxcui:0>9}98"], "startDate": "200801", "endDate": "201106"}]
+    return [direct, {"status": "indirect", "rxcui": rxcui, "ndcTime": remapped}]
+
+
+# Build deterministic fake related concepts: one per term type asked for, with
+# ingredients and brands shared by many RXCUIs like in the real graph
+def fake_related(rxcui, ttys):
+    number = int(rxcui) if rxcui.isdigit() else 0
+    groups = []
+    for tty in ttys:
+        related = str(1000 + number % 37) if tty in ("IN", "MIN", "PIN", "BN") else str(number + 1)
+        groups.append({"tty": tty, "conceptProperties": [{"rxcui": related, "name": f"{tty} {related}", "tty": tty}]})
+    return groups
+
+
+class MockRxNavHandler(http.server.BaseHTTPRequestHandler):
+    # Use HTTP/1.1 so clients can keep connections alive
+    protocol_version = "HTTP/1.1"
+    # Buffer each response into a single write and disable Nagle, otherwise
+    # delayed ACKs add ~40 ms to every keep-alive round trip
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    # Seconds to wait before answering, to mimic RxNav's round-trip time, plus
+    # up to `jitter` extra seconds chosen at random per request
+    latency = 0.0
+    jitter = 0.0
+    # Share of requests answered with one of error_statuses instead of data
+    error_rate = 0.0
+    error_statuses = (500, 503, 429)
+    # Share of requests that hang for `stall` seconds before answering, to
+    # exercise client timeouts
+    stall_rate = 0.0
+    stall = 30.0
+    # Data version reported by version.json; change it to simulate a release
+    version = "06-Jan-2025"
+    fixtures = {}
+    rng = random.Random(0)
+
+    def do_GET(self):
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if self.stall_rate and self.rng.random() < self.stall_rate:
+            delay += self.stall
+        if delay:
+            time.sleep(delay)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.send_json({"error": "injected failure"}, status=self.rng.choice(self.error_statuses))
+            return
+        if self.path in self.fixtures:
+            self.send_json(self.fixtures[self.path])
+            return
+
+        parsed = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(parsed.query)
+        path = parsed.path
+
+        if path == "/REST/version.json":
+            self.send_json({"version": self.version, "apiVersion": "3.1.0"})
+            return
+
+        if path == "/REST/ndcstatus.json":
+            ndc = query.get("ndc", [""])[0]
+            self.send_json({"ndcStatus": {"ndc11": ndc, "status": "ACTIVE", "rxcui": fake_rxcui(ndc)}})
+            return
+
+        match = re.fullmatch(r"/REST/rxcui/(\w+)/(properties|ndcs|allhistoricalndcs|related)\.json", path)
+        if match and match.group(2) == "related":
+            ttys = query.get("tty", [""])[0].split()
+            self.send_json({"relatedGroup": {"rxcui": match.group(1), "conceptGroup": fake_related(match.group(1), ttys)}})
+        elif match and match.group(2) == "allhistoricalndcs":
+            rxcui = match.group(1)
+            history = int(query.get("history", ["0"])[0])
+            self.send_json({"historicalNdcConcept": {"historicalNdcTime": fake_history(rxcui, history)}})
+        elif match and match.group(2) == "properties":
+            rxcui = match.group(1)
+            self.send_json({"properties": {"rxcui": rxcui, "name": f"Drug {rxcui}", "tty": "SCD"}})
+        elif match:
+            rxcui = match.group(1)
+            self.send_json({"ndcGroup": {"rxcui": rxcui, "ndcList": {"ndc": [f"{rxcui:0>9}01", f"{rxcui:0>9}02"]}}})
+        else:
+            self.send_json({}, status=404)
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Keep benchmark output clean
+    def log_message(self, format, *args):
+        pass
+
+
+class MockRxNavServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    # Large listen backlog so bursts of new connections are not dropped
+    request_queue_size = 256
+
+
+# Start the mock server on a background thread and return it with its base URL.
+# Pass fixtures=None to answer every request synthetically.
+def start_mock_server(host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                      error_statuses=MockRxNavHandler.error_statuses, stall_rate=0.0, fixtures=FIXTURES_PATH,
+                      seed=0):
+    handler = type("MockRxNavHandler", (MockRxNavHandler,), {
+        "latency": latency,
+        "jitter": jitter,
+        "error_rate": error_rate,
+        "error_statuses": tuple(error_statuses),
+        "stall_rate": stall_rate,
+        "fixtures": load_fixtures(fixtures) if fixtures else {},
+        "rng": random.Random(seed),
+    })
+    server = MockRxNavServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://{host}:{server.server_address[1]}/REST"
+    return server, base_url
+
+
+# Add the latency and error injection options to a benchmark's argument parser
+def add_mock_arguments(parser, latency=0.0):
+    parser.add_argument("--latency", type=float, default=latency, help="mock RxNav response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency of up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="share of mock RxNav responses that fail with 500/503/429")
+    parser.add_argument("--stall-rate", type=float, default=0.0,
+                        help="share of mock RxNav requests that hang for 30 seconds")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake RxNav REST API for benchmarks")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--fixtures", default=FIXTURES_PATH, help="recorded responses (empty for synthetic only)")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(port=args.port, latency=args.latency, jitter=args.jitter,
+                                         error_rate=args.error_rate, stall_rate=args.stall_rate,
+                                         fixtures=args.fixtures)
+    print(f"Mock RxNav serving on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
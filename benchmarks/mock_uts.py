@@ -0,0 +1,161 @@
+import argparse
+import http.server
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+import zlib
+
+from benchmarks.mock_rxnav import MockRxNavServer, add_mock_arguments
+
+# Local stand-in for uts-ws.nlm.nih.gov so the UMLS proxy and term mapper can
+# be run and benchmarked offline. Every answer is synthetic and deterministic:
+# the same search string always finds the same concepts, and a concept always
+# has the same number of atoms and relations, split into pages like UTS does.
+
+SABS = ("SNOMEDCT_US", "ICD10CM", "MSH", "LNC")
+NO_RESULTS = "zzz"  # Search strings containing this find nothing
+
+
+def _number(text):
+    return zlib.crc32(text.encode("utf-8"))
+
+
+# Ranked search results for a string: up to `count` concepts (or source codes
+# when return_id_type is "code"), best match first
+def fake_search(string, return_id_type="concept", sabs=(), count=25):
+    if NO_RESULTS in string.lower():
+        return []
+    number = _number(string.lower())
+    results = []
+    for rank in range(min(count, 3 + number % 8)):
+        source = sabs[rank % len(sabs)] if sabs else SABS[rank % len(SABS)]
+        if return_id_type == "code":
+            ui = str(100000 + (number + rank * 7919) % 900000)
+            uri = f"https://uts-ws.nlm.nih.gov/rest/content/current/source/{source}/{ui}"
+        else:
+            ui = f"C{(number + rank * 7919) % 10000000:07d}"
+            uri = f"https://uts-ws.nlm.nih.gov/rest/content/current/CUI/{ui}"
+        name = string if rank == 0 else f"{string} ({rank})"
+        results.append({"ui": ui, "rootSource": source, "uri": uri, "name": name})
+    return results
+
+
+# Items of one page of a concept's atoms, relations or definitions
+def fake_content(cui, detail, page_number, page_size):
+    total = _number(f"{cui}/{detail}") % 1500
+    start = (page_number - 1) * page_size
+    items = []
+    for i in range(start, min(start + page_size, total)):
+        if detail == "relations":
+            items.append({"relatedFromIdName": f"{cui} concept", "additionalRelationLabel": "isa",
+                          "relatedIdName": f"Related concept {i}", "rootSource": SABS[i % len(SABS)],
+                          "relatedId": f"https://uts-ws.nlm.nih.gov/rest/content/current/CUI/C{i:07d}"})
+        elif detail == "definitions":
+            items.append({"value": f"Definition {i} of {cui}", "rootSource": SABS[i % len(SABS)]})
+        else:
+            items.append({"name": f"Atom {i} of {cui}", "rootSource": SABS[i % len(SABS)]})
+    return items, max(-(-total // page_size), 1)
+
+
+class MockUtsHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    # Response latency, random extra latency and error injection, as in mock_rxnav
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    error_statuses = (500, 503, 429)
+    stall_rate = 0.0
+    stall = 30.0
+    rng = random.Random(0)
+    requests = 0
+
+    def do_GET(self):
+        type(self).requests += 1
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if self.stall_rate and self.rng.random() < self.stall_rate:
+            delay += self.stall
+        if delay:
+            time.sleep(delay)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.send_json({"error": "injected failure"}, status=self.rng.choice(self.error_statuses))
+            return
+
+        parsed = urllib.parse.urlparse(self.path)
+        query = {name: values[0] for name, values in urllib.parse.parse_qs(parsed.query).items()}
+        if not query.get("apiKey"):
+            self.send_json({"error": "API key required"}, status=401)
+            return
+        page_number = int(query.get("pageNumber", "1"))
+        page_size = int(query.get("pageSize", "25"))
+
+        if re.fullmatch(r"/rest/search/[\w.]+", parsed.path):
+            sabs = tuple(filter(None, query.get("sabs", "").split(",")))
+            results = fake_search(query.get("string", ""), query.get("returnIdType", "concept"), sabs,
+                                  page_number * page_size)[(page_number - 1) * page_size:]
+            self.send_json({"pageSize": page_size, "pageNumber": page_number,
+                            "result": {"classType": "searchResults", "results": results}})
+            return
+
+        match = re.fullmatch(r"/rest/content/[\w.]+/CUI/(\w+)(?:/(atoms|relations|definitions))?", parsed.path)
+        if match and match.group(2):
+            items, page_count = fake_content(match.group(1), match.group(2), page_number, page_size)
+            if page_number > page_count:
+                self.send_json({"error": "page out of range"}, status=404)
+                return
+            self.send_json({"pageSize": page_size, "pageNumber": page_number, "pageCount": page_count,
+                            "result": items})
+        elif match:
+            cui = match.group(1)
+            self.send_json({"result": {"ui": cui, "name": f"{cui} concept", "classType": "Concept"}})
+        else:
+            self.send_json({"error": "not found"}, status=404)
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Start the mock server on a background thread and return it with its base
+# URL (pass it as UmlsProxy(base_url=...) or UMLS_BASE_URL)
+def start_mock_server(host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                      error_statuses=MockUtsHandler.error_statuses, stall_rate=0.0, seed=0):
+    handler = type("MockUtsHandler", (MockUtsHandler,), {
+        "latency": latency,
+        "jitter": jitter,
+        "error_rate": error_rate,
+        "error_statuses": tuple(error_statuses),
+        "stall_rate": stall_rate,
+        "rng": random.Random(seed),
+        "requests": 0,
+    })
+    server = MockRxNavServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake UTS REST API for offline runs and benchmarks")
+    parser.add_argument("--port", type=int, default=8090)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(port=args.port, latency=args.latency, jitter=args.jitter,
+                                         error_rate=args.error_rate, stall_rate=args.stall_rate)
+    print(f"Mock UTS serving on {base_url} (any apiKey is accepted)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,48 @@
+import gc
+import json
+import runpy
+import signal
+import sys
+import tracemalloc
+
+# Run a converter server script with allocation accounting, for load_test --alloc.
+#   python -m benchmarks.profiled_server STATS_PATH SERVER_SCRIPT [server args...]
+# SIGUSR1 marks the start of the measured load; when the server exits, the
+# allocations since then are written to STATS_PATH as JSON:
+#   gc0_collections  generation-0 collections (one per ~700 net new container objects)
+#   allocated_blocks net memory blocks still allocated by the interpreter
+#   peak_kib         tracemalloc peak traced memory during the load
+#   retained_kib     traced memory still held at exit beyond the baseline
+# Python has no counter of individual allocations; these are the closest
+# cheap signals. Only the serving process is measured (use --mode thread).
+
+
+def main():
+    stats_path, script = sys.argv[1], sys.argv[2]
+    baseline = {}
+
+    def mark(signum, frame):
+        tracemalloc.reset_peak()
+        baseline["gc0"] = gc.get_stats()[0]["collections"]
+        baseline["blocks"] = sys.getallocatedblocks()
+        baseline["traced"] = tracemalloc.get_traced_memory()[0]
+
+    tracemalloc.start()
+    signal.signal(signal.SIGUSR1, mark)
+    sys.argv = sys.argv[2:]
+    try:
+        runpy.run_path(script, run_name="__main__")
+    finally:
+        if baseline:
+            traced, peak = tracemalloc.get_traced_memory()
+            with open(stats_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "gc0_collections": gc.get_stats()[0]["collections"] - baseline["gc0"],
+                    "allocated_blocks": sys.getallocatedblocks() - baseline["blocks"],
+                    "peak_kib": (peak - baseline["traced"]) / 1024,
+                    "retained_kib": (traced - baseline["traced"]) / 1024,
+                }, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import json
+import os
+import urllib.parse
+
+from benchmarks.mock_rxnav import FIXTURES_PATH
+from rxnav_client import BASE_URL, RxNavClient, quote
+
+# Record real RxNav responses for the mock server. For each NDC this fetches
+# ndcstatus, and for every RXCUI found (or given) its properties and ndcs, and
+# merges them into the fixtures file keyed by request path and query string.
+# Run from the repository root, with network access:
+#   python -m benchmarks.record_fixtures --ndc 00002322730 --rxcui 198440
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record RxNav responses as mock server fixtures")
+    parser.add_argument("--ndc", nargs="*", default=[], help="NDCs to record (11-digit form)")
+    parser.add_argument("--rxcui", nargs="*", default=[], help="RXCUIs to record")
+    parser.add_argument("--output", default=FIXTURES_PATH)
+    parser.add_argument("--base-url", default=BASE_URL)
+    args = parser.parse_args()
+
+    fixtures = {}
+    if os.path.exists(args.output):
+        with open(args.output, encoding="utf-8") as f:
+            fixtures = json.load(f)
+
+    client = RxNavClient(base_url=args.base_url)
+    prefix = urllib.parse.urlparse(client.base_url).path
+
+    def record(path):
+        fixtures[prefix + path] = client.get_json(client.base_url + path)
+        return fixtures[prefix + path]
+
+    rxcuis = list(args.rxcui)
+    try:
+        for ndc in args.ndc:
+            status = record(f"/ndcstatus.json?ndc={quote(ndc)}").get("ndcStatus", {})
+            if status.get("rxcui"):
+                rxcuis.append(status["rxcui"])
+        for rxcui in dict.fromkeys(rxcuis):
+            record(f"/rxcui/{quote(rxcui)}/properties.json")
+            record(f"/rxcui/{quote(rxcui)}/ndcs.json")
+    finally:
+        client.close()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(fixtures.items())), f, indent=1)
+        f.write("\n")
+    print(f"{len(fixtures)} responses in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
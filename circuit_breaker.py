@@ -0,0 +1,98 @@
+import collections
+import threading
+import time
+
+import metrics
+
+# Circuit breaker defaults (change these if needed)
+FAILURE_THRESHOLD = 0.5  # Open when this share of recent upstream requests failed
+WINDOW = 20  # Recent requests considered
+MIN_REQUESTS = 10  # Requests needed in the window before the breaker can open
+RESET_TIMEOUT = 30  # Seconds to stay open before letting a trial request through
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+STATE = metrics.gauge("circuit_breaker_state", "Breaker state: 0 closed, 1 half-open, 2 open", ("breaker",))
+TRANSITIONS = metrics.counter("circuit_breaker_transitions_total", "Breaker state changes", ("breaker", "from", "to"))
+REJECTED = metrics.counter("circuit_breaker_rejected_total", "Requests failed fast while the breaker was open",
+                           ("breaker",))
+
+
+# Raised instead of calling upstream while the breaker is open
+class CircuitOpenError(Exception):
+    pass
+
+
+# Circuit breaker for an upstream service. Closed: requests go through and
+# outcomes are recorded. When at least failure_threshold of the last `window`
+# requests failed, it opens and requests fail fast for reset_timeout seconds.
+# Then one trial request is let through (half-open): success closes the
+# breaker, failure opens it again. Callers must end every allowed request
+# with record_success(), record_failure() or release(); a trial that ends
+# with neither outcome (e.g. a cancelled task) must be released, or the
+# breaker would stay half-open and reject every later request.
+class CircuitBreaker:
+    def __init__(self, name="rxnav", failure_threshold=FAILURE_THRESHOLD, window=WINDOW,
+                 min_requests=MIN_REQUESTS, reset_timeout=RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.min_requests = min_requests
+        self.reset_timeout = reset_timeout
+        self.outcomes = collections.deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+        STATE.set(0, breaker=name)
+
+    def _transition(self, state):
+        TRANSITIONS.inc(breaker=self.name, **{"from": self.state, "to": state})
+        STATE.set(STATE_VALUES[state], breaker=self.name)
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        self.outcomes.clear()
+        self.trial_in_flight = False
+
+    # Return True if a request may go upstream now
+    def allow(self):
+        with self._lock:
+            if self.state == OPEN and time.monotonic() >= self.opened_at + self.reset_timeout:
+                self._transition(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+        REJECTED.inc(breaker=self.name)
+        return False
+
+    # Raise CircuitOpenError unless a request may go upstream now
+    def check(self):
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open); try again shortly")
+
+    def record_success(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._transition(CLOSED)
+            else:
+                self.outcomes.append(True)
+
+    # End an allowed request without an outcome (cancelled or interrupted), so
+    # a half-open breaker lets the next request through as its trial
+    def release(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._transition(OPEN)
+                return
+            self.outcomes.append(False)
+            if self.state == CLOSED and len(self.outcomes) >= self.min_requests and \
+                    self.outcomes.count(False) / len(self.outcomes) >= self.failure_threshold:
+                self._transition(OPEN)
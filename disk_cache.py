@@ -0,0 +1,200 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from rxnav_client import NotFoundError
+
+# Cache defaults (change these if needed)
+CACHE_PATH = "rxnav_cache.sqlite3"  # File shared by every server process
+TTL = 7 * 24 * 60 * 60  # Seconds a successful lookup stays cached on disk
+STALE_TTL = 7 * 24 * 60 * 60  # Seconds an expired row is kept to answer with while RxNav is failing
+BUSY_TIMEOUT = 5000  # Milliseconds to wait for another process's write lock
+
+_MISSING = object()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lookups (
+    kind TEXT NOT NULL,
+    code TEXT NOT NULL,
+    result TEXT,
+    url TEXT,
+    not_found TEXT,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    version TEXT,
+    PRIMARY KEY (kind, code)
+) WITHOUT ROWID
+"""
+
+# Named leases, so one of the processes sharing the file can take on a job
+# (e.g. re-validating the rows after a new release) for all of them
+LEASES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+)
+"""
+
+
+# Persistent cache for RxNav answers (ndcstatus, properties and ndcs) backed by
+# SQLite in WAL mode, so several server processes can read it while one writes.
+# It has the same get/set interface as lookup_cache.TTLCache and can be passed
+# to CachedRxNavClient; entries survive restarts until they expire. Rows are
+# tagged with the RxNorm data version they were fetched under, so after a
+# restart entries from an older release are still known to be outdated.
+class SQLiteCache:
+    def __init__(self, path=CACHE_PATH, ttl=TTL, stale_ttl=STALE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.version = None  # Data version new rows are tagged with
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        conn = self._connect()
+        conn.execute(SCHEMA)
+        conn.execute(LEASES_SCHEMA)
+        # Cache files created before rows were tagged with a data version
+        if "version" not in {row[1] for row in conn.execute("PRAGMA table_info(lookups)")}:
+            try:
+                conn.execute("ALTER TABLE lookups ADD COLUMN version TEXT")
+            except sqlite3.OperationalError:
+                pass  # another process added it first
+
+    # Each thread gets its own connection; sqlite3 connections are not shared
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT}")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    # Return the cached (result, url) or NotFoundError for key, or default
+    def get(self, key, default=None):
+        kind, code = key
+        row = self._connect().execute(
+            "SELECT result, url, not_found, expires_at FROM lookups WHERE kind = ? AND code = ?",
+            (kind, code),
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return default
+        result, url, not_found, expires_at = row
+        if expires_at <= time.time():
+            self._count("expirations")
+            self._count("misses")
+            return default
+        self._count("hits")
+        if not_found is not None:
+            return NotFoundError(not_found)
+        return json.loads(result), url
+
+    # Return the value for key even if it has expired, as long as it is still
+    # within the stale window, or default
+    def get_stale(self, key, default=None):
+        kind, code = key
+        row = self._connect().execute(
+            "SELECT result, url, not_found FROM lookups WHERE kind = ? AND code = ? AND expires_at > ?",
+            (kind, code, time.time() - self.stale_ttl),
+        ).fetchone()
+        if row is None:
+            return default
+        result, url, not_found = row
+        if not_found is not None:
+            return NotFoundError(not_found)
+        return json.loads(result), url
+
+    # Store a (result, url) tuple or a NotFoundError under key, tagged with
+    # version (the cache's current version if not given)
+    def set(self, key, value, ttl=None, version=None):
+        kind, code = key
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        if isinstance(value, NotFoundError):
+            result, url, not_found = None, None, str(value)
+        else:
+            result, url = value
+            result, not_found = json.dumps(result), None
+        self._connect().execute(
+            "INSERT OR REPLACE INTO lookups (kind, code, result, url, not_found, fetched_at, expires_at, version) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (kind, code, result, url, not_found, now, expires_at, self.version if version is None else version),
+        )
+
+    # Return when key was last fetched from RxNav (seconds since the epoch), or None
+    def fetched_at(self, key):
+        kind, code = key
+        row = self._connect().execute(
+            "SELECT fetched_at FROM lookups WHERE kind = ? AND code = ?", (kind, code)
+        ).fetchone()
+        return row[0] if row else None
+
+    def delete(self, key):
+        kind, code = key
+        self._connect().execute("DELETE FROM lookups WHERE kind = ? AND code = ?", (kind, code))
+
+    def clear(self):
+        self._connect().execute("DELETE FROM lookups")
+
+    # Switch to a new data version, as TTLCache.set_version does. Rows written
+    # before versions were tracked count as outdated.
+    def set_version(self, version):
+        self.version = version
+        conn = self._connect()
+        conn.execute("DELETE FROM lookups WHERE not_found IS NOT NULL AND version IS NOT ?", (version,))
+        return conn.execute("SELECT COUNT(*) FROM lookups WHERE version IS NOT ?", (version,)).fetchone()[0]
+
+    # Up to limit keys of rows tagged with another data version, most recently
+    # fetched first
+    def outdated(self, limit):
+        return [tuple(row) for row in self._connect().execute(
+            "SELECT kind, code FROM lookups WHERE version IS NOT ? ORDER BY fetched_at DESC LIMIT ?",
+            (self.version, limit),
+        )]
+
+    # Take or renew the lease `name` for owner for ttl seconds. Returns True if
+    # owner holds it, False while another owner's lease is still valid.
+    def claim(self, name, owner, ttl):
+        now = time.time()
+        conn = self._connect()
+        if conn.execute("INSERT OR IGNORE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                        (name, owner, now + ttl)).rowcount:
+            return True
+        return conn.execute(
+            "UPDATE leases SET owner = ?, expires_at = ? WHERE name = ? AND (owner = ? OR expires_at <= ?)",
+            (owner, now + ttl, name, owner, now),
+        ).rowcount == 1
+
+    # Remove rows past their stale window so the file does not grow forever
+    def purge_expired(self):
+        cursor = self._connect().execute("DELETE FROM lookups WHERE expires_at <= ?",
+                                         (time.time() - self.stale_ttl,))
+        return cursor.rowcount
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM lookups").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": os.path.abspath(self.path),
+                "size": len(self),
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "version": self.version,
+            }
@@ -0,0 +1,121 @@
+import re
+import urllib.parse
+
+import metrics
+import rxnav_client
+
+REQUESTS = metrics.counter(
+    "http_requests_total", "Requests served, by method, route and status", ("method", "route", "status"))
+REQUEST_SECONDS = metrics.histogram(
+    "http_request_seconds", "Time from reading the request line to the end of the response", ("method", "route"))
+STAGE_SECONDS = metrics.histogram(
+    "http_request_stage_seconds", "Time spent in each stage of a request (lookup, render)", ("route", "stage"))
+IN_FLIGHT = metrics.gauge("http_requests_in_flight", "Requests currently being handled")
+ERRORS = metrics.counter("lookup_errors_total", "Failed lookups shown to the user, by exception type", ("type",))
+
+# Paths with a code in them are reported under one route so the number of
+# series stays bounded
+ROUTES = (
+    (re.compile(r"/api/ndc/[^/]+"), "/api/ndc/{ndc}"),
+    (re.compile(r"/api/rxcui/[^/]+/ndcs"), "/api/rxcui/{rxcui}/ndcs"),
+    (re.compile(r"/rest/search/[^/]+"), "/rest/search/{version}"),
+    (re.compile(r"/rest/content/.+/(atoms|relations|definitions)"), "/rest/content/{id}/{detail}"),
+    (re.compile(r"/rest/content/.+"), "/rest/content/{id}"),
+    (re.compile(r"/stream/rest/content/.+"), "/stream/rest/content/{id}/{detail}"),
+)
+KNOWN_PATHS = {"/", "/api/bulk", "/api/expand", "/api/rollup", "/api/suggest", "/download_json", "/metrics"}
+
+
+def route_of(path):
+    path = urllib.parse.urlparse(path).path
+    if path in KNOWN_PATHS:
+        return path
+    for pattern, route in ROUTES:
+        if pattern.fullmatch(path):
+            return route
+    return "other"
+
+
+# Count a lookup failure that is reported to the user instead of raised
+def record_error(error):
+    ERRORS.inc(type=type(error).__name__)
+
+
+# Build metrics for every cache layer of the current lookup client at scrape
+# time. Clients are walked through their .client attribute; a layer with a
+# .cache that has stats() (TTLCache, SQLiteCache) is reported under its class
+# name. A process that has no lookup client (such as the UMLS proxy) reports
+# none rather than creating one.
+def collect_cache_metrics():
+    client = rxnav_client.current_client()
+    if client is None:
+        return []
+    lookups = metrics.Counter("rxnav_cache_lookups_total", "Cache lookups by layer and result", ("cache", "result"))
+    hit_ratio = metrics.Gauge("rxnav_cache_hit_ratio", "Share of cache lookups that were hits", ("cache",))
+    size = metrics.Gauge("rxnav_cache_entries", "Entries held in the cache", ("cache",))
+
+    seen = set()
+    while client is not None and id(client) not in seen:
+        seen.add(id(client))
+        cache = getattr(client, "cache", None)
+        if cache is not None and hasattr(cache, "stats"):
+            name = type(cache).__name__
+            stats = cache.stats()
+            lookups.set(stats["hits"], cache=name, result="hit")
+            lookups.set(stats["misses"], cache=name, result="miss")
+            hit_ratio.set(stats["hit_ratio"], cache=name)
+            size.set(stats["size"], cache=name)
+        client = getattr(client, "client", None)
+    return [lookups, hit_ratio, size]
+
+
+metrics.REGISTRY.add_collector(collect_cache_metrics)
+
+
+# Request handler mixin that times every request, serves GET /metrics in the
+# Prometheus text format and logs one line per request:
+#   "POST / HTTP/1.1" status=200 route=/ wall=5.4ms lookup=5.2ms render=0.1ms upstream_calls=2 ndcstatus@0.1+3.4ms ...
+# Each request gets a fresh rxnav_client trace as self.trace; handlers time
+# their own stages with `with self.trace.stage("lookup"):`.
+class MetricsMixin:
+    def parse_request(self):
+        self.trace = rxnav_client.start_trace()
+        self.status = None
+        IN_FLIGHT.inc()
+        return super().parse_request()
+
+    def handle_one_request(self):
+        self.trace = None
+        try:
+            super().handle_one_request()
+        finally:
+            if self.trace is not None:
+                self.finish_metrics()
+
+    def finish_metrics(self):
+        IN_FLIGHT.dec()
+        method = self.command or "-"
+        route = route_of(self.path) if self.command else "other"
+        REQUESTS.inc(method=method, route=route, status=self.status or "-")
+        REQUEST_SECONDS.observe(self.trace.elapsed(), method=method, route=route)
+        for stage, duration in self.trace.stages:
+            STAGE_SECONDS.observe(duration, route=route, stage=stage)
+        if route != "/metrics":
+            self.log_message('"%s" status=%s route=%s %s', self.requestline, self.status, route,
+                             self.trace.summary())
+
+    def send_response(self, code, message=None):
+        self.status = code
+        super().send_response(code, message)
+
+    # The per-request line from finish_metrics replaces the default access log
+    def log_request(self, code='-', size='-'):
+        pass
+
+    def send_metrics(self):
+        body = metrics.REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
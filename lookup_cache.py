@@ -0,0 +1,233 @@
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+from ndc_normalize import normalize_ndc
+from rxnav_client import HISTORY, RELATED_TTYS, NotFoundError
+
+# Cache defaults (change these if needed)
+MAX_ENTRIES = 10000  # Entries kept before the least recently used one is evicted
+TTL = 24 * 60 * 60  # Seconds a successful lookup stays cached
+NEGATIVE_TTL = 10 * 60  # Seconds a "not found" answer stays cached
+STALE_TTL = 24 * 60 * 60  # Seconds an expired entry is kept to answer with while RxNav is failing
+
+STALE_SERVED = metrics.counter("rxnav_stale_served_total", "Expired cache entries served because RxNav failed",
+                               ("kind",))
+
+_MISSING = object()
+
+
+# Size-bounded LRU cache where every entry carries its own expiry time.
+# Expired entries are kept for stale_ttl more seconds for get_stale().
+# Entries are also tagged with the RxNorm data version they were fetched
+# under (see set_version), so a new release can be re-validated entry by entry.
+class TTLCache:
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL, stale_ttl=STALE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()
+        self._read = set()  # Keys read at least once since they were last stored
+        self._lock = threading.Lock()
+        self.version = None  # Data version new entries are tagged with
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # Return the cached value for key, or default if it is missing or expired
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at, _ = entry
+            now = time.monotonic()
+            if expires_at <= now:
+                if expires_at + self.stale_ttl <= now:
+                    del self._entries[key]
+                self._read.discard(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._read.add(key)
+            self.hits += 1
+            return value
+
+    # Store value under key for ttl seconds (the cache default if not given),
+    # tagged with version (the cache's current version if not given)
+    def set(self, key, value, ttl=None, version=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at, self.version if version is None else version)
+            self._entries.move_to_end(key)
+            self._read.discard(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._read.discard(evicted)
+                self.evictions += 1
+
+    # Return the value for key even if it has expired, as long as it is still
+    # within the stale window, or default
+    def get_stale(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING or entry[1] + self.stale_ttl <= time.monotonic():
+                return default
+            return entry[0]
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._read.discard(key)
+
+    # Keys of entries that expire within `within` seconds and were read since
+    # they were stored, i.e. the ones worth refreshing before they expire.
+    # "Not found" entries are left to expire.
+    def expiring(self, within):
+        deadline = time.monotonic() + within
+        with self._lock:
+            return [key for key in self._read
+                    if self._entries[key][1] <= deadline and not isinstance(self._entries[key][0], NotFoundError)]
+
+    # Switch to a new data version. "Not found" entries from other versions are
+    # dropped at once (the release may have added the code); the rest keep
+    # answering until they are re-validated. Returns how many are outdated.
+    def set_version(self, version):
+        with self._lock:
+            self.version = version
+            for key, (value, _, tag) in list(self._entries.items()):
+                if tag != version and isinstance(value, NotFoundError):
+                    del self._entries[key]
+                    self._read.discard(key)
+            return sum(tag != version for _, _, tag in self._entries.values())
+
+    # Up to limit keys of entries tagged with another data version, most
+    # recently used first
+    def outdated(self, limit):
+        with self._lock:
+            keys = []
+            for key, (_, _, tag) in reversed(self._entries.items()):
+                if tag != self.version:
+                    keys.append(key)
+                    if len(keys) == limit:
+                        break
+            return keys
+
+    def clear(self):
+        with self._lock:
+            self._read.clear()
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "version": self.version,
+            }
+
+
+# Wraps an RxNav client so repeat lookups are answered from a TTLCache.
+# "Not found" answers are cached too, but for negative_ttl seconds only;
+# request failures are never cached. When a fetch fails (RxNav down, circuit
+# open), an expired entry still in the cache's stale window is served instead.
+# While `settled` is False (a new data version that the cache layers below
+# have not finished re-validating), new entries are tagged as outdated, since
+# they may have been answered from an outdated entry below.
+class CachedRxNavClient:
+    def __init__(self, client, cache=None, negative_ttl=NEGATIVE_TTL):
+        self.client = client
+        self.cache = cache if cache is not None else TTLCache()
+        self.negative_ttl = negative_ttl
+        self.settled = True
+
+    def _store(self, key, value, ttl=None):
+        self.cache.set(key, value, ttl=ttl, version=None if self.settled else "")
+
+    def _lookup(self, kind, code, fetch):
+        key = (kind, str(code).strip())
+        cached = self.cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            if isinstance(cached, NotFoundError):
+                raise NotFoundError(*cached.args)
+            return cached
+
+        try:
+            result = fetch(code)
+        except NotFoundError as e:
+            self._store(key, NotFoundError(*e.args), ttl=self.negative_ttl)
+            raise
+        except Exception:
+            stale = self.cache.get_stale(key, _MISSING)
+            if stale is _MISSING:
+                raise
+            STALE_SERVED.inc(kind=kind)
+            if isinstance(stale, NotFoundError):
+                raise NotFoundError(*stale.args)
+            return stale
+        self._store(key, result)
+        return result
+
+    def _fetcher(self, kind):
+        if kind.startswith("historicalndcs"):
+            history = int(kind[len("historicalndcs"):])
+            return lambda code: self.client.rxcui_to_historical_ndcs(code, history)
+        if kind.startswith("related:"):
+            ttys = tuple(kind[len("related:"):].split("+"))
+            return lambda code: self.client.get_related(code, ttys)
+        return {
+            "ndcstatus": self.client.ndc_to_rxcui,
+            "properties": self.client.get_rxcui_info,
+            "ndcs": self.client.rxcui_to_ndc,
+        }[kind]
+
+    # Fetch a cached key again from the wrapped client and replace its entry.
+    # If the fetch fails the old entry stays in place and the error is raised.
+    def refresh(self, key):
+        kind, code = key
+        try:
+            result = self._fetcher(kind)(code)
+        except NotFoundError as e:
+            self._store(key, NotFoundError(*e.args), ttl=self.negative_ttl)
+            raise
+        self._store(key, result)
+        return result
+
+    def ndc_to_rxcui(self, ndc):
+        return self._lookup("ndcstatus", normalize_ndc(ndc), self.client.ndc_to_rxcui)
+
+    def get_rxcui_info(self, rxcui):
+        return self._lookup("properties", rxcui, self.client.get_rxcui_info)
+
+    def rxcui_to_ndc(self, rxcui):
+        return self._lookup("ndcs", rxcui, self.client.rxcui_to_ndc)
+
+    def rxcui_to_historical_ndcs(self, rxcui, history=HISTORY):
+        return self._lookup(f"historicalndcs{int(history)}", rxcui,
+                            lambda code: self.client.rxcui_to_historical_ndcs(code, history))
+
+    def get_related(self, rxcui, ttys=RELATED_TTYS):
+        return self._lookup(f"related:{'+'.join(ttys)}", rxcui, lambda code: self.client.get_related(code, ttys))
+
+    # The data version is always asked of the wrapped client, never cached
+    def get_version(self):
+        return self.client.get_version()
+
+    def stats(self):
+        return self.cache.stats()
+
+    def close(self):
+        self.client.close()
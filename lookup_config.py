@@ -0,0 +1,42 @@
+import os
+
+import rxnav_client
+from disk_cache import SQLiteCache
+from lookup_cache import CachedRxNavClient, TTLCache
+from single_flight import SingleFlightRxNavClient
+
+# Lookup settings shared by the servers (override with environment variables)
+BASE_URL = os.environ.get("RXNAV_BASE_URL", rxnav_client.BASE_URL)  # RxNav REST API (or a stub server)
+CACHE_PATH = os.environ.get("RXNAV_CACHE_PATH", "rxnav_cache.sqlite3")  # On-disk cache shared by workers
+INDEX_PATH = os.environ.get("RXNORM_INDEX")  # Built RxNorm index; answers lookups offline when set
+NAME_INDEX_PATH = os.environ.get("RXNORM_NAME_INDEX", INDEX_PATH)  # Index /api/suggest reads; lookups stay on RxNav
+POOL_SIZE = int(os.environ.get("RXNAV_POOL_SIZE", "32"))  # Keep-alive connections to RxNav per process
+NDC_MAP_PATH = os.environ.get("RXNORM_NDC_MAP")  # Packed NDC<->RXCUI map (ndc_map.py) tried before anything else
+HOT_LIST_PATH = os.environ.get("RXNAV_HOT_LIST")  # Codes to prewarm at startup and keep refreshed (prewarm.py)
+VERSION_INTERVAL = int(os.environ.get("RXNAV_VERSION_CHECK", "3600"))  # Seconds between data version checks (0 = off)
+RELEASE_TTL = int(os.environ.get("RXNAV_RELEASE_TTL", str(35 * 24 * 60 * 60)))  # Cache TTL while version checks are on
+
+
+# Build the lookup backend used by the servers: a local RxNorm index when one
+# is configured, otherwise RxNav behind an in-process cache and the shared
+# on-disk cache, with concurrent misses for the same code coalesced into one
+# fetch. A packed NDC map, if configured, answers NDC<->RXCUI lookups first.
+# When data version checks are on (see prewarm.RefreshScheduler), a new
+# release re-validates the cached entries, so the caches keep entries for
+# release_ttl seconds instead of their own shorter defaults.
+def build_client(cache_path=CACHE_PATH, index_path=INDEX_PATH, base_url=BASE_URL, pool_size=POOL_SIZE,
+                 ndc_map_path=NDC_MAP_PATH, release_ttl=RELEASE_TTL if VERSION_INTERVAL else None):
+    if index_path:
+        from rxnorm_index import LocalRxNormIndex
+        client = LocalRxNormIndex(index_path)
+    else:
+        client = rxnav_client.RxNavClient(base_url=base_url, pool_size=pool_size)
+        if cache_path:
+            disk_cache = SQLiteCache(cache_path, ttl=release_ttl) if release_ttl else SQLiteCache(cache_path)
+            client = CachedRxNavClient(client, disk_cache)
+        client = CachedRxNavClient(SingleFlightRxNavClient(client), TTLCache(ttl=release_ttl) if release_ttl else None)
+
+    if ndc_map_path:
+        from ndc_map import CompactNdcMap, FastPathRxNavClient
+        client = FastPathRxNavClient(CompactNdcMap(ndc_map_path), client)
+    return client
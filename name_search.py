@@ -0,0 +1,256 @@
+import argparse
+import array
+import bisect
+import heapq
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+import urllib.parse
+from collections import Counter
+
+from rxnorm_index import INDEX_PATH
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Search defaults (change these if needed)
+TOP_K = 10  # Suggestions returned when the caller doesn't ask for a number
+MAX_K = 50  # Most suggestions returned for one query
+KEY_LENGTH = 24  # Characters of each name suffix kept in the sorted key list
+MIN_SIMILARITY = 0.3  # Trigram similarity a misspelled word needs to be corrected
+
+# Term types listed first when several names match equally well
+TTY_ORDER = ("IN", "BN", "MIN", "PIN", "SCD", "SBD", "GPCK", "BPCK", "SCDF", "SBDF", "SCDC", "SBDC", "DF")
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+# Lower-case a name or query and reduce punctuation and runs of spaces to
+# single spaces, so "Acetaminophen 325 MG/ML" and "acetaminophen 325 mg ml" match
+def normalize_name(text):
+    return _NON_WORD.sub(" ", unicodedata.normalize("NFKC", str(text)).casefold()).strip()
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Typeahead index over RxNorm concept names and synonyms:
+#   - prefix search: every name is entered once at its start and once at each
+#     later word that starts with a letter, as a suffix truncated to
+#     KEY_LENGTH characters. The suffixes are kept sorted, so the matches for a
+#     prefix are one contiguous range found with bisect (the same lookups as a
+#     prefix trie, with one string per entry instead of one node per character).
+#     Entries carry a precomputed rank (name start before later word, then term
+#     type, then shorter name), and the best k of a range are picked with
+#     NumPy's argpartition when NumPy is installed.
+#   - fuzzy search: a trigram inverted index over the distinct words of all
+#     names. When a prefix search finds fewer than k concepts, query words that
+#     start no known word are replaced by their most similar known word and the
+#     prefix search runs again.
+class NameIndex:
+    def __init__(self, concepts):
+        self.rxcuis = []
+        self.names = []
+        self.ttys = []
+        entries = []
+        words = set()
+        tty_rank = {tty: i for i, tty in enumerate(TTY_ORDER)}
+        for rxcui, name, tty in concepts:
+            normalized = normalize_name(name)
+            if not normalized:
+                continue
+            concept = len(self.rxcuis)
+            self.rxcuis.append(rxcui)
+            self.names.append(name)
+            self.ttys.append(tty)
+            rank = tty_rank.get(tty, len(TTY_ORDER)) * 1000 + min(len(normalized), 999)
+            offset = 0
+            for word in normalized.split(" "):
+                if offset == 0 or word[0].isalpha():
+                    entries.append((normalized[offset:offset + KEY_LENGTH], rank + (100000 if offset else 0),
+                                    concept, offset))
+                if word[0].isalpha():
+                    words.add(word)
+                offset += len(word) + 1
+
+        entries.sort()
+        self.keys = [entry[0] for entry in entries]
+        self.concepts = array.array("I", (entry[2] for entry in entries))
+        self.offsets = array.array("H", (min(entry[3], 65535) for entry in entries))
+        ranks = array.array("I", (entry[1] for entry in entries))
+        self.ranks = np.frombuffer(ranks, dtype=np.uint32) if np is not None else ranks
+        self.normalized = None  # built on first query longer than KEY_LENGTH
+
+        self.words = sorted(words)
+        grams = {}
+        self.gram_counts = array.array("H")  # distinct trigrams of each word, for the similarity score
+        for i, word in enumerate(self.words):
+            word_grams = trigrams(word)
+            self.gram_counts.append(min(len(word_grams), 65535))
+            for gram in word_grams:
+                grams.setdefault(gram, array.array("I")).append(i)
+        self.trigram_index = grams
+
+    def __len__(self):
+        return len(self.rxcuis)
+
+    # Concept numbers whose names have a word starting with prefix, best first
+    def _prefix_matches(self, prefix, limit):
+        key = prefix[:KEY_LENGTH]
+        lo = bisect.bisect_left(self.keys, key)
+        hi = bisect.bisect_left(self.keys, key + "\uffff", lo)
+        if lo == hi:
+            return []
+        want = limit * 4  # a concept can match at several words; take extra before deduping
+        if np is not None and hi - lo > want:
+            ranks = self.ranks[lo:hi]
+            best = np.argpartition(ranks, want)[:want]
+            positions = (lo + best[np.argsort(ranks[best], kind="stable")]).tolist()
+        elif np is not None:
+            positions = (lo + np.argsort(self.ranks[lo:hi], kind="stable")).tolist()
+        else:
+            positions = heapq.nsmallest(want, range(lo, hi), key=self.ranks.__getitem__)
+
+        if len(prefix) > KEY_LENGTH:
+            if self.normalized is None:
+                self.normalized = [normalize_name(name) for name in self.names]
+            positions = [p for p in positions
+                         if self.normalized[self.concepts[p]].startswith(prefix, self.offsets[p])]
+        return self._unique(self.concepts[p] for p in positions)[:limit]
+
+    # Drop concept numbers for an RXCUI already listed (a name and its synonym)
+    def _unique(self, concepts):
+        unique = {}
+        for concept in concepts:
+            unique.setdefault(self.rxcuis[concept], concept)
+        return list(unique.values())
+
+    # Known word most similar to word by trigram overlap (Jaccard similarity of
+    # their trigram sets, at least MIN_SIMILARITY), or None
+    def correct_word(self, word):
+        grams = trigrams(word)
+        counts = Counter()
+        for gram in grams:
+            counts.update(self.trigram_index.get(gram, ()))
+        best, best_score = None, MIN_SIMILARITY
+        for i, shared in counts.most_common(50):
+            score = shared / (len(grams) + self.gram_counts[i] - shared)
+            if score > best_score:
+                best, best_score = self.words[i], score
+        return best
+
+    def _is_known_prefix(self, word):
+        i = bisect.bisect_left(self.words, word)
+        return i < len(self.words) and self.words[i].startswith(word)
+
+    # Top k concepts for a typed query as dicts with rxcui, name and tty
+    def suggest(self, query, k=TOP_K):
+        k = max(1, min(int(k), MAX_K))
+        query = normalize_name(query)
+        if not query:
+            return []
+        found = self._prefix_matches(query, k)
+        if len(found) < k:
+            words = query.split(" ")
+            corrected = [word if not word[0].isalpha() or self._is_known_prefix(word) else self.correct_word(word)
+                         for word in words]
+            if None not in corrected and corrected != words:
+                found = self._unique(found + self._prefix_matches(" ".join(corrected), k))[:k]
+        return [{"rxcui": self.rxcuis[c], "name": self.names[c], "tty": self.ttys[c]} for c in found]
+
+
+# Read the unsuppressed concepts of a built RxNorm index as (rxcui, name, tty),
+# with each synonym as an extra entry for the same concept
+def read_index_names(index_path=INDEX_PATH):
+    conn = sqlite3.connect(f"file:{os.path.abspath(index_path)}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT rxcui, name, synonym, tty FROM concept WHERE suppress = 'N'").fetchall()
+    finally:
+        conn.close()
+    for rxcui, name, synonym, tty in rows:
+        yield rxcui, name, tty
+        if synonym and synonym != name:
+            yield rxcui, synonym, tty
+
+
+def build_name_index(index_path=INDEX_PATH):
+    return NameIndex(read_index_names(index_path))
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+# Return the name index for a RxNorm index file if it has been built, else None
+def loaded_name_index(index_path):
+    return _indexes.get(index_path)
+
+
+# Return the name index for a RxNorm index file, building it on first use
+def get_name_index(index_path):
+    name_index = _indexes.get(index_path)
+    if name_index is None:
+        with _indexes_lock:
+            name_index = _indexes.get(index_path)
+            if name_index is None:
+                name_index = _indexes[index_path] = build_name_index(index_path)
+    return name_index
+
+
+# Build the name index for a RxNorm index file ahead of the first
+# /api/suggest request, which would otherwise build it (seconds for a full
+# release) while every other suggest request waits. A missing or unreadable
+# index is only reported here; /api/suggest answers 503 for it.
+def load_name_index(index_path):
+    if not index_path:
+        return None
+    started = time.perf_counter()
+    try:
+        name_index = get_name_index(index_path)
+    except Exception as e:
+        print(f"Could not load the name search index {index_path}: {e}", file=sys.stderr)
+        return None
+    print(f"Loaded {len(name_index)} names from {index_path} in {time.perf_counter() - started:.1f}s",
+          file=sys.stderr)
+    return name_index
+
+
+# Answer GET /api/suggest?q=...&k=... as (status, payload). Shared by the
+# http.server handlers (api.JsonApiMixin) and the ASGI converter.
+def suggest_response(query_string, index_path):
+    params = urllib.parse.parse_qs(query_string)
+    query = params.get("q", [""])[0]
+    try:
+        k = int(params.get("k", [TOP_K])[0])
+    except ValueError:
+        return 400, {"error": "k must be a number"}
+    if not index_path:
+        return 503, {"error": "Name search needs a local RxNorm index (set RXNORM_NAME_INDEX)"}
+    try:
+        name_index = get_name_index(index_path)
+    except sqlite3.Error as e:
+        return 503, {"error": f"Name search index {index_path} is not readable: {e}"}
+    return 200, {"query": query, "suggestions": name_index.suggest(query, k)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search RxNorm names from a local index (typeahead and fuzzy)")
+    parser.add_argument("query", nargs="+", help="name, start of a name, or misspelled name")
+    parser.add_argument("--index", default=INDEX_PATH, help="built RxNorm index (see rxnorm_index.py)")
+    parser.add_argument("-k", type=int, default=TOP_K, help="suggestions to show")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    name_index = build_name_index(args.index)
+    print(f"Indexed {len(name_index)} names in {time.perf_counter() - started:.2f}s")
+    for query in args.query:
+        for suggestion in name_index.suggest(query, args.k):
+            print(f"{query}\t{suggestion['rxcui']}\t{suggestion['tty']}\t{suggestion['name']}")
@@ -0,0 +1,126 @@
+import argparse
+import csv
+import sys
+
+import rxnav_client
+from batch import RowWriter, WORKERS, dedupe, read_codes, resolve_concurrently
+from rxnav_client import HISTORY, rxcui_to_historical_ndcs
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Expansion defaults (change these if needed)
+ROW_GROUP_SIZE = 100000  # Edges buffered per Parquet row group
+
+EDGE_FIELDS = ["rxcui", "ndc", "status", "start_date", "end_date"]
+
+
+# Write edges as CSV, one line per RXCUI-NDC link (or per row of another
+# table with the given fields)
+class CsvEdgeWriter:
+    def __init__(self, f, fields=EDGE_FIELDS):
+        self.f = f
+        self.writer = csv.writer(f, lineterminator="\n")
+        self.writer.writerow(fields)
+
+    def write(self, edges):
+        self.writer.writerows(edges)
+
+    def close(self):
+        if self.f is not sys.stdout:
+            self.f.close()
+
+
+# Write edges to a Parquet file in row groups of ROW_GROUP_SIZE, so only one
+# group is held in memory. Dictionary encoding and zstd keep the repeated
+# RXCUI and status columns small.
+class ParquetEdgeWriter:
+    def __init__(self, path, row_group_size=ROW_GROUP_SIZE, fields=EDGE_FIELDS):
+        if pa is None:
+            raise Exception("Parquet output needs pyarrow (pip install pyarrow)")
+        self.schema = pa.schema([(field, pa.string()) for field in fields])
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd", use_dictionary=True)
+        self.row_group_size = row_group_size
+        self.buffer = []
+
+    def write(self, edges):
+        self.buffer.extend(edges)
+        if len(self.buffer) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            columns = [[str(value) for value in column] for column in zip(*self.buffer)]
+            self.writer.write_table(pa.Table.from_arrays([pa.array(column, pa.string()) for column in columns],
+                                                         schema=self.schema))
+            self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+# Open an edge writer for path: Parquet for .parquet files, CSV otherwise ("-" is stdout)
+def open_edge_writer(path, fields=EDGE_FIELDS):
+    if path.endswith(".parquet"):
+        return ParquetEdgeWriter(path, fields=fields)
+    f = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+    return CsvEdgeWriter(f, fields)
+
+
+# Resolve RXCUIs concurrently and yield (row, edges) per unique RXCUI as each
+# finishes. row is the batch status row; edges is a list of
+# (rxcui, ndc, status, start_date, end_date) tuples, empty when the lookup failed.
+def expand_rxcuis(rxcuis, history=HISTORY, workers=WORKERS):
+    def lookup(rxcui):
+        ndcs, _ = rxcui_to_historical_ndcs(rxcui, history)
+        return {"edges": [(rxcui, *ndc) for ndc in ndcs]}
+
+    for row in resolve_concurrently(dedupe(rxcuis, set()), lookup, "rxcui", workers):
+        yield row, row.pop("edges", [])
+
+
+# Stream the RXCUI-NDC edge list for every RXCUI in input_path to output_path.
+# Failed RXCUIs are written to errors_path if given. Returns counts by status.
+def run_expansion(input_path, output_path="-", history=HISTORY, workers=WORKERS, column=None,
+                  errors_path=None):
+    writer = open_edge_writer(output_path)
+    errors = RowWriter(errors_path, "csv", ["rxcui", "status", "error"]) if errors_path else None
+    counts = {"edges": 0}
+    try:
+        for row, edges in expand_rxcuis(read_codes(input_path, column), history, workers):
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+            if edges:
+                writer.write(edges)
+                counts["edges"] += len(edges)
+            elif errors is not None:
+                errors.write(row)
+    finally:
+        writer.close()
+        if errors is not None:
+            errors.close()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Expand RXCUIs to every NDC they have had (RXCUI-NDC edge list)")
+    parser.add_argument("--input", required=True, help="file of RXCUIs (CSV, JSONL or one per line; '-' for stdin)")
+    parser.add_argument("--output", default="-", help="CSV or .parquet file to write (default: CSV on stdout)")
+    parser.add_argument("--column", help="CSV column or JSON key holding the RXCUIs")
+    parser.add_argument("--history", type=int, choices=[0, 1, 2], default=HISTORY,
+                        help="0 = current NDCs, 1 = + obsolete NDCs, 2 = + NDCs of remapped concepts")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="lookups in flight at once")
+    parser.add_argument("--errors", help="CSV file for RXCUIs that could not be expanded")
+    parser.add_argument("--index", help="answer lookups from a local RxNorm index (current NDCs only)")
+    args = parser.parse_args()
+
+    if args.index:
+        from rxnorm_index import LocalRxNormIndex
+        rxnav_client.set_client(LocalRxNormIndex(args.index))
+
+    counts = run_expansion(args.input, args.output, history=args.history, workers=args.workers,
+                           column=args.column, errors_path=args.errors)
+    print(", ".join(f"{status}: {count}" for status, count in counts.items()), file=sys.stderr)
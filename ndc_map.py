@@ -0,0 +1,209 @@
+import argparse
+import array
+import bisect
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+
+from ndc_normalize import normalize_ndc
+from rxnav_client import HISTORY, RELATED_TTYS, NotFoundError
+from rxnorm_index import INDEX_PATH
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Default location of the packed map (change this if needed)
+MAP_PATH = "ndc_map.bin"
+
+# File layout (little-endian, every array 8-byte aligned):
+#   header       magic, edge count n, RXCUI count m, release tag
+#   fwd_ndcs     int64[n]   NDCs as integers, sorted (then by RXCUI)
+#   rev_ndcs     int64[n]   NDCs grouped by RXCUI, sorted within each group
+#   fwd_rxcuis   uint32[n]  RXCUI for each entry of fwd_ndcs
+#   rxcuis       uint32[m]  distinct RXCUIs, sorted
+#   offsets      uint32[m+1] rev_ndcs[offsets[i]:offsets[i+1]] are the NDCs of rxcuis[i] (CSR)
+# An entry costs 20 bytes, against several hundred for a dict of str keys.
+MAGIC = b"NDCMAP1\0"
+HEADER = struct.Struct("<8sQQ32s8x")
+
+
+def _padded(data):
+    return data + b"\0" * (-len(data) % 8)
+
+
+# Pack (ndc, rxcui) pairs into a map file. NDCs must already be in the
+# 11-digit form; pairs that don't fit (non-numeric codes) are skipped. The file
+# is written next to the target and renamed into place, so processes that
+# have the old file mapped keep a consistent view.
+def build_map(pairs, map_path=MAP_PATH, release=""):
+    edges = set()
+    for ndc, rxcui in pairs:
+        ndc, rxcui = str(ndc).strip(), str(rxcui).strip()
+        if len(ndc) == 11 and ndc.isdigit() and rxcui.isdigit() and int(rxcui) < 2 ** 32:
+            edges.add((int(ndc), int(rxcui)))
+
+    forward = sorted(edges)
+    reverse = sorted(edges, key=lambda edge: (edge[1], edge[0]))
+    rxcuis = array.array("I")
+    offsets = array.array("I")
+    for i, (_, rxcui) in enumerate(reverse):
+        if not rxcuis or rxcuis[-1] != rxcui:
+            rxcuis.append(rxcui)
+            offsets.append(i)
+    offsets.append(len(reverse))
+
+    sections = [
+        array.array("q", (ndc for ndc, _ in forward)),
+        array.array("q", (ndc for ndc, _ in reverse)),
+        array.array("I", (rxcui for _, rxcui in forward)),
+        rxcuis,
+        offsets,
+    ]
+    if sys.byteorder != "little":
+        for section in sections:
+            section.byteswap()
+
+    tmp_path = f"{map_path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(forward), len(rxcuis), release.encode("utf-8")[:32]))
+        for section in sections:
+            f.write(_padded(section.tobytes()))
+    os.replace(tmp_path, map_path)
+    return {"ndcs": len(forward), "rxcuis": len(rxcuis), "bytes": os.path.getsize(map_path)}
+
+
+# Build a map from the ndc_rxcui table of a built RxNorm index
+def build_map_from_index(index_path=INDEX_PATH, map_path=MAP_PATH):
+    conn = sqlite3.connect(f"file:{os.path.abspath(index_path)}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'release'").fetchone()
+        return build_map(conn.execute("SELECT ndc, rxcui FROM ndc_rxcui"), map_path, release=row[0] if row else "")
+    finally:
+        conn.close()
+
+
+# Read-only NDC<->RXCUI map backed by a memory-mapped file. Forward lookups
+# binary-search fwd_ndcs; reverse lookups binary-search rxcuis and slice
+# rev_ndcs with the CSR offsets. Pages are shared by every process that maps
+# the same file. Answers ndc_to_rxcui and rxcui_to_ndc like the other backends.
+class CompactNdcMap:
+    def __init__(self, map_path=MAP_PATH):
+        if sys.byteorder != "little":
+            raise Exception("CompactNdcMap needs a little-endian machine")
+        self.map_path = map_path
+        self.base_url = f"map://{os.path.basename(map_path)}"
+        with open(map_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, n, m, release = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise Exception(f"Not an NDC map file: {map_path}")
+        self.release = release.rstrip(b"\0").decode("utf-8")
+        self.size = n
+
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+
+        def section(fmt, count):
+            nonlocal offset
+            length = count * struct.calcsize(fmt)
+            data = view[offset:offset + length].cast(fmt)
+            offset += length + (-length % 8)
+            return data
+
+        self.fwd_ndcs = section("q", n)
+        self.rev_ndcs = section("q", n)
+        self.fwd_rxcuis = section("I", n)
+        self.rxcuis = section("I", m)
+        self.offsets = section("I", m + 1)
+
+    def __len__(self):
+        return self.size
+
+    def ndc_to_rxcui(self, ndc):
+        ndc = normalize_ndc(ndc)
+        url = f"{self.base_url}/ndcstatus?ndc={ndc}"
+        if len(ndc) == 11:
+            key = int(ndc)
+            i = bisect.bisect_left(self.fwd_ndcs, key)
+            if i < self.size and self.fwd_ndcs[i] == key:
+                return str(self.fwd_rxcuis[i]), url
+        raise NotFoundError("RXCUI not found for the given NDC")
+
+    def rxcui_to_ndc(self, rxcui):
+        rxcui = str(rxcui).strip()
+        url = f"{self.base_url}/rxcui/{rxcui}/ndcs"
+        if rxcui.isdigit():
+            key = int(rxcui)
+            i = bisect.bisect_left(self.rxcuis, key)
+            if i < len(self.rxcuis) and self.rxcuis[i] == key:
+                return [f"{ndc:011d}" for ndc in self.rev_ndcs[self.offsets[i]:self.offsets[i + 1]]], url
+        raise NotFoundError("NDC not found for the given RXCUI")
+
+    # Look up many canonical 11-digit NDCs at once with NumPy. Returns an
+    # array of RXCUIs with 0 where the NDC is not in the map.
+    def bulk_ndc_to_rxcui(self, ndcs):
+        if np is None:
+            raise Exception("bulk_ndc_to_rxcui needs numpy")
+        keys = np.asarray(ndcs, dtype=str).astype(np.int64)
+        if self.size == 0:
+            return np.zeros(len(keys), dtype=np.uint32)
+        fwd_ndcs = np.frombuffer(self.fwd_ndcs, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(fwd_ndcs, keys), self.size - 1)
+        found = fwd_ndcs[positions] == keys
+        return np.where(found, np.frombuffer(self.fwd_rxcuis, dtype=np.uint32)[positions], 0)
+
+    def close(self):
+        for name in ("fwd_ndcs", "rev_ndcs", "fwd_rxcuis", "rxcuis", "offsets"):
+            getattr(self, name).release()
+        self._mmap.close()
+
+
+# Answers ndc_to_rxcui and rxcui_to_ndc from a CompactNdcMap and passes
+# misses, and every other lookup, to the wrapped client
+class FastPathRxNavClient:
+    def __init__(self, ndc_map, client):
+        self.ndc_map = ndc_map
+        self.client = client
+
+    def ndc_to_rxcui(self, ndc):
+        try:
+            return self.ndc_map.ndc_to_rxcui(ndc)
+        except NotFoundError:
+            return self.client.ndc_to_rxcui(ndc)
+
+    def rxcui_to_ndc(self, rxcui):
+        try:
+            return self.ndc_map.rxcui_to_ndc(rxcui)
+        except NotFoundError:
+            return self.client.rxcui_to_ndc(rxcui)
+
+    def get_rxcui_info(self, rxcui):
+        return self.client.get_rxcui_info(rxcui)
+
+    def rxcui_to_historical_ndcs(self, rxcui, history=HISTORY):
+        return self.client.rxcui_to_historical_ndcs(rxcui, history)
+
+    def get_related(self, rxcui, ttys=RELATED_TTYS):
+        return self.client.get_related(rxcui, ttys)
+
+    def get_version(self):
+        return self.client.get_version()
+
+    def close(self):
+        self.ndc_map.close()
+        self.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack the NDC-RXCUI pairs of a RxNorm index into a compact map")
+    parser.add_argument("--index", default=INDEX_PATH, help="built RxNorm index (see rxnorm_index.py)")
+    parser.add_argument("--output", default=MAP_PATH, help="map file to write")
+    args = parser.parse_args()
+
+    summary = build_map_from_index(args.index, args.output)
+    print(f"{summary['ndcs']} NDCs, {summary['rxcuis']} RXCUIs, {summary['bytes']} bytes -> {args.output}")
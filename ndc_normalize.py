@@ -0,0 +1,120 @@
+import re
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Hyphenated NDC layouts (labeler-product-package digit counts) and where the
+# leading zero goes to turn each into the 11-digit 5-4-2 HIPAA form
+SEGMENT_PADDING = {
+    (4, 4, 2): 0,
+    (5, 3, 2): 1,
+    (5, 4, 1): 2,
+    (5, 4, 2): None,
+}
+
+_NDC_RE = re.compile(r"([0-9]{4,5})-([0-9]{3,4})-([0-9]{1,2})|([0-9]{10,11})")
+
+
+# Raised for input that cannot be an NDC; checked locally, before any lookup
+class InvalidNDCError(ValueError):
+    pass
+
+
+# Canonicalize one NDC to its 11-digit form.
+#   "0002-3227-30" (4-4-2), "50580-488-01" (5-3-2), "00093-7171-1" (5-4-1)
+#   and "00002-3227-30" (5-4-2) all become 11 digits without hyphens.
+# A bare 10-digit string is ambiguous (the missing zero could belong to any
+# segment), so it is returned unchanged for RxNav to interpret.
+def normalize_ndc(ndc):
+    text = str(ndc).strip() if ndc is not None else ""
+    match = _NDC_RE.fullmatch(text)
+    if not match:
+        raise InvalidNDCError(f"Invalid NDC format: {text!r}")
+    if match.group(4):
+        return text
+
+    segments = match.group(1, 2, 3)
+    layout = tuple(len(segment) for segment in segments)
+    if layout not in SEGMENT_PADDING:
+        raise InvalidNDCError(f"Invalid NDC format: {text!r}")
+    pad = SEGMENT_PADDING[layout]
+    return "".join("0" + segment if i == pad else segment for i, segment in enumerate(segments))
+
+
+# Return True if ndc is a well-formed NDC
+def is_valid_ndc(ndc):
+    try:
+        normalize_ndc(ndc)
+        return True
+    except InvalidNDCError:
+        return False
+
+
+# Canonicalize many NDCs at once. Lists (or other iterables) give back a list
+# with None for invalid entries; a NumPy string array is handled with array
+# operations and gives back (canonical, valid) arrays.
+def normalize_ndcs(ndcs):
+    if np is not None and isinstance(ndcs, np.ndarray):
+        return _normalize_array(ndcs)
+
+    result = []
+    for ndc in ndcs:
+        try:
+            result.append(normalize_ndc(ndc))
+        except InvalidNDCError:
+            result.append(None)
+    return result
+
+
+# Index templates that pick the 11 canonical digits out of a 13-character NDC
+# row for each layout; index 13 is an extra column holding "0"
+if np is not None:
+    _ZERO = 13
+    _TEMPLATES = np.array([
+        [_ZERO, 0, 1, 2, 3, 5, 6, 7, 8, 10, 11],  # 4-4-2
+        [0, 1, 2, 3, 4, _ZERO, 6, 7, 8, 10, 11],  # 5-3-2
+        [0, 1, 2, 3, 4, 6, 7, 8, 9, _ZERO, 11],   # 5-4-1
+        [0, 1, 2, 3, 4, 6, 7, 8, 9, 11, 12],      # 5-4-2
+        [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10],       # bare 11 digits
+    ])
+
+
+def _normalize_array(ndcs):
+    text = np.char.strip(np.asarray(ndcs, dtype=str))
+    if text.ndim != 1:
+        text = text.ravel()
+    lengths = np.char.str_len(text)
+
+    # View each string as a row of UTF-32 code points, padded/cut to 13 columns
+    width = text.dtype.itemsize // 4
+    codes = np.ascontiguousarray(text).view(np.uint32).reshape(len(text), width)
+    chars = np.zeros((len(text), 14), dtype=np.uint32)
+    chars[:, :min(width, 13)] = codes[:, :13]
+    chars[:, 13] = ord("0")
+
+    digits = (chars[:, :13] >= ord("0")) & (chars[:, :13] <= ord("9"))
+    hyphens = chars[:, :13] == ord("-")
+    clean = np.all(digits | hyphens | (chars[:, :13] == 0), axis=1) & (lengths <= 13)
+    hyphen_count = hyphens.sum(axis=1)
+
+    # Segment lengths from the first and last hyphen positions
+    first = np.argmax(hyphens, axis=1)
+    last = 12 - np.argmax(hyphens[:, ::-1], axis=1)
+    layout = np.stack([first, last - first - 1, lengths - last - 1], axis=1)
+
+    template = np.full(len(text), -1)
+    hyphenated = clean & (hyphen_count == 2)
+    for i, segments in enumerate(((4, 4, 2), (5, 3, 2), (5, 4, 1), (5, 4, 2))):
+        template[hyphenated & np.all(layout == segments, axis=1)] = i
+    template[clean & (hyphen_count == 0) & (lengths == 11)] = 4
+
+    valid = template >= 0
+    picked = np.take_along_axis(chars, _TEMPLATES[np.where(valid, template, 4)], axis=1)
+    canonical = np.where(valid, np.ascontiguousarray(picked).view("U11").ravel(), "")
+
+    # Bare 10-digit NDCs are ambiguous and pass through unchanged
+    ten_digit = clean & (hyphen_count == 0) & (lengths == 10)
+    canonical = np.where(ten_digit, text, canonical)
+    return canonical, valid | ten_digit
@@ -1,69 +1,35 @@
-import requests
+import argparse
+import sys
+
+import rxnav_client
+from batch import add_batch_arguments, canonical_ndcs, run_batch
+from rxnav_client import ndc_to_rxcui
+
+
+# Batch lookup: one output row per NDC
+def lookup_row(ndc):
+    rxcui, _ = ndc_to_rxcui(ndc)
+    return {"rxcui": rxcui}
 
-def ndc_to_rxcui(ndc):
-    url = f"https://rxnav.nlm.nih.gov/REST/ndcstatus.json?ndc={ndc}"
-    response = requests.get(url)
-    
-    if response.status_code != 200:
-        raise Exception(f"API request failed with status code {response.status_code}")
-    
-    data = response.json()
-    
-    if 'ndcStatus' in data and 'rxcui' in data['ndcStatus']:
-        return data['ndcStatus']['rxcui']
-    else:
-        raise Exception("RXCUI not found for the given NDC")
 
 if __name__ == "__main__":
-    ndc = input("Enter the NDC: ")
-    try:
-        rxcui = ndc_to_rxcui(ndc)
-        print(f"The RXCUI for NDC {ndc} is {rxcui}")
-    except Exception as e:
-        print(e)        from flask import Flask, request, render_template_string
-        import requests
-        
-        app = Flask(__name__)
-        
-        def ndc_to_rxcui(ndc):
-            url = f"https://rxnav.nlm.nih.gov/REST/ndcstatus.json?ndc={ndc}"
-            response = requests.get(url)
-            
-            if response.status_code != 200:
-                raise Exception(f"API request failed with status code {response.status_code}")
-            
-            data = response.json()
-            
-            if 'ndcStatus' in data and 'rxcui' in data['ndcStatus']:
-                return data['ndcStatus']['rxcui']
-            else:
-                raise Exception("RXCUI not found for the given NDC")
-        
-        @app.route('/', methods=['GET', 'POST'])
-        def index():
-            rxcui = None
-            error = None
-            if request.method == 'POST':
-                ndc = request.form['ndc']
-                try:
-                    rxcui = ndc_to_rxcui(ndc)
-                except Exception as e:
-                    error = str(e)
-            return render_template_string('''
-                <!doctype html>
-                <title>NDC to RXCUI Converter</title>
-                <h1>NDC to RXCUI Converter</h1>
-                <form method=post>
-                    <label for=ndc>NDC:</label>
-                    <input type=text name=ndc>
-                    <input type=submit value=Convert>
-                </form>
-                {% if rxcui %}
-                    <h2>The RXCUI for NDC {{ ndc }} is {{ rxcui }}</h2>
-                {% elif error %}
-                    <h2>Error: {{ error }}</h2>
-                {% endif %}
-            ''', rxcui=rxcui, error=error)
-        
-        if __name__ == "__main__":
-            app.run(debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Convert NDCs to RXCUIs")
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+
+    if args.index:
+        from rxnorm_index import LocalRxNormIndex
+        rxnav_client.set_client(LocalRxNormIndex(args.index))
+
+    if args.input:
+        counts = run_batch(lookup_row, "ndc", ["rxcui"], args.input, args.output, fmt=args.format,
+                           workers=args.workers, resume=args.resume, column=args.column,
+                           canonicalize=canonical_ndcs)
+        print(", ".join(f"{status}: {count}" for status, count in counts.items()), file=sys.stderr)
+    else:
+        ndc = input("Enter the NDC: ")
+        try:
+            rxcui, _ = ndc_to_rxcui(ndc)
+            print(f"The RXCUI for NDC {ndc} is {rxcui}")
+        except Exception as e:
+            print(e)
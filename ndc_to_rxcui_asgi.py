@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import json
+import time
+import urllib.parse
+
+import metrics
+import pages
+from async_resolver import AsyncRxNavClient
+from instrumentation import REQUEST_SECONDS, REQUESTS, record_error, route_of
+from lookup_cache import TTLCache
+from lookup_config import BASE_URL, NAME_INDEX_PATH
+from name_search import load_name_index, loaded_name_index, suggest_response
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+# Define the port number for the server
+PORT = 8080  # Change the port number here if needed
+
+# ASGI app defaults (change these if needed)
+POOL_SIZE = 100  # Keep-alive connections to RxNav per worker process
+MAX_BODY = 64 * 1024  # Largest form body accepted, in bytes
+WORKERS = 4  # Worker processes started by `python ndc_to_rxcui_asgi.py`
+
+# Page templates, compiled once at import (see pages.py). {{name}} fields are
+# HTML-escaped when rendered.
+PAGE_HEAD = '''<!doctype html>
+<html>
+<head>
+    <title>NDC to RXCUI Converter</title>
+</head>
+<body>
+    <h1>NDC to RXCUI Converter</h1>
+    <form method="post">
+        <label for="ndc" title="National Drug Code (NDC) is a unique identifier for medicines in the United States.">NDC:</label>
+        <input type="text" name="ndc">
+        <br>
+        <input type="checkbox" name="show_urls" value="yes" {{checked}}>
+        <label for="show_urls">Show API URLs</label>
+        <br>
+        <input type="submit" value="Convert">
+    </form>
+'''
+PAGE_FOOT = '''</body>
+</html>
+'''
+
+INDEX_PAGE = pages.StaticPage(pages.Template(PAGE_HEAD + PAGE_FOOT).render())
+
+RESULT_PAGE = pages.Template(PAGE_HEAD + '''    <h2>The RXCUI for NDC {{ndc}} is {{rxcui}}</h2>
+    <h3>Term Type (TTY): {{term_type}}</h3>
+    <button type="button" onclick="toggleTermTypes()">Show Term Types</button>
+    <div id="termTypes" style="display:none;">
+        <p><strong>BN:</strong> Brand Name</p>
+        <p><strong>IN:</strong> Ingredient</p>
+        <p><strong>PIN:</strong> Precise Ingredient</p>
+        <p><strong>MIN:</strong> Multiple Ingredients</p>
+        <p><strong>SCD:</strong> Semantic Clinical Drug</p>
+        <p><strong>SBD:</strong> Semantic Branded Drug</p>
+        <p><strong>GPCK:</strong> Generic Pack</p>
+        <p><strong>BPCK:</strong> Branded Pack</p>
+    </div>
+    <h3>Name: {{name}}</h3>
+{{api_urls}}    <script>
+        function toggleTermTypes() {
+            var x = document.getElementById("termTypes");
+            if (x.style.display === "none") {
+                x.style.display = "block";
+            } else {
+                x.style.display = "none";
+            }
+        }
+    </script>
+''' + PAGE_FOOT)
+
+API_URLS = pages.Template('''    <p>API URL used for NDC: <a href="{{ndc_url}}" target="_blank">{{ndc_url}}</a></p>
+    <p>API URL used for RXCUI: <a href="{{rxcui_url}}" target="_blank">{{rxcui_url}}</a></p>
+''')
+
+ERROR_PAGE = pages.Template(PAGE_HEAD + "    <h2>Error: {{error}}</h2>\n" + PAGE_FOOT)
+
+
+# Async version of the NDC to RXCUI converter as a plain ASGI app, for uvicorn
+# or any other ASGI server:
+#   GET  /          the form (cached, see pages.StaticPage)
+#   POST /          convert the NDC in the form
+#   GET  /metrics   Prometheus metrics
+#   GET  /api/suggest?q=...  drug name suggestions (see name_search.py)
+# Lookups go through one AsyncRxNavClient per worker process, so a process
+# holds many lookups in flight on a single event loop and one aiohttp
+# connection pool. The client is opened and closed with the ASGI lifespan
+# (or on first use under servers that don't send lifespan events).
+class ConverterApp:
+    def __init__(self, base_url=BASE_URL, pool_size=POOL_SIZE):
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.client = None
+
+    def open_client(self):
+        if self.client is None:
+            self.client = AsyncRxNavClient(base_url=self.base_url, pool_size=self.pool_size, cache=TTLCache())
+        return self.client
+
+    async def close_client(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.handle(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.open_client()
+                await self.load_name_index()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.close_client()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def handle(self, scope, receive, send):
+        started = time.perf_counter()
+        method, path = scope["method"], scope["path"]
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope["headers"]}
+
+        if path == "/metrics" and method == "GET":
+            status, response_headers, body = 200, [
+                ("Content-Type", "text/plain; version=0.0.4; charset=utf-8")], metrics.REGISTRY.render().encode('utf-8')
+        elif path == "/" and method in ("GET", "HEAD"):
+            status, response_headers, body = INDEX_PAGE.response(headers.get("if-none-match"),
+                                                                 headers.get("accept-encoding"))
+        elif path == "/" and method == "POST":
+            status, response_headers, body = await self.convert(receive)
+        elif path == "/api/suggest" and method == "GET":
+            status, payload = await self.suggest(scope["query_string"].decode('latin-1'))
+            response_headers, body = [("Content-Type", "application/json")], json.dumps(payload).encode('utf-8')
+        else:
+            status, response_headers, body = 404, [("Content-Type", "text/plain; charset=utf-8")], b"Not Found"
+
+        if not any(name == "Content-Length" for name, _ in response_headers):
+            response_headers.append(("Content-Length", str(len(body))))
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                for name, value in response_headers]})
+        await send({"type": "http.response.body", "body": body if method != "HEAD" else b""})
+
+        route = route_of(path)
+        REQUESTS.inc(method=method, route=route, status=status)
+        REQUEST_SECONDS.observe(time.perf_counter() - started, method=method, route=route)
+
+    # Build the /api/suggest name index on a worker thread; reading a full
+    # release's names takes seconds and would stall every lookup on the loop
+    async def load_name_index(self):
+        await asyncio.get_running_loop().run_in_executor(None, load_name_index, NAME_INDEX_PATH)
+
+    async def suggest(self, query_string):
+        if NAME_INDEX_PATH and loaded_name_index(NAME_INDEX_PATH) is None:
+            return await asyncio.get_running_loop().run_in_executor(None, suggest_response, query_string,
+                                                                    NAME_INDEX_PATH)
+        return suggest_response(query_string, NAME_INDEX_PATH)
+
+    async def read_body(self, receive):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if len(body) > MAX_BODY:
+                raise ValueError("Request body too large")
+            if not message.get("more_body"):
+                return body
+
+    async def convert(self, receive):
+        client = self.open_client()
+        checked = ''
+        try:
+            params = urllib.parse.parse_qs((await self.read_body(receive)).decode('utf-8'))
+            ndc = params.get('ndc', [None])[0]
+            show_urls = 'show_urls' in params
+            checked = 'checked' if show_urls else ''
+
+            # The properties lookup needs the RXCUI, so these two calls stay serial
+            rxcui, ndc_url = await client.ndc_to_rxcui(ndc)
+            properties, rxcui_url = await client.get_rxcui_info(rxcui)
+            api_urls = API_URLS.render(ndc_url=ndc_url, rxcui_url=rxcui_url) if show_urls else b""
+            body = RESULT_PAGE.render(checked=checked, ndc=ndc, rxcui=rxcui, term_type=properties['tty'],
+                                      name=properties['name'], api_urls=api_urls)
+        except Exception as e:
+            record_error(e)
+            body = ERROR_PAGE.render(checked=checked, error=str(e))
+        return 200, [("Content-Type", "text/html; charset=utf-8"), ("Cache-Control", "no-store")], body
+
+
+app = ConverterApp()
+
+
+# Run under uvicorn with several worker processes. Equivalent to
+#   uvicorn ndc_to_rxcui_asgi:app --port 8080 --workers 4
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the async NDC to RXCUI converter under uvicorn")
+    parser.add_argument("--port", type=int, default=PORT, help="port to listen on")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="worker processes")
+    args = parser.parse_args()
+
+    if uvicorn is None:
+        raise Exception("The ASGI converter needs uvicorn: pip install uvicorn")
+    uvicorn.run("ndc_to_rxcui_asgi:app", host="0.0.0.0", port=args.port, workers=args.workers)
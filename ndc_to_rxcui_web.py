@@ -1,44 +1,20 @@
 import http.server
-import socketserver
 import urllib.parse
-import requests
 
-PORT = 8080  # Change the port number here if needed
+import lookup_config
+import rxnav_client
+import serving
+from rxnav_client import ndc_to_rxcui, get_rxcui_info
 
-def ndc_to_rxcui(ndc):
-    url = f"https://rxnav.nlm.nih.gov/REST/ndcstatus.json?ndc={ndc}"
-    response = requests.get(url)
-    
-    if response.status_code != 200:
-        raise Exception(f"API request failed with status code {response.status_code}")
-    
-    data = response.json()
-    
-    if 'ndcStatus' in data and 'rxcui' in data['ndcStatus']:
-        return data['ndcStatus']['rxcui'], url
-    else:
-        raise Exception("RXCUI not found for the given NDC")
+PORT = 8080  # Change the port number here if needed
 
-def get_rxcui_info(rxcui):
-    url = f"https://rxnav.nlm.nih.gov/REST/rxcui/{rxcui}/properties.json"
-    response = requests.get(url)
-    
-    if response.status_code != 200:
-        raise Exception(f"API request failed with status code {response.status_code}")
-    
-    data = response.json()
-    
-    if 'properties' in data:
-        return data['properties'], url
-    else:
-        raise Exception("Properties not found for the given RXCUI")
+# Serve lookups from the local RxNorm index if one is configured, otherwise
+# from RxNav behind the in-process and on-disk caches (see lookup_config.py)
+rxnav_client.set_client(lookup_config.build_client())
 
 class MyHandler(http.server.SimpleHTTPRequestHandler):
     def do_GET(self):
-        self.send_response(200)
-        self.send_header("Content-type", "text/html")
-        self.end_headers()
-        self.wfile.write(b'''
+        body = b'''
             <!doctype html>
             <title>NDC to RXCUI Converter</title>
             <h1>NDC to RXCUI Converter</h1>
@@ -51,7 +27,12 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
                 <br>
                 <input type="submit" value="Convert">
             </form>
-        ''')
+        '''
+        self.send_response(200)
+        self.send_header("Content-type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
     def do_POST(self):
         content_length = int(self.headers['Content-Length'])
@@ -60,10 +41,6 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
         ndc = params.get('ndc', [None])[0]
         show_urls = 'show_urls' in params
 
-        self.send_response(200)
-        self.send_header("Content-type", "text/html")
-        self.end_headers()
-
         try:
             rxcui, ndc_url = ndc_to_rxcui(ndc)
             properties, rxcui_url = get_rxcui_info(rxcui)
@@ -129,8 +106,13 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
                 <h2>Error: {str(e)}</h2>
             '''
         
-        self.wfile.write(response.encode('utf-8'))
+        body = response.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
-with socketserver.TCPServer(("", PORT), MyHandler) as httpd:
-    print(f"Serving on port {PORT}")
-    httpd.serve_forever()
\ No newline at end of file
+# Start the HTTP server (see serving.py for --mode, --workers and --backlog)
+if __name__ == "__main__":
+    serving.main(MyHandler, PORT)
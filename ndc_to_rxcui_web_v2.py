@@ -1,45 +1,21 @@
 import http.server
-import socketserver
 import urllib.parse
-import requests
 import json
 
-PORT = 8080  # Change the port number here if needed
+import lookup_config
+import rxnav_client
+import serving
+from rxnav_client import ndc_to_rxcui, get_rxcui_info
 
-def ndc_to_rxcui(ndc):
-    url = f"https://rxnav.nlm.nih.gov/REST/ndcstatus.json?ndc={ndc}"
-    response = requests.get(url)
-    
-    if response.status_code != 200:
-        raise Exception(f"API request failed with status code {response.status_code}")
-    
-    data = response.json()
-    
-    if 'ndcStatus' in data and 'rxcui' in data['ndcStatus']:
-        return data['ndcStatus']['rxcui'], url
-    else:
-        raise Exception("RXCUI not found for the given NDC")
+PORT = 8080  # Change the port number here if needed
 
-def get_rxcui_info(rxcui):
-    url = f"https://rxnav.nlm.nih.gov/REST/rxcui/{rxcui}/properties.json"
-    response = requests.get(url)
-    
-    if response.status_code != 200:
-        raise Exception(f"API request failed with status code {response.status_code}")
-    
-    data = response.json()
-    
-    if 'properties' in data:
-        return data['properties'], url
-    else:
-        raise Exception("Properties not found for the given RXCUI")
+# Serve lookups from the local RxNorm index if one is configured, otherwise
+# from RxNav behind the in-process and on-disk caches (see lookup_config.py)
+rxnav_client.set_client(lookup_config.build_client())
 
 class MyHandler(http.server.SimpleHTTPRequestHandler):
     def do_GET(self):
-        self.send_response(200)
-        self.send_header("Content-type", "text/html")
-        self.end_headers()
-        self.wfile.write(b'''
+        body = b'''
             <!doctype html>
             <title>NDC to RXCUI Converter</title>
             <h1>NDC to RXCUI Converter</h1>
@@ -53,7 +29,12 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
                 <input type="submit" value="Convert">
             </form>
             <p><a href="https://github.com/your-username/terminology-data-tools" target="_blank">Python Script Behind This Webpage: Terminology Data Tools Repository</a></p>
-        ''')
+        '''
+        self.send_response(200)
+        self.send_header("Content-type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
     def do_POST(self):
         content_length = int(self.headers['Content-Length'])
@@ -62,10 +43,6 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
         ndc = params.get('ndc', [None])[0]
         show_urls = 'show_urls' in params
 
-        self.send_response(200)
-        self.send_header("Content-type", "text/html")
-        self.end_headers()
-
         try:
             rxcui, ndc_url = ndc_to_rxcui(ndc)
             properties, rxcui_url = get_rxcui_info(rxcui)
@@ -151,7 +128,12 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
                 <p><a href="https://github.com/your-username/terminology-data-tools" target="_blank">Python Script Behind This Webpage: Terminology Data Tools Repository</a></p>
             '''
         
-        self.wfile.write(response.encode('utf-8'))
+        body = response.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
     def do_POST(self):
         if self.path == "/download_json":
@@ -166,10 +148,6 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
         ndc = params.get('ndc', [None])[0]
         show_urls = 'show_urls' in params
 
-        self.send_response(200)
-        self.send_header("Content-type", "text/html")
-        self.end_headers()
-
         try:
             rxcui, ndc_url = ndc_to_rxcui(ndc)
             properties, rxcui_url = get_rxcui_info(rxcui)
@@ -255,7 +233,12 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
                 <p><a href="https://github.com/your-username/terminology-data-tools" target="_blank">Python Script Behind This Webpage: Terminology Data Tools Repository</a></p>
             '''
         
-        self.wfile.write(response.encode('utf-8'))
+        body = response.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
     def do_POST_download_json(self):
         content_length = int(self.headers['Content-Length'])
@@ -270,12 +253,14 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
             "rxcui_url": params.get('rxcui_url', [None])[0]
         }
         json_data = json.dumps(result)
+        body = json_data.encode('utf-8')
         self.send_response(200)
         self.send_header("Content-Type", "application/json")
         self.send_header("Content-Disposition", "attachment; filename=result.json")
+        self.send_header("Content-Length", str(len(body)))
         self.end_headers()
-        self.wfile.write(json_data.encode('utf-8'))
+        self.wfile.write(body)
 
-with socketserver.TCPServer(("", PORT), MyHandler) as httpd:
-    print(f"Serving on port {PORT}")
-    httpd.serve_forever()
\ No newline at end of file
+# Start the HTTP server (see serving.py for --mode, --workers and --backlog)
+if __name__ == "__main__":
+    serving.main(MyHandler, PORT)
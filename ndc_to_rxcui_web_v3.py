@@ -1,79 +1,112 @@
 import http.server
-import socketserver
 import urllib.parse
-import requests
 import json
 
+import lookup_config
+import pages
+import prewarm
+import rxnav_client
+import serving
+from api import JsonApiMixin
+from instrumentation import MetricsMixin, record_error
+from rxnav_client import ndc_to_rxcui, get_rxcui_info
+
 # Define the port number for the server
 PORT = 8080  # Change the port number here if needed
 
-# Function to convert NDC to RXCUI using the RxNorm API
-def ndc_to_rxcui(ndc):
-    url = f"https://rxnav.nlm.nih.gov/REST/ndcstatus.json?ndc={ndc}"
-    response = requests.get(url)
-    
-    if response.status_code != 200:
-        raise Exception(f"API request failed with status code {response.status_code}")
-    
-    data = response.json()
-    
-    if 'ndcStatus' in data and 'rxcui' in data['ndcStatus']:
-        return data['ndcStatus']['rxcui'], url
-    else:
-        raise Exception("RXCUI not found for the given NDC")
+# Serve lookups from the local RxNorm index if one is configured, otherwise
+# from RxNav behind the in-process and on-disk caches (see lookup_config.py)
+rxnav_client.set_client(lookup_config.build_client())
+
+# Page templates, compiled once at startup (see pages.py). {{name}} fields are
+# HTML-escaped when rendered.
+PAGE_HEAD = '''<!doctype html>
+<html>
+<head>
+    <title>NDC to RXCUI Converter</title>
+    <style>
+        body {
+            text-align: center;
+        }
+    </style>
+</head>
+<body>
+    <h1>NDC to RXCUI Converter</h1>
+    <form method="post">
+        <label for="ndc" title="National Drug Code (NDC) is a unique identifier for medicines in the United States.">NDC:</label>
+        <input type="text" name="ndc">
+        <br>
+        <input type="checkbox" name="show_urls" value="yes" {{checked}}>
+        <label for="show_urls">Show API URLs</label>
+        <br>
+        <input type="submit" value="Convert">
+    </form>
+'''
+PAGE_FOOT = '''    <p><a href="https://github.com/erinsim/terminology-data-tools" target="_blank">Python Script Behind This Webpage: Terminology Data Tools Repository</a></p>
+'''
+
+INDEX_PAGE = pages.StaticPage(pages.Template(PAGE_HEAD + PAGE_FOOT + "</body>\n</html>\n").render())
+
+RESULT_PAGE = pages.Template(PAGE_HEAD + '''    <form method="post" action="/download_json">
+        <input type="hidden" name="ndc" value="{{ndc}}">
+        <input type="hidden" name="rxcui" value="{{rxcui}}">
+        <input type="hidden" name="term_type" value="{{term_type}}">
+        <input type="hidden" name="name" value="{{name}}">
+        <input type="hidden" name="ndc_url" value="{{ndc_url}}">
+        <input type="hidden" name="rxcui_url" value="{{rxcui_url}}">
+        <input type="submit" value="Download Results as JSON">
+    </form>
+    <h2>The RXCUI for NDC {{ndc}} is {{rxcui}}</h2>
+    <h3>Term Type (TTY): {{term_type}}</h3>
+    <button type="button" onclick="toggleTermTypes()">Show Term Types</button>
+    <div id="termTypes" style="display:none;">
+        <p><strong>BN:</strong> Brand Name</p>
+        <p><strong>IN:</strong> Ingredient</p>
+        <p><strong>PIN:</strong> Precise Ingredient</p>
+        <p><strong>MIN:</strong> Multiple Ingredients</p>
+        <p><strong>SCD:</strong> Semantic Clinical Drug</p>
+        <p><strong>SBD:</strong> Semantic Branded Drug</p>
+        <p><strong>GPCK:</strong> Generic Pack</p>
+        <p><strong>BPCK:</strong> Branded Pack</p>
+    </div>
+    <h3>Name: {{name}}</h3>
+    <p>View in RxNav: <a href="https://mor.nlm.nih.gov/RxNav/search?searchBy=RXCUI&searchTerm={{rxcui}}" target="_blank">RxNav Result</a></p>
+{{api_urls}}''' + PAGE_FOOT + '''    <script>
+        function toggleTermTypes() {
+            var x = document.getElementById("termTypes");
+            if (x.style.display === "none") {
+                x.style.display = "block";
+            } else {
+                x.style.display = "none";
+            }
+        }
+    </script>
+</body>
+</html>
+''')
+
+API_URLS = pages.Template('''    <p>API URL used for NDC: <a href="{{ndc_url}}" target="_blank">{{ndc_url}}</a></p>
+    <p>API URL used for RXCUI: <a href="{{rxcui_url}}" target="_blank">{{rxcui_url}}</a></p>
+    <p>API Documentation: <a href="https://rxnav.nlm.nih.gov/RxNormAPIs.html" target="_blank">RxNorm API Documentation</a></p>
+''')
 
-# Function to get RXCUI information using the RxNorm API
-def get_rxcui_info(rxcui):
-    url = f"https://rxnav.nlm.nih.gov/REST/rxcui/{rxcui}/properties.json"
-    response = requests.get(url)
-    
-    if response.status_code != 200:
-        raise Exception(f"API request failed with status code {response.status_code}")
-    
-    data = response.json()
-    
-    if 'properties' in data:
-        return data['properties'], url
-    else:
-        raise Exception("Properties not found for the given RXCUI")
+ERROR_PAGE = pages.Template(PAGE_HEAD + "    <h2>Error: {{error}}</h2>\n" + PAGE_FOOT + "</body>\n</html>\n")
 
 # Define a request handler class for the HTTP server
-class MyHandler(http.server.SimpleHTTPRequestHandler):
+class MyHandler(MetricsMixin, JsonApiMixin, http.server.SimpleHTTPRequestHandler):
     # Handle GET requests
     def do_GET(self):
-        self.send_response(200)
-        self.send_header("Content-type", "text/html")
-        self.end_headers()
-        self.wfile.write(b'''
-            <!doctype html>
-            <html>
-            <head>
-                <title>NDC to RXCUI Converter</title>
-                <style>
-                    body {
-                        text-align: center;
-                    }
-                </style>
-            </head>
-            <body>
-                <h1>NDC to RXCUI Converter</h1>
-                <form method="post">
-                    <label for="ndc" title="National Drug Code (NDC) is a unique identifier for medicines in the United States.">NDC:</label>
-                    <input type="text" name="ndc">
-                    <br>
-                    <input type="checkbox" name="show_urls" value="yes">
-                    <label for="show_urls">Show API URLs</label>
-                    <br>
-                    <input type="submit" value="Convert">
-                </form>
-                <p><a href="https://github.com/erinsim/terminology-data-tools" target="_blank">Python Script Behind This Webpage: Terminology Data Tools Repository</a></p>
-            </body>
-            </html>
-        ''')
+        if self.path.startswith("/api/"):
+            return self.do_GET_api()
+        if self.path == "/metrics":
+            return self.send_metrics()
+        INDEX_PAGE.send(self)
 
     # Handle POST requests
     def do_POST(self):
-        if self.path == "/download_json":
+        if self.path.startswith("/api/"):
+            self.do_POST_api()
+        elif self.path == "/download_json":
             self.do_POST_download_json()
         else:
             self.do_POST_convert()
@@ -85,120 +118,25 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
         params = urllib.parse.parse_qs(post_data.decode('utf-8'))
         ndc = params.get('ndc', [None])[0]
         show_urls = 'show_urls' in params
-
-        self.send_response(200)
-        self.send_header("Content-type", "text/html")
-        self.end_headers()
+        checked = 'checked' if show_urls else ''
 
         try:
-            rxcui, ndc_url = ndc_to_rxcui(ndc)
-            properties, rxcui_url = get_rxcui_info(rxcui)
-            result = {
-                "ndc": ndc,
-                "rxcui": rxcui,
-                "term_type": properties['tty'],
-                "name": properties['name'],
-                "ndc_url": ndc_url,
-                "rxcui_url": rxcui_url
-            }
-            response = f'''
-                <!doctype html>
-                <html>
-                <head>
-                    <title>NDC to RXCUI Converter</title>
-                    <style>
-                        body {{
-                            text-align: center;
-                        }}
-                    </style>
-                </head>
-                <body>
-                    <h1>NDC to RXCUI Converter</h1>
-                    <form method="post">
-                        <label for="ndc" title="National Drug Code (NDC) is a unique identifier for medicines in the United States.">NDC:</label>
-                        <input type="text" name="ndc">
-                        <br>
-                        <input type="checkbox" name="show_urls" value="yes" {'checked' if show_urls else ''}>
-                        <label for="show_urls">Show API URLs</label>
-                        <br>
-                        <input type="submit" value="Convert">
-                    </form>
-                    <form method="post" action="/download_json">
-                        <input type="hidden" name="ndc" value="{ndc}">
-                        <input type="hidden" name="rxcui" value="{rxcui}">
-                        <input type="hidden" name="term_type" value="{properties['tty']}">
-                        <input type="hidden" name="name" value="{properties['name']}">
-                        <input type="hidden" name="ndc_url" value="{ndc_url}">
-                        <input type="hidden" name="rxcui_url" value="{rxcui_url}">
-                        <input type="submit" value="Download Results as JSON">
-                    </form>
-                    <h2>The RXCUI for NDC {ndc} is {rxcui}</h2>
-                    <h3>Term Type (TTY): {properties['tty']}</h3>
-                    <button type="button" onclick="toggleTermTypes()">Show Term Types</button>
-                    <div id="termTypes" style="display:none;">
-                        <p><strong>BN:</strong> Brand Name</p>
-                        <p><strong>IN:</strong> Ingredient</p>
-                        <p><strong>PIN:</strong> Precise Ingredient</p>
-                        <p><strong>MIN:</strong> Multiple Ingredients</p>
-                        <p><strong>SCD:</strong> Semantic Clinical Drug</p>
-                        <p><strong>SBD:</strong> Semantic Branded Drug</p>
-                        <p><strong>GPCK:</strong> Generic Pack</p>
-                        <p><strong>BPCK:</strong> Branded Pack</p>
-                    </div>
-                    <h3>Name: {properties['name']}</h3>
-                    <p>View in RxNav: <a href="https://mor.nlm.nih.gov/RxNav/search?searchBy=RXCUI&searchTerm={rxcui}" target="_blank">RxNav Result</a></p>
-            '''
-            if show_urls:
-                response += f'''
-                    <p>API URL used for NDC: <a href="{ndc_url}" target="_blank">{ndc_url}</a></p>
-                    <p>API URL used for RXCUI: <a href="{rxcui_url}" target="_blank">{rxcui_url}</a></p>
-                    <p>API Documentation: <a href="https://rxnav.nlm.nih.gov/RxNormAPIs.html" target="_blank">RxNorm API Documentation</a></p>
-                '''
-            response += '''
-                    <p><a href="https://github.com/erinsim/terminology-data-tools" target="_blank">Python Script Behind This Webpage: Terminology Data Tools Repository</a></p>
-                    <script>
-                        function toggleTermTypes() {
-                            var x = document.getElementById("termTypes");
-                            if (x.style.display === "none") {
-                                x.style.display = "block";
-                            } else {
-                                x.style.display = "none";
-                            }
-                        }
-                    </script>
-                </body>
-                </html>
-            '''
+            # The properties lookup needs the RXCUI, so these two calls stay serial;
+            # RxNav has no single endpoint that returns an NDC's RXCUI with its TTY
+            with self.trace.stage("lookup"):
+                rxcui, ndc_url = ndc_to_rxcui(ndc)
+                properties, rxcui_url = get_rxcui_info(rxcui)
+            with self.trace.stage("render"):
+                api_urls = API_URLS.render(ndc_url=ndc_url, rxcui_url=rxcui_url) if show_urls else b""
+                body = RESULT_PAGE.render(checked=checked, ndc=ndc, rxcui=rxcui, term_type=properties['tty'],
+                                          name=properties['name'], ndc_url=ndc_url, rxcui_url=rxcui_url,
+                                          api_urls=api_urls)
         except Exception as e:
-            response = f'''
-                <!doctype html>
-                <html>
-                <head>
-                    <title>NDC to RXCUI Converter</title>
-                    <style>
-                        body {{
-                            text-align: center;
-                        }}
-                    </style>
-                </head>
-                <body>
-                    <h1>NDC to RXCUI Converter</h1>
-                    <form method="post">
-                        <label for="ndc" title="National Drug Code (NDC) is a unique identifier for medicines in the United States.">NDC:</label>
-                        <input type="text" name="ndc">
-                        <br>
-                        <input type="checkbox" name="show_urls" value="yes" {'checked' if show_urls else ''}>
-                        <label for="show_urls">Show API URLs</label>
-                        <br>
-                        <input type="submit" value="Convert">
-                    </form>
-                    <h2>Error: {str(e)}</h2>
-                    <p><a href="https://github.com/erinsim/terminology-data-tools" target="_blank">Python Script Behind This Webpage: Terminology Data Tools Repository</a></p>
-                </body>
-                </html>
-            '''
-        
-        self.wfile.write(response.encode('utf-8'))
+            record_error(e)
+            with self.trace.stage("render"):
+                body = ERROR_PAGE.render(checked=checked, error=str(e))
+
+        pages.send_html(self, body)
 
     # Handle POST requests for downloading JSON results
     def do_POST_download_json(self):
@@ -214,13 +152,16 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
             "rxcui_url": params.get('rxcui_url', [None])[0]
         }
         json_data = json.dumps(result)
+        body = json_data.encode('utf-8')
         self.send_response(200)
         self.send_header("Content-Type", "application/json")
         self.send_header("Content-Disposition", "attachment; filename=result.json")
+        self.send_header("Content-Length", str(len(body)))
         self.end_headers()
-        self.wfile.write(json_data.encode('utf-8'))
+        self.wfile.write(body)
 
-# Start the HTTP server
-with socketserver.TCPServer(("", PORT), MyHandler) as httpd:
-    print(f"Serving on port {PORT}")
-    httpd.serve_forever()
\ No newline at end of file
+# Start the HTTP server (see serving.py for --mode, --workers and --backlog).
+# Each serving process loads the name search index, prewarms the hot list and
+# keeps the caches refreshed.
+if __name__ == "__main__":
+    serving.main(MyHandler, PORT, on_start=prewarm.prepare_process)
@@ -0,0 +1,93 @@
+import gzip
+import hashlib
+import html
+import re
+
+# Page caching defaults (change these if needed)
+CACHE_MAX_AGE = 3600  # Seconds browsers may reuse a static page before revalidating
+GZIP_MIN_SIZE = 512  # Bodies smaller than this are always sent uncompressed
+
+_FIELD_RE = re.compile(r"\{\{(\w+)\}\}")
+
+
+# Page template compiled once at import time. The source is plain HTML with
+# {{name}} fields; the static text between fields is split out and encoded to
+# bytes up front, so render() only escapes the field values and joins.
+# str values are HTML-escaped; bytes values are inserted as they are, which is
+# how an already rendered fragment (another template's output) is nested.
+class Template:
+    def __init__(self, source):
+        parts = _FIELD_RE.split(source)
+        self.chunks = [part.encode('utf-8') for part in parts[0::2]]
+        self.fields = parts[1::2]
+
+    def render(self, **values):
+        out = [self.chunks[0]]
+        for name, chunk in zip(self.fields, self.chunks[1:]):
+            value = values.get(name, "")
+            if not isinstance(value, bytes):
+                value = html.escape(str(value)).encode('utf-8')
+            out.append(value)
+            out.append(chunk)
+        return b"".join(out)
+
+
+# Return True if an Accept-Encoding header value allows gzip
+def accepts_gzip(header):
+    for coding in (header or "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+# Response body that never changes while the server runs (e.g. the empty form
+# on GET /). The gzip encoding and ETag are computed once; repeat visitors
+# revalidate with If-None-Match and get a 304 with no body.
+class StaticPage:
+    def __init__(self, body, content_type="text/html; charset=utf-8", max_age=CACHE_MAX_AGE):
+        self.body = body
+        self.gzipped = gzip.compress(body, mtime=0) if len(body) >= GZIP_MIN_SIZE else None
+        self.content_type = content_type
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        self.cache_control = f"public, max-age={max_age}"
+
+    def matches(self, if_none_match):
+        tags = [tag.strip() for tag in (if_none_match or "").split(",")]
+        return "*" in tags or self.etag in tags or "W/" + self.etag in tags
+
+    # Return (status, headers, body) for a request with these If-None-Match
+    # and Accept-Encoding header values
+    def response(self, if_none_match=None, accept_encoding=None):
+        if self.matches(if_none_match):
+            return 304, [("ETag", self.etag), ("Cache-Control", self.cache_control)], b""
+
+        body = self.body
+        headers = [("Content-Type", self.content_type)]
+        if self.gzipped is not None:
+            headers.append(("Vary", "Accept-Encoding"))
+            if accepts_gzip(accept_encoding):
+                body = self.gzipped
+                headers.append(("Content-Encoding", "gzip"))
+        headers += [("ETag", self.etag), ("Cache-Control", self.cache_control), ("Content-Length", str(len(body)))]
+        return 200, headers, body
+
+    def send(self, handler):
+        status, headers, body = self.response(handler.headers.get("If-None-Match"),
+                                              handler.headers.get("Accept-Encoding"))
+        handler.send_response(status)
+        for name, value in headers:
+            handler.send_header(name, value)
+        handler.end_headers()
+        if body:
+            handler.wfile.write(body)
+
+
+# Send a rendered page that depends on the request (never cached)
+def send_html(handler, body, status=200):
+    handler.send_response(status)
+    handler.send_header("Content-Type", "text/html; charset=utf-8")
+    handler.send_header("Cache-Control", "no-store")
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
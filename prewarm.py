@@ -0,0 +1,289 @@
+import collections
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import metrics
+import rxnav_client
+from batch import read_codes
+from lookup_config import HOT_LIST_PATH, NAME_INDEX_PATH, VERSION_INTERVAL
+from circuit_breaker import CircuitOpenError
+from name_search import load_name_index
+from rxnav_client import NotFoundError
+
+# Refresh scheduler defaults (change these if needed)
+REFRESH_INTERVAL = 30  # Seconds between refresh passes
+REFRESH_AHEAD = 10 * 60  # Refresh cached entries this many seconds before they expire
+REFRESH_WORKERS = 4  # Background lookups in flight at once
+ERROR_WINDOW = 20  # Recent refresh outcomes used to judge the upstream error rate
+ERROR_THRESHOLD = 0.5  # Pause refreshing when this share of recent refreshes failed
+PAUSE = 60  # Seconds to pause refreshing once the error threshold is reached
+REVALIDATE_BATCH = 200  # Entries from an older data version re-fetched per refresh pass
+REVALIDATE_ATTEMPTS = 3  # Failed re-fetches after which an outdated entry is dropped instead
+REVALIDATE_LEASE = "revalidate"  # Lease a process holds while it re-validates a shared disk cache
+
+REFRESHES = metrics.counter("rxnav_refresh_total", "Background cache refreshes by result", ("result",))
+PAUSED = metrics.gauge("rxnav_refresh_paused", "1 while background refreshes are paused after upstream errors")
+DATA_VERSION = metrics.gauge("rxnav_data_version_info", "1 for the RxNorm data version the caches are tagged with",
+                             ("version",))
+OUTDATED = metrics.gauge("rxnav_cache_outdated_entries",
+                         "Cached entries outdated by the last data version change (0 once re-validated)", ("cache",))
+REVALIDATIONS = metrics.counter(
+    "rxnav_revalidations_total",
+    "Outdated cache entries re-fetched after a new release: changed, unchanged, not_found or dropped", ("result",))
+
+
+# Look up a hot-list code the way the converter pages do: an NDC with its
+# RXCUI's properties, or an RXCUI with its NDCs and properties. Codes of 10 or
+# more digits (or with hyphens) are NDCs; shorter ones are RXCUIs.
+def warm_code(code):
+    if "-" in code or len(code) >= 10:
+        rxcui, _ = rxnav_client.ndc_to_rxcui(code)
+    else:
+        rxcui = code
+        rxnav_client.rxcui_to_ndc(rxcui)
+    rxnav_client.get_rxcui_info(rxcui)
+
+
+# Cache layers of the current client that can be refreshed ahead of expiry
+def refreshable_layers(client):
+    layers = []
+    seen = set()
+    while client is not None and id(client) not in seen:
+        seen.add(id(client))
+        if hasattr(client, "refresh") and hasattr(getattr(client, "cache", None), "expiring"):
+            layers.append(client)
+        client = getattr(client, "client", None)
+    return layers
+
+
+# Cache layers of the current client whose entries carry a data version,
+# outermost first
+def versioned_layers(client):
+    layers = []
+    seen = set()
+    while client is not None and id(client) not in seen:
+        seen.add(id(client))
+        if hasattr(client, "refresh") and hasattr(getattr(client, "cache", None), "set_version"):
+            layers.append(client)
+        client = getattr(client, "client", None)
+    return layers
+
+
+def _same_answer(old, new):
+    return json.dumps(old, sort_keys=True, default=str) == json.dumps(new, sort_keys=True, default=str)
+
+
+# Background thread that keeps the lookup caches warm so user requests are
+# answered from cache instead of waiting on RxNav:
+#   - at start, looks up every code on the hot list;
+#   - every interval, looks the hot list up again (cache hits, which mark the
+#     entries as in use) and re-fetches in-use entries that expire within
+#     refresh_ahead seconds, on a bounded worker pool;
+#   - every version_interval, asks for the RxNorm data version (RxNav's
+#     version.json, or a local index's release tag). When it changes, the
+#     cache layers are switched to the new version: their "not found" entries
+#     are dropped and the rest keep answering while each pass re-fetches up to
+#     revalidate_batch of them, most recently used first. Layers are done
+#     innermost first, since an outer layer re-fetches through the inner ones;
+#     until they are done its new entries are tagged as outdated too. An
+#     entry whose re-fetch fails revalidate_attempts times is dropped, so one
+#     bad code cannot hold the outer layers on the old release. A disk cache
+#     shared by several server processes is re-validated by whichever one
+#     holds its lease; the others wait for it before doing their own layers;
+#   - when too many recent refreshes fail, pauses for `pause` seconds rather
+#     than adding load to a struggling upstream. Failed refreshes leave the
+#     old entry in place.
+class RefreshScheduler:
+    def __init__(self, client=None, hot_codes=(), interval=REFRESH_INTERVAL, refresh_ahead=REFRESH_AHEAD,
+                 workers=REFRESH_WORKERS, error_threshold=ERROR_THRESHOLD, pause=PAUSE,
+                 version_interval=VERSION_INTERVAL, revalidate_batch=REVALIDATE_BATCH,
+                 revalidate_attempts=REVALIDATE_ATTEMPTS):
+        self.client = client
+        self.hot_codes = list(dict.fromkeys(hot_codes))
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.version_interval = version_interval
+        self.revalidate_batch = revalidate_batch
+        self.revalidate_attempts = revalidate_attempts
+        self.revalidate_failures = collections.Counter()
+        self.version = None
+        self.version_checked_at = None
+        self.owner = str(os.getpid())
+        self._lock = threading.Lock()
+        self.error_threshold = error_threshold
+        self.pause = pause
+        self.outcomes = collections.deque(maxlen=ERROR_WINDOW)
+        self.paused_until = 0.0
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cache-refresh")
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="cache-refresh-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self):
+        started = time.perf_counter()
+        warmed = self.warm()
+        if self.hot_codes:
+            print(f"Prewarmed {warmed}/{len(self.hot_codes)} hot codes in {time.perf_counter() - started:.1f}s",
+                  file=sys.stderr)
+        while not self._stop.wait(self.interval):
+            self.refresh_pass()
+
+    def paused(self):
+        return time.monotonic() < self.paused_until
+
+    # Record one refresh outcome and pause if the recent error rate is too high
+    def record(self, ok):
+        self.outcomes.append(ok)
+        failures = self.outcomes.count(False)
+        if len(self.outcomes) == self.outcomes.maxlen and failures / len(self.outcomes) >= self.error_threshold:
+            self.paused_until = time.monotonic() + self.pause
+            self.outcomes.clear()
+            PAUSED.set(1)
+            print(f"Upstream errors: pausing cache refresh for {self.pause}s", file=sys.stderr)
+
+    def _run_all(self, tasks):
+        futures = []
+        for task in tasks:
+            if self._stop.is_set() or self.paused():
+                break
+            futures.append(self.executor.submit(self._run_one, task))
+        wait(futures)
+        return sum(future.result() for future in futures if not future.cancelled())
+
+    def _run_one(self, task):
+        if self.paused():
+            return False
+        try:
+            task()
+        except NotFoundError:
+            REFRESHES.inc(result="not_found")
+            self.record(True)
+            return False
+        except Exception:
+            REFRESHES.inc(result="error")
+            self.record(False)
+            return False
+        REFRESHES.inc(result="ok")
+        self.record(True)
+        return True
+
+    # Look up every hot code; returns how many succeeded
+    def warm(self):
+        return self._run_all(lambda code=code: warm_code(code) for code in self.hot_codes)
+
+    def refresh_pass(self):
+        if self.paused():
+            return
+        PAUSED.set(0)
+        client = self.client if self.client is not None else rxnav_client.get_client()
+        if self.version_interval:
+            due = self.version_checked_at is None or \
+                time.monotonic() - self.version_checked_at >= self.version_interval
+            if due:
+                self.check_version(client)
+            self.revalidate(client)
+        self.warm()
+        for layer in refreshable_layers(client):
+            keys = layer.cache.expiring(self.refresh_ahead)
+            self._run_all(lambda key=key, layer=layer: layer.refresh(key) for key in keys)
+
+    # Ask for the current data version and switch the cache layers to it if
+    # it changed. Returns the version, or None if it could not be fetched.
+    def check_version(self, client):
+        self.version_checked_at = time.monotonic()
+        try:
+            version, _ = client.get_version()
+        except Exception as e:
+            print(f"Could not check the RxNorm data version: {e}", file=sys.stderr)
+            return None
+        if version != self.version:
+            layers = versioned_layers(client)
+            outdated = 0
+            for i, layer in enumerate(layers):
+                layer.settled = i == len(layers) - 1
+                count = layer.cache.set_version(version)
+                OUTDATED.set(count, cache=type(layer.cache).__name__)
+                outdated += count
+            if self.version is not None:
+                DATA_VERSION.set(0, version=self.version)
+            DATA_VERSION.set(1, version=version)
+            print(f"RxNorm data version {self.version or 'unknown'} -> {version}: "
+                  f"{outdated} cached entries to re-validate", file=sys.stderr)
+            self.version = version
+            with self._lock:
+                self.revalidate_failures.clear()
+        return version
+
+    # Re-fetch one batch of outdated entries from the innermost cache layer
+    # that still has some; layers above it are marked settled once every
+    # layer below them is done
+    def revalidate(self, client):
+        if self.version is None:
+            return
+        for layer in reversed(versioned_layers(client)):
+            layer.settled = True
+            claim = getattr(layer.cache, "claim", None)
+            if claim is not None and not claim(REVALIDATE_LEASE, self.owner, max(3 * self.interval, 60)):
+                # Another process is re-validating this shared cache
+                if layer.cache.outdated(1):
+                    return
+                continue
+            keys = layer.cache.outdated(self.revalidate_batch)
+            if keys:
+                self._run_all(lambda key=key, layer=layer: self._revalidate_one(layer, key) for key in keys)
+                return
+            OUTDATED.set(0, cache=type(layer.cache).__name__)
+
+    def _revalidate_one(self, layer, key):
+        old = layer.cache.get_stale(key)
+        try:
+            new = layer.refresh(key)
+        except NotFoundError:
+            REVALIDATIONS.inc(result="not_found")
+            raise
+        except CircuitOpenError:
+            raise  # RxNav is down, nothing wrong with this entry
+        except Exception:
+            with self._lock:
+                self.revalidate_failures[id(layer), key] += 1
+                give_up = self.revalidate_failures[id(layer), key] >= self.revalidate_attempts
+                if give_up:
+                    del self.revalidate_failures[id(layer), key]
+            if give_up:
+                layer.cache.delete(key)
+                REVALIDATIONS.inc(result="dropped")
+            raise
+        REVALIDATIONS.inc(result="unchanged" if _same_answer(old, new) else "changed")
+
+
+# Start a scheduler for the configured hot list (RXNAV_HOT_LIST, a file of
+# codes in any format batch.read_codes accepts). Servers call this in every
+# serving process; see serving.main(on_start=...).
+def start_scheduler(hot_list_path=HOT_LIST_PATH):
+    hot_codes = list(read_codes(hot_list_path)) if hot_list_path else []
+    client = rxnav_client.get_client()
+    if not hot_codes and not refreshable_layers(client) and not versioned_layers(client):
+        return None
+    return RefreshScheduler(hot_codes=hot_codes).start()
+
+
+# Get a serving process ready: load the /api/suggest name index (when
+# RXNORM_NAME_INDEX or RXNORM_INDEX is set), then start the scheduler. The
+# converter servers pass this as serving.main(on_start=...).
+def prepare_process(hot_list_path=HOT_LIST_PATH, name_index_path=NAME_INDEX_PATH):
+    load_name_index(name_index_path)
+    return start_scheduler(hot_list_path)
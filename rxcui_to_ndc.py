@@ -1,26 +1,36 @@
-import requests
+import argparse
+import sys
+
+import rxnav_client
+from batch import add_batch_arguments, run_batch
+from rxnav_client import rxcui_to_ndc
+
+
+# Batch lookup: one output row per RXCUI
+def lookup_row(rxcui):
+    ndcs, _ = rxcui_to_ndc(rxcui)
+    return {"ndcs": ndcs}
 
-# Function to convert RXCUI to NDC using the RxNorm API
-def rxcui_to_ndc(rxcui):
-    url = f"https://rxnav.nlm.nih.gov/REST/rxcui/{rxcui}/ndcs.json"
-    response = requests.get(url)
-    
-    if response.status_code != 200:
-        raise Exception(f"API request failed with status code {response.status_code}")
-    
-    data = response.json()
-    
-    if 'ndcGroup' in data and 'ndcList' in data['ndcGroup'] and 'ndc' in data['ndcGroup']['ndcList']:
-        return data['ndcGroup']['ndcList']['ndc'], url
-    else:
-        raise Exception("NDC not found for the given RXCUI")
 
 # Example usage
 if __name__ == "__main__":
-    rxcui = input("Please enter an RXCUI: ")  # Prompt the user to input an RXCUI
-    try:
-        ndcs, api_url = rxcui_to_ndc(rxcui)
-        print(f"The NDCs for RXCUI {rxcui} are: {ndcs}")
-        print(f"API URL used: {api_url}")
-    except Exception as e:
-        print(f"Error: {str(e)}")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Convert RXCUIs to NDCs")
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+
+    if args.index:
+        from rxnorm_index import LocalRxNormIndex
+        rxnav_client.set_client(LocalRxNormIndex(args.index))
+
+    if args.input:
+        counts = run_batch(lookup_row, "rxcui", ["ndcs"], args.input, args.output, fmt=args.format,
+                           workers=args.workers, resume=args.resume, column=args.column)
+        print(", ".join(f"{status}: {count}" for status, count in counts.items()), file=sys.stderr)
+    else:
+        rxcui = input("Please enter an RXCUI: ")  # Prompt the user to input an RXCUI
+        try:
+            ndcs, api_url = rxcui_to_ndc(rxcui)
+            print(f"The NDCs for RXCUI {rxcui} are: {ndcs}")
+            print(f"API URL used: {api_url}")
+        except Exception as e:
+            print(f"Error: {str(e)}")
@@ -1,159 +1,117 @@
 import http.server
-import socketserver
 import urllib.parse
-import requests
 import json
 
+import lookup_config
+import pages
+import prewarm
+import rxnav_client
+import serving
+from api import JsonApiMixin
+from instrumentation import MetricsMixin, record_error
+from rxnav_client import rxcui_to_ndc
+
 # Define the port number for the server
 PORT = 8081  # Change the port number here if needed
 
-# Function to convert RXCUI to NDC using the RxNorm API
-def rxcui_to_ndc(rxcui):
-    url = f"https://rxnav.nlm.nih.gov/REST/rxcui/{rxcui}/ndcs.json"
-    response = requests.get(url)
-    
-    if response.status_code != 200:
-        raise Exception(f"API request failed with status code {response.status_code}")
-    
-    data = response.json()
-    
-    if 'ndcGroup' in data and 'ndcList' in data['ndcGroup'] and 'ndc' in data['ndcGroup']['ndcList']:
-        return data['ndcGroup']['ndcList']['ndc'], url
-    else:
-        raise Exception("NDC not found for the given RXCUI")
+# Serve lookups from the local RxNorm index if one is configured, otherwise
+# from RxNav behind the in-process and on-disk caches (see lookup_config.py)
+rxnav_client.set_client(lookup_config.build_client())
 
 # Function to get the drug name and term type for a given RXCUI using the RxNorm API
 def get_rxcui_info(rxcui):
-    url = f"https://rxnav.nlm.nih.gov/REST/rxcui/{rxcui}/properties.json"
-    response = requests.get(url)
-    
-    if response.status_code != 200:
+    try:
+        properties, _ = rxnav_client.get_rxcui_info(rxcui)
+    except Exception:
         return "Unknown", "Unknown"
-    
-    data = response.json()
-    
-    if 'properties' in data and 'name' in data['properties'] and 'tty' in data['properties']:
-        return data['properties']['name'], data['properties']['tty']
+
+    if 'name' in properties and 'tty' in properties:
+        return properties['name'], properties['tty']
     else:
         return "Unknown", "Unknown"
 
+# Page templates, compiled once at startup (see pages.py). {{name}} fields are
+# HTML-escaped when rendered.
+PAGE_HEAD = '''<!doctype html>
+<html>
+<head>
+    <title>RXCUI to NDC Converter</title>
+    <style>
+        body {
+            text-align: center;
+        }
+    </style>
+</head>
+<body>
+    <h1>RXCUI to NDC Converter</h1>
+    <form method="post">
+        <label for="rxcui" title="RXCUI is a unique identifier for drugs in the RxNorm database.">RXCUI:</label>
+        <input type="text" name="rxcui">
+        <br>
+        <input type="checkbox" name="show_urls" value="yes" {{checked}}>
+        <label for="show_urls">Show API URLs</label>
+        <br>
+        <input type="submit" value="Convert">
+    </form>
+'''
+PAGE_FOOT = '''    <p><a href="https://github.com/erinsim/terminology-data-tools" target="_blank">Python Script Behind This Webpage: Terminology Data Tools Repository</a></p>
+</body>
+</html>
+'''
+
+INDEX_PAGE = pages.StaticPage(pages.Template(PAGE_HEAD + PAGE_FOOT).render())
+
+RESULT_PAGE = pages.Template(PAGE_HEAD + '''    <h2>The NDCs for RXCUI {{rxcui}} ({{drug_name}}, {{term_type}}) are:</h2>
+    <p>{{ndc_list}}</p>
+{{api_urls}}''' + PAGE_FOOT)
+
+API_URLS = pages.Template('''    <p>API URL used: <a href="{{api_url}}" target="_blank">{{api_url}}</a></p>
+    <p>API Documentation: <a href="https://rxnav.nlm.nih.gov/RxNormAPIs.html" target="_blank">RxNorm API Documentation</a></p>
+''')
+
+ERROR_PAGE = pages.Template(PAGE_HEAD + "    <h2>Error: {{error}}</h2>\n" + PAGE_FOOT)
+
 # Define a request handler class for the HTTP server
-class MyHandler(http.server.SimpleHTTPRequestHandler):
+class MyHandler(MetricsMixin, JsonApiMixin, http.server.SimpleHTTPRequestHandler):
     # Handle GET requests
     def do_GET(self):
-        self.send_response(200)
-        self.send_header("Content-type", "text/html")
-        self.end_headers()
-        self.wfile.write(b'''
-            <!doctype html>
-            <html>
-            <head>
-                <title>RXCUI to NDC Converter</title>
-                <style>
-                    body {
-                        text-align: center;
-                    }
-                </style>
-            </head>
-            <body>
-                <h1>RXCUI to NDC Converter</h1>
-                <form method="post">
-                    <label for="rxcui" title="RXCUI is a unique identifier for drugs in the RxNorm database.">RXCUI:</label>
-                    <input type="text" name="rxcui">
-                    <br>
-                    <input type="checkbox" name="show_urls" value="yes">
-                    <label for="show_urls">Show API URLs</label>
-                    <br>
-                    <input type="submit" value="Convert">
-                </form>
-                <p><a href="https://github.com/erinsim/terminology-data-tools" target="_blank">Python Script Behind This Webpage: Terminology Data Tools Repository</a></p>
-            </body>
-            </html>
-        ''')
+        if self.path.startswith("/api/"):
+            return self.do_GET_api()
+        if self.path == "/metrics":
+            return self.send_metrics()
+        INDEX_PAGE.send(self)
 
     # Handle POST requests
     def do_POST(self):
+        if self.path.startswith("/api/"):
+            return self.do_POST_api()
         content_length = int(self.headers['Content-Length'])
         post_data = self.rfile.read(content_length)
         params = urllib.parse.parse_qs(post_data.decode('utf-8'))
         rxcui = params.get('rxcui', [None])[0]
         show_urls = 'show_urls' in params
-
-        self.send_response(200)
-        self.send_header("Content-type", "text/html")
-        self.end_headers()
+        checked = 'checked' if show_urls else ''
 
         try:
-            ndcs, api_url = rxcui_to_ndc(rxcui)
-            drug_name, term_type = get_rxcui_info(rxcui)
-            ndc_list = ', '.join(ndcs)
-            response = f'''
-                <!doctype html>
-                <html>
-                <head>
-                    <title>RXCUI to NDC Converter</title>
-                    <style>
-                        body {{
-                            text-align: center;
-                        }}
-                    </style>
-                </head>
-                <body>
-                    <h1>RXCUI to NDC Converter</h1>
-                    <form method="post">
-                        <label for="rxcui" title="RXCUI is a unique identifier for drugs in the RxNorm database.">RXCUI:</label>
-                        <input type="text" name="rxcui">
-                        <br>
-                        <input type="checkbox" name="show_urls" value="yes" {'checked' if show_urls else ''}>
-                        <label for="show_urls">Show API URLs</label>
-                        <br>
-                        <input type="submit" value="Convert">
-                    </form>
-                    <h2>The NDCs for RXCUI {rxcui} ({drug_name}, {term_type}) are:</h2>
-                    <p>{ndc_list}</p>
-            '''
-            if show_urls:
-                response += f'''
-                    <p>API URL used: <a href="{api_url}" target="_blank">{api_url}</a></p>
-                    <p>API Documentation: <a href="https://rxnav.nlm.nih.gov/RxNormAPIs.html" target="_blank">RxNorm API Documentation</a></p>
-                '''
-            response += '''
-                <p><a href="https://github.com/erinsim/terminology-data-tools" target="_blank">Python Script Behind This Webpage: Terminology Data Tools Repository</a></p>
-                </body>
-                </html>
-            '''
+            # The NDC list and the drug name don't depend on each other, so fetch them at the same time
+            with self.trace.stage("lookup"):
+                (ndcs, api_url), (drug_name, term_type) = rxnav_client.run_concurrently(
+                    lambda: rxcui_to_ndc(rxcui),
+                    lambda: get_rxcui_info(rxcui),
+                )
+            with self.trace.stage("render"):
+                api_urls = API_URLS.render(api_url=api_url) if show_urls else b""
+                body = RESULT_PAGE.render(checked=checked, rxcui=rxcui, drug_name=drug_name, term_type=term_type,
+                                          ndc_list=', '.join(ndcs), api_urls=api_urls)
         except Exception as e:
-            response = f'''
-                <!doctype html>
-                <html>
-                <head>
-                    <title>RXCUI to NDC Converter</title>
-                    <style>
-                        body {{
-                            text-align: center;
-                        }}
-                    </style>
-                </head>
-                <body>
-                    <h1>RXCUI to NDC Converter</h1>
-                    <form method="post">
-                        <label for="rxcui" title="RXCUI is a unique identifier for drugs in the RxNorm database.">RXCUI:</label>
-                        <input type="text" name="rxcui">
-                        <br>
-                        <input type="checkbox" name="show_urls" value="yes" {'checked' if show_urls else ''}>
-                        <label for="show_urls">Show API URLs</label>
-                        <br>
-                        <input type="submit" value="Convert">
-                    </form>
-                    <h2>Error: {str(e)}</h2>
-                    <p><a href="https://github.com/erinsim/terminology-data-tools" target="_blank">Python Script Behind This Webpage: Terminology Data Tools Repository</a></p>
-                </body>
-                </html>
-            '''
-        
-        self.wfile.write(response.encode('utf-8'))
+            record_error(e)
+            with self.trace.stage("render"):
+                body = ERROR_PAGE.render(checked=checked, error=str(e))
+
+        pages.send_html(self, body)
 
-# Start the HTTP server
-with socketserver.TCPServer(("", PORT), MyHandler) as httpd:
-    print(f"Serving on port {PORT}")
-    httpd.serve_forever()
\ No newline at end of file
+# Start the HTTP server (see serving.py for --mode, --workers and --backlog).
+# Each serving process loads the name search index, prewarms the hot list and
+# keeps the caches refreshed.
+if __name__ == "__main__":
+    serving.main(MyHandler, PORT, on_start=prewarm.prepare_process)
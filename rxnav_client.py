@@ -0,0 +1,297 @@
+import contextlib
+import contextvars
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+from circuit_breaker import CircuitBreaker
+from ndc_normalize import normalize_ndc
+
+# Base URL of the RxNorm REST API
+BASE_URL = "https://rxnav.nlm.nih.gov/REST"
+
+# Connection pool and retry defaults (change these if needed)
+POOL_SIZE = 10  # Number of keep-alive connections kept open to RxNav
+CONNECT_TIMEOUT = 3.05  # Seconds to wait for the TCP/TLS connection
+READ_TIMEOUT = 10  # Seconds to wait for RxNav to send a response
+RETRIES = 3  # Number of retries for failed GET requests
+BACKOFF_FACTOR = 0.5  # Exponential backoff factor between retries
+BACKOFF_JITTER = 0.5  # Up to this many random extra seconds per backoff, so clients don't retry in lockstep
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+CONCURRENT_LOOKUPS = 32  # Threads shared by all requests for independent lookups
+HISTORY = 2  # NDC history depth: 0 = current NDCs, 1 = + obsolete ones, 2 = + NDCs of remapped concepts
+RELATED_TTYS = ("SCD", "SBD", "GPCK", "BPCK", "IN", "MIN", "BN")  # Term types get_related asks for by default
+
+
+UPSTREAM_SECONDS = metrics.histogram(
+    "rxnav_upstream_request_seconds", "Time spent in RxNav requests, by endpoint", ("endpoint",))
+UPSTREAM_RESPONSES = metrics.counter(
+    "rxnav_upstream_responses_total", "RxNav responses by endpoint and HTTP status (error = no response)",
+    ("endpoint", "status"))
+
+
+# Raised when RxNav answers successfully but has no data for the code
+class NotFoundError(Exception):
+    pass
+
+
+# Client that sends every RxNav lookup through one keep-alive connection pool.
+# Every request has connect/read timeouts, failed GETs are retried with
+# jittered exponential backoff, and a circuit breaker fails requests fast
+# while RxNav keeps failing.
+class RxNavClient:
+    def __init__(self, base_url=BASE_URL, pool_size=POOL_SIZE,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 retries=RETRIES, backoff_factor=BACKOFF_FACTOR, breaker=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        retry_options = dict(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+        )
+        try:
+            retry = Retry(backoff_jitter=BACKOFF_JITTER, **retry_options)
+        except TypeError:  # urllib3 < 2 has no jitter option
+            retry = Retry(**retry_options)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    # Send a GET request over the pooled session and return the decoded JSON.
+    # Connection errors, timeouts and retryable statuses (after the retries)
+    # count as failures for the circuit breaker.
+    def get_json(self, url):
+        self.breaker.check()
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            status = response.status_code
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        finally:
+            record_call(url, started, status)
+
+        if response.status_code in RETRY_STATUSES:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        if response.status_code != 200:
+            raise Exception(f"API request failed with status code {response.status_code}")
+
+        return response.json()
+
+    # Convert an NDC to its RXCUI
+    def ndc_to_rxcui(self, ndc):
+        url = f"{self.base_url}/ndcstatus.json?ndc={normalize_ndc(ndc)}"
+        data = self.get_json(url)
+
+        if 'ndcStatus' in data and 'rxcui' in data['ndcStatus']:
+            return data['ndcStatus']['rxcui'], url
+        else:
+            raise NotFoundError("RXCUI not found for the given NDC")
+
+    # Get the properties (name, term type, ...) of an RXCUI
+    def get_rxcui_info(self, rxcui):
+        url = f"{self.base_url}/rxcui/{quote(rxcui)}/properties.json"
+        data = self.get_json(url)
+
+        if 'properties' in data:
+            return data['properties'], url
+        else:
+            raise NotFoundError("Properties not found for the given RXCUI")
+
+    # Convert an RXCUI to the list of its NDCs
+    def rxcui_to_ndc(self, rxcui):
+        url = f"{self.base_url}/rxcui/{quote(rxcui)}/ndcs.json"
+        data = self.get_json(url)
+
+        if 'ndcGroup' in data and 'ndcList' in data['ndcGroup'] and 'ndc' in data['ndcGroup']['ndcList']:
+            return data['ndcGroup']['ndcList']['ndc'], url
+        else:
+            raise NotFoundError("NDC not found for the given RXCUI")
+
+    # Get the NDCs an RXCUI has had over time as [ndc, status, start_date, end_date]
+    # lists, where status is "direct" or "indirect" (via a remapped concept) and
+    # the dates are YYYYMM months of the first and last release listing the NDC
+    def rxcui_to_historical_ndcs(self, rxcui, history=HISTORY):
+        url = f"{self.base_url}/rxcui/{quote(rxcui)}/allhistoricalndcs.json?history={int(history)}"
+        data = self.get_json(url)
+
+        ndcs = []
+        for concept in (data.get('historicalNdcConcept') or {}).get('historicalNdcTime', []):
+            for period in concept.get('ndcTime', []):
+                for ndc in period.get('ndc', []):
+                    ndcs.append([ndc, concept.get('status', ''), period.get('startDate', ''),
+                                 period.get('endDate', '')])
+        if ndcs:
+            return ndcs, url
+        else:
+            raise NotFoundError("NDC history not found for the given RXCUI")
+
+    # Get the concepts of the given term types related to an RXCUI (directly
+    # or through RxNorm's relationship paths) as a list of property dicts with
+    # rxcui, name and tty, across every term type asked for
+    def get_related(self, rxcui, ttys=RELATED_TTYS):
+        url = f"{self.base_url}/rxcui/{quote(rxcui)}/related.json?tty={'+'.join(ttys)}"
+        data = self.get_json(url)
+
+        concepts = [concept for group in (data.get('relatedGroup') or {}).get('conceptGroup', [])
+                    for concept in group.get('conceptProperties', [])]
+        if concepts:
+            return concepts, url
+        else:
+            raise NotFoundError("No related concepts found for the given RXCUI")
+
+    # Get the version of the RxNorm data RxNav is serving (e.g. "06-Oct-2025"),
+    # which changes with each monthly release
+    def get_version(self):
+        url = f"{self.base_url}/version.json"
+        data = self.get_json(url)
+
+        if data.get('version'):
+            return data['version'], url
+        else:
+            raise NotFoundError("RxNav did not report a data version")
+
+    def close(self):
+        self.session.close()
+
+
+# Escape a user-supplied code before putting it in a URL
+def quote(code):
+    return urllib.parse.quote(str(code).strip(), safe="")
+
+
+# Upstream calls made while handling one request, with their start offsets
+# and durations, so serial and overlapping calls can be told apart. Handlers
+# can also time their own stages (e.g. lookup, render) with stage().
+class Trace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.calls = []
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, started, finished):
+        with self._lock:
+            self.calls.append((endpoint, started - self.started, finished - started))
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - started))
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        stages = "".join(f" {name}={duration * 1000:.1f}ms" for name, duration in self.stages)
+        calls = " ".join(f"{endpoint}@{offset * 1000:.1f}+{duration * 1000:.1f}ms"
+                         for endpoint, offset, duration in sorted(self.calls, key=lambda c: c[1]))
+        return f"wall={self.elapsed() * 1000:.1f}ms{stages} upstream_calls={len(self.calls)} {calls}".rstrip()
+
+
+_trace = contextvars.ContextVar("rxnav_trace", default=None)
+
+
+# Start recording the upstream calls made by the current request
+def start_trace():
+    trace = Trace()
+    _trace.set(trace)
+    return trace
+
+
+# Record a finished RxNav request in the upstream metrics and add it to the
+# active trace, if there is one
+def record_call(url, started, status="error"):
+    finished = time.perf_counter()
+    endpoint = urllib.parse.urlparse(url).path.rsplit("/", 1)[-1].split(".")[0]
+    UPSTREAM_SECONDS.observe(finished - started, endpoint=endpoint)
+    UPSTREAM_RESPONSES.inc(endpoint=endpoint, status=status)
+    trace = _trace.get()
+    if trace is not None:
+        trace.record(endpoint, started, finished)
+
+
+_executor = ThreadPoolExecutor(max_workers=CONCURRENT_LOOKUPS, thread_name_prefix="rxnav-lookup")
+
+
+# Run independent lookups at the same time and return their results in order.
+# Each call is a function taking no arguments; if any of them raises, the
+# first failure (in argument order) is raised once all have finished.
+def run_concurrently(*calls):
+    futures = [_executor.submit(contextvars.copy_context().run, call) for call in calls]
+    wait(futures)
+    return [future.result() for future in futures]
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+# Return the process-wide client, creating it on first use
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = RxNavClient()
+    return _client
+
+
+# The process-wide client if one has been created or set, else None
+def current_client():
+    return _client
+
+
+# Replace the process-wide client (e.g. to change pool size or point at a stub server)
+def set_client(client):
+    global _client
+    with _client_lock:
+        _client = client
+
+
+# Module-level lookups go through the process-wide client. NDCs are
+# canonicalized first, so every format of the same NDC shares one cache entry
+# and malformed input fails with InvalidNDCError without a network call.
+def ndc_to_rxcui(ndc):
+    return get_client().ndc_to_rxcui(normalize_ndc(ndc))
+
+
+def get_rxcui_info(rxcui):
+    return get_client().get_rxcui_info(rxcui)
+
+
+def rxcui_to_ndc(rxcui):
+    return get_client().rxcui_to_ndc(rxcui)
+
+
+def rxcui_to_historical_ndcs(rxcui, history=HISTORY):
+    return get_client().rxcui_to_historical_ndcs(rxcui, history)
+
+
+def get_related(rxcui, ttys=RELATED_TTYS):
+    return get_client().get_related(rxcui, ttys)
+
+
+def get_version():
+    return get_client().get_version()
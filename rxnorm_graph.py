@@ -0,0 +1,163 @@
+import argparse
+import sys
+import threading
+
+import rxnav_client
+from batch import WORKERS, RowWriter, canonical_ndcs, dedupe, read_codes, resolve_concurrently
+from ndc_normalize import normalize_ndc
+from rxnav_client import NotFoundError
+from single_flight import SingleFlight
+
+# Term types of the concepts a product rolls up to
+ROLLUP_TTYS = ("SCD", "GPCK", "IN", "MIN", "BN")
+
+# One row per NDC (or RXCUI) and ingredient. SCDs, multiple-ingredient
+# concepts and brands that a product has several of are joined with "|".
+ROLLUP_FIELDS = ["ndc", "product_rxcui", "product_name", "product_tty", "clinical_rxcui", "clinical_name",
+                 "ingredient_rxcui", "ingredient_name", "min_rxcui", "min_name", "brand_rxcui", "brand_name"]
+
+
+def _joined(concepts, field):
+    return "|".join(concept[field] for concept in concepts)
+
+
+# Memoized view of the RxNorm concept graph for one batch. Every node
+# (properties of an RXCUI) and every edge list (the concepts of some term types
+# related to an RXCUI) is fetched at most once, however many NDCs lead to it,
+# and concurrent requests for the same one share a single fetch. Nodes learned
+# from related-concept answers are kept too, so ingredients and brands shared
+# by many products never need lookups of their own. Lookups go through the
+# process-wide client: RxNav behind the caches, or a local index.
+class RxNormGraph:
+    def __init__(self):
+        self.nodes = {}
+        self.edges = {}
+        self.single_flight = SingleFlight()
+        self._lock = threading.Lock()
+
+    # Properties (rxcui, name, tty) of an RXCUI
+    def node(self, rxcui):
+        rxcui = str(rxcui).strip()
+        node = self.nodes.get(rxcui)
+        if node is None:
+            properties, _ = self.single_flight.do(("node", rxcui), lambda: rxnav_client.get_rxcui_info(rxcui))
+            node = {"rxcui": rxcui, "name": properties.get("name", ""), "tty": properties.get("tty", "")}
+            with self._lock:
+                self.nodes[rxcui] = node
+        return node
+
+    # RXCUIs of the concepts of term types ttys related to rxcui; empty if none
+    def related(self, rxcui, ttys=ROLLUP_TTYS):
+        key = (str(rxcui).strip(), tuple(ttys))
+        related = self.edges.get(key)
+        if related is None:
+            related = self.single_flight.do(("edges", *key), lambda: self._fetch_related(*key))
+        return [self.nodes[node] for node in related]
+
+    def _fetch_related(self, rxcui, ttys):
+        try:
+            concepts, _ = rxnav_client.get_related(rxcui, ttys)
+        except NotFoundError:
+            concepts = []
+        with self._lock:
+            for concept in concepts:
+                self.nodes.setdefault(concept["rxcui"], {"rxcui": concept["rxcui"], "name": concept.get("name", ""),
+                                                         "tty": concept.get("tty", "")})
+            related = self.edges[(rxcui, ttys)] = tuple(dict.fromkeys(concept["rxcui"] for concept in concepts))
+        return related
+
+    # Roll a product RXCUI up to its clinical drug (the SCD, or the product
+    # itself if it is one), its ingredients, multiple-ingredient concept and
+    # brand. Returns one row per ingredient, without the ndc field.
+    def rollup(self, rxcui):
+        product = self.node(rxcui)
+        related = self.related(rxcui)
+        by_tty = {}
+        for concept in related:
+            by_tty.setdefault(concept["tty"], []).append(concept)
+
+        clinical = [product] if product["tty"] in ("SCD", "GPCK") else by_tty.get("SCD", []) + by_tty.get("GPCK", [])
+        base = {
+            "product_rxcui": product["rxcui"],
+            "product_name": product["name"],
+            "product_tty": product["tty"],
+            "clinical_rxcui": _joined(clinical, "rxcui"),
+            "clinical_name": _joined(clinical, "name"),
+            "min_rxcui": _joined(by_tty.get("MIN", []), "rxcui"),
+            "min_name": _joined(by_tty.get("MIN", []), "name"),
+            "brand_rxcui": _joined(by_tty.get("BN", []), "rxcui"),
+            "brand_name": _joined(by_tty.get("BN", []), "name"),
+        }
+        ingredients = by_tty.get("IN") or [{"rxcui": "", "name": ""}]
+        return [{**base, "ingredient_rxcui": ingredient["rxcui"], "ingredient_name": ingredient["name"]}
+                for ingredient in ingredients]
+
+    # Roll an NDC up through the product it belongs to
+    def rollup_ndc(self, ndc):
+        rxcui, _ = rxnav_client.ndc_to_rxcui(ndc)
+        return [{"ndc": normalize_ndc(ndc), **row} for row in self.rollup(rxcui)]
+
+
+# Roll codes up concurrently on one shared graph and yield (row, rollup_rows)
+# per unique code as each finishes. row is the batch status row; rollup_rows
+# is empty when the lookup failed.
+def rollup_codes(codes, key="ndc", workers=WORKERS, graph=None):
+    graph = graph if graph is not None else RxNormGraph()
+    if key == "ndc":
+        codes = canonical_ndcs(codes)
+
+        def lookup(ndc):
+            return {"rows": graph.rollup_ndc(ndc)}
+    else:
+        def lookup(rxcui):
+            return {"rows": graph.rollup(rxcui)}
+
+    for row in resolve_concurrently(dedupe(codes, set()), lookup, key, workers):
+        yield row, row.pop("rows", [])
+
+
+# Write the flattened rollup table for every code in input_path to
+# output_path (CSV or JSONL). Failed codes are written to errors_path if given.
+# Returns counts by status, plus the number of graph nodes fetched.
+def run_rollup(input_path, output_path="-", key="ndc", workers=WORKERS, column=None, errors_path=None):
+    fmt = "jsonl" if output_path.endswith(".jsonl") else "csv"
+    writer = RowWriter(output_path, fmt, ROLLUP_FIELDS)
+    errors = RowWriter(errors_path, "csv", [key, "status", "error"]) if errors_path else None
+    graph = RxNormGraph()
+    counts = {"rows": 0}
+    try:
+        for row, rows in rollup_codes(read_codes(input_path, column), key, workers, graph):
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+            for rollup_row in rows:
+                writer.write(rollup_row)
+            counts["rows"] += len(rows)
+            if not rows and errors is not None:
+                errors.write(row)
+    finally:
+        writer.close()
+        if errors is not None:
+            errors.close()
+    counts["nodes"] = len(graph.nodes)
+    counts["edge_lists"] = len(graph.edges)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Roll NDCs or RXCUIs up to their clinical drug, ingredients and brand (flattened table)")
+    parser.add_argument("--input", required=True, help="file of codes (CSV, JSONL or one per line; '-' for stdin)")
+    parser.add_argument("--output", default="-", help="CSV or JSONL file to write (default: CSV on stdout)")
+    parser.add_argument("--rxcuis", action="store_true", help="the input holds product RXCUIs instead of NDCs")
+    parser.add_argument("--column", help="CSV column or JSON key holding the codes")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="lookups in flight at once")
+    parser.add_argument("--errors", help="CSV file for codes that could not be rolled up")
+    parser.add_argument("--index", help="traverse a local RxNorm index (built with RXNREL.RRF) instead of RxNav")
+    args = parser.parse_args()
+
+    if args.index:
+        from rxnorm_index import LocalRxNormIndex
+        rxnav_client.set_client(LocalRxNormIndex(args.index))
+
+    counts = run_rollup(args.input, args.output, key="rxcui" if args.rxcuis else "ndc", workers=args.workers,
+                        column=args.column, errors_path=args.errors)
+    print(", ".join(f"{status}: {count}" for status, count in counts.items()), file=sys.stderr)
@@ -0,0 +1,293 @@
+import argparse
+import os
+import sqlite3
+import threading
+
+from ndc_normalize import normalize_ndc
+from rxnav_client import HISTORY, RELATED_TTYS, NotFoundError
+
+# Default location of the built index (change this if needed)
+INDEX_PATH = "rxnorm_index.sqlite3"
+
+# RxNorm term types that are synonyms rather than the concept's own name
+SYNONYM_TTYS = ("SY", "TMSY")
+SKIPPED_TTYS = ("PSN",)
+
+# Paths get_related follows through the relation table: from the concept to
+# any related concept, then from its drug components down to ingredients
+# (SBD -> SBDC -> SCDC -> IN), never back up to other products.
+# Component term type -> component term types it leads on to.
+COMPONENT_PATHS = {"SCDC": (), "SBDC": ("SCDC",)}
+INGREDIENT_TTYS = ("IN", "PIN", "MIN", "BN")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ndc_rxcui (
+    ndc TEXT NOT NULL,
+    rxcui TEXT NOT NULL,
+    PRIMARY KEY (ndc, rxcui)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ndc_rxcui_by_rxcui ON ndc_rxcui (rxcui, ndc);
+CREATE TABLE IF NOT EXISTS concept (
+    rxcui TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    synonym TEXT NOT NULL,
+    tty TEXT NOT NULL,
+    suppress TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS relation (
+    rxcui1 TEXT NOT NULL,
+    rela TEXT NOT NULL,
+    rxcui2 TEXT NOT NULL,
+    PRIMARY KEY (rxcui1, rela, rxcui2)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS relation_by_rxcui2 ON relation (rxcui2, rxcui1);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+"""
+
+
+# Read the pipe-delimited rows of an RRF file one at a time
+def read_rrf(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield line.rstrip("\n").split("|")
+
+
+# NDC attributes from RXNSAT.RRF (the current NDCs RxNav reports for each RXCUI)
+def read_ndc_rows(path):
+    for row in read_rrf(path):
+        rxcui, atn, sab, atv, suppress = row[0], row[8], row[9], row[10], row[11]
+        if atn == "NDC" and sab == "RXNORM" and suppress == "N":
+            yield atv, rxcui
+
+
+# Concept names, synonyms and term types from RXNCONSO.RRF
+def read_concept_rows(path):
+    concepts = {}
+    for row in read_rrf(path):
+        rxcui, sab, tty, name, suppress = row[0], row[11], row[12], row[14], row[16]
+        if sab != "RXNORM" or tty in SKIPPED_TTYS:
+            continue
+        concept = concepts.setdefault(rxcui, {"name": "", "synonym": "", "tty": "", "suppress": ""})
+        if tty in SYNONYM_TTYS:
+            # Suppressed atoms (obsolete or not for display) are not offered as synonyms
+            if not concept["synonym"] and suppress == "N":
+                concept["synonym"] = name
+        elif not concept["name"]:
+            concept.update(name=name, tty=tty, suppress=suppress)
+    for rxcui, concept in concepts.items():
+        if concept["name"]:
+            yield rxcui, concept["name"], concept["synonym"], concept["tty"], concept["suppress"]
+
+
+# Concept-level relationships from RXNREL.RRF
+def read_relation_rows(path):
+    for row in read_rrf(path):
+        rxcui1, rxcui2, rela, sab, suppress = row[0], row[4], row[7], row[10], row[14]
+        if sab == "RXNORM" and rxcui1 and rxcui2 and suppress != "Y":
+            yield rxcui1, rela, rxcui2
+
+
+# Fingerprint of a source file, used to skip files that did not change
+def file_signature(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _get_meta(conn, key):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+
+# Replace the contents of table with rows, touching only rows that changed.
+# Returns the number of rows added and removed.
+def _sync_table(conn, table, columns, rows):
+    column_list = ", ".join(columns)
+    placeholders = ", ".join("?" for _ in columns)
+    match = " AND ".join(f"s.{c} = {table}.{c}" for c in columns)
+
+    conn.execute(f"DROP TABLE IF EXISTS temp.staged_{table}")
+    conn.execute(f"CREATE TEMP TABLE staged_{table} AS SELECT {column_list} FROM {table} WHERE 0")
+    conn.executemany(f"INSERT INTO staged_{table} ({column_list}) VALUES ({placeholders})", rows)
+    conn.execute(f"CREATE INDEX temp.staged_{table}_all ON staged_{table} ({column_list})")
+
+    removed = conn.execute(
+        f"DELETE FROM {table} WHERE NOT EXISTS (SELECT 1 FROM staged_{table} s WHERE {match})"
+    ).rowcount
+    added = conn.execute(
+        f"INSERT OR REPLACE INTO {table} ({column_list}) "
+        f"SELECT {column_list} FROM staged_{table} s "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE {match})"
+    ).rowcount
+    conn.execute(f"DROP TABLE temp.staged_{table}")
+    return added, removed
+
+
+# Build or update the local index from an RxNorm release's rrf directory.
+# With incremental=True, source files whose size and mtime match the last
+# build are skipped and only changed rows are written. RXNREL.RRF is optional;
+# without it the index has no relationships for get_related.
+def build_index(rrf_dir, index_path=INDEX_PATH, release=None, incremental=True):
+    sources = {
+        "ndc_rxcui": (os.path.join(rrf_dir, "RXNSAT.RRF"), ("ndc", "rxcui"), read_ndc_rows),
+        "concept": (os.path.join(rrf_dir, "RXNCONSO.RRF"), ("rxcui", "name", "synonym", "tty", "suppress"),
+                    read_concept_rows),
+        "relation": (os.path.join(rrf_dir, "RXNREL.RRF"), ("rxcui1", "rela", "rxcui2"), read_relation_rows),
+    }
+    if release is None:
+        release = os.path.basename(os.path.dirname(os.path.abspath(rrf_dir)))
+
+    summary = {}
+    conn = sqlite3.connect(index_path)
+    try:
+        conn.executescript(SCHEMA)
+        for table, (path, columns, reader) in sources.items():
+            if table == "relation" and not os.path.exists(path):
+                summary[table] = "missing"
+                continue
+            signature = file_signature(path)
+            if incremental and _get_meta(conn, f"{table}_source") == signature:
+                summary[table] = "unchanged"
+                continue
+            with conn:
+                if not incremental:
+                    conn.execute(f"DELETE FROM {table}")
+                added, removed = _sync_table(conn, table, columns, reader(path))
+                _set_meta(conn, f"{table}_source", signature)
+            summary[table] = f"+{added} -{removed}"
+        with conn:
+            _set_meta(conn, "release", release)
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    summary["release"] = release
+    return summary
+
+
+# Lookup backend that answers ndc_to_rxcui, get_rxcui_info and rxcui_to_ndc
+# from a built index instead of the RxNav API
+class LocalRxNormIndex:
+    def __init__(self, index_path=INDEX_PATH):
+        if not os.path.exists(index_path):
+            raise Exception(f"RxNorm index not found: {index_path}")
+        self.index_path = index_path
+        self.base_url = f"local://{os.path.basename(index_path)}"
+        self._local = threading.local()
+        self.release = _get_meta(self._connect(), "release")
+
+    # Each thread gets its own read-only connection
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            uri = f"file:{os.path.abspath(self.index_path)}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def ndc_to_rxcui(self, ndc):
+        ndc = normalize_ndc(ndc)
+        url = f"{self.base_url}/ndcstatus?ndc={ndc}"
+        row = self._connect().execute(
+            "SELECT rxcui FROM ndc_rxcui WHERE ndc = ? ORDER BY rxcui LIMIT 1", (ndc,)
+        ).fetchone()
+
+        if row:
+            return row[0], url
+        else:
+            raise NotFoundError("RXCUI not found for the given NDC")
+
+    def get_rxcui_info(self, rxcui):
+        rxcui = str(rxcui).strip()
+        url = f"{self.base_url}/rxcui/{rxcui}/properties"
+        row = self._connect().execute(
+            "SELECT name, synonym, tty, suppress FROM concept WHERE rxcui = ?", (rxcui,)
+        ).fetchone()
+
+        if row:
+            name, synonym, tty, suppress = row
+            properties = {"rxcui": rxcui, "name": name, "synonym": synonym, "tty": tty,
+                          "language": "ENG", "suppress": suppress, "umlscui": ""}
+            return properties, url
+        else:
+            raise NotFoundError("Properties not found for the given RXCUI")
+
+    def rxcui_to_ndc(self, rxcui):
+        rxcui = str(rxcui).strip()
+        url = f"{self.base_url}/rxcui/{rxcui}/ndcs"
+        rows = self._connect().execute(
+            "SELECT ndc FROM ndc_rxcui WHERE rxcui = ? ORDER BY ndc", (rxcui,)
+        ).fetchall()
+
+        if rows:
+            return [row[0] for row in rows], url
+        else:
+            raise NotFoundError("NDC not found for the given RXCUI")
+
+    # The index holds only the current (unsuppressed) NDCs, so every history
+    # depth gets them as direct links without dates
+    def rxcui_to_historical_ndcs(self, rxcui, history=HISTORY):
+        ndcs, url = self.rxcui_to_ndc(rxcui)
+        return [[ndc, "direct", "", ""] for ndc in ndcs], url
+
+    # Related concepts of the given term types, following COMPONENT_PATHS
+    # through the relation table
+    def get_related(self, rxcui, ttys=RELATED_TTYS):
+        rxcui = str(rxcui).strip()
+        url = f"{self.base_url}/rxcui/{rxcui}/related?tty={'+'.join(ttys)}"
+        conn = self._connect()
+        found = {}
+        seen = {rxcui}
+        frontier = [(rxcui, None)]
+        while frontier:
+            node, node_tty = frontier.pop()
+            rows = conn.execute(
+                "SELECT c.rxcui, c.name, c.tty FROM relation r JOIN concept c ON c.rxcui = r.rxcui2 "
+                "WHERE r.rxcui1 = ? ORDER BY c.rxcui", (node,)
+            ).fetchall()
+            for related, name, tty in rows:
+                if related in seen:
+                    continue
+                if node_tty is None or tty in INGREDIENT_TTYS or tty in COMPONENT_PATHS[node_tty]:
+                    seen.add(related)
+                    if tty in ttys:
+                        found[related] = {"rxcui": related, "name": name, "tty": tty}
+                    if tty in COMPONENT_PATHS:
+                        frontier.append((related, tty))
+
+        if found:
+            return list(found.values()), url
+        else:
+            raise NotFoundError("No related concepts found for the given RXCUI")
+
+    # The release tag recorded by build_index, read again on every call so a
+    # rebuild in place is noticed without reopening the index
+    def get_version(self):
+        release = _get_meta(self._connect(), "release")
+        if release:
+            return release, self.base_url
+        raise NotFoundError("The RxNorm index has no release tag")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a local RxNorm index from RRF release files")
+    parser.add_argument("rrf_dir", help="directory containing RXNSAT.RRF, RXNCONSO.RRF and (optionally) RXNREL.RRF")
+    parser.add_argument("--index", default=INDEX_PATH, help="index file to create or update")
+    parser.add_argument("--release", help="release tag to record (default: name of the release directory)")
+    parser.add_argument("--full", action="store_true", help="rebuild every table instead of applying changes")
+    args = parser.parse_args()
+
+    summary = build_index(args.rrf_dir, args.index, release=args.release, incremental=not args.full)
+    for table, result in summary.items():
+        print(f"{table}: {result}")
@@ -0,0 +1,272 @@
+import argparse
+import http.server
+import os
+import selectors
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Serving defaults (change these if needed)
+WORKERS = 16  # Threads per process (thread mode) or processes (fork mode)
+THREADS_PER_PROCESS = 8  # Threads inside each forked worker process
+BACKLOG = 128  # Pending connections the kernel queues before refusing new ones
+QUEUE_SIZE = 16  # Accepted connections waiting for a free thread; past this the server stops accepting
+KEEPALIVE_TIMEOUT = 5  # Seconds an idle keep-alive connection is held open
+MIN_UPTIME = 10  # Fork mode: a worker that exits sooner than this is restarted after a delay
+MAX_RESTART_DELAY = 30  # Fork mode: longest delay before restarting a failing worker (doubles from 1 s)
+
+_STARTUP_FAILED = 3  # Exit status of a forked worker whose on_start raised
+
+
+# HTTP server that handles connections on a fixed-size thread pool instead of
+# one connection at a time (socketserver.TCPServer) or one unbounded thread
+# per connection (http.server.ThreadingHTTPServer). At most queue_size
+# accepted connections wait for a thread; beyond that the server stops
+# accepting, so further clients wait in the listen backlog (and, in fork mode,
+# go to another worker process). When every thread is taken, keep-alive
+# connections idling between requests are closed to free their threads, and
+# busy ones are closed after their current response (see _KeepAliveMixin).
+class PooledHTTPServer(http.server.HTTPServer):
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class, workers=WORKERS, backlog=BACKLOG, queue_size=QUEUE_SIZE,
+                 bind_and_activate=True):
+        self.request_queue_size = backlog
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="http-worker")
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.connections = 0
+        self.idle = set()
+        self._lock = threading.Lock()
+        super().__init__(server_address, handler_class, bind_and_activate)
+
+    def process_request(self, request, client_address):
+        if self.connections >= self.workers:
+            self.close_idle_connections()
+        while not self.slots.acquire(timeout=0.1):
+            self.close_idle_connections()
+        with self._lock:
+            self.connections += 1
+        self.executor.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._lock:
+                self.connections -= 1
+            self.slots.release()
+
+    # Wait up to timeout seconds for the next request on a keep-alive
+    # connection. Returns False if none came or the connection was closed
+    # meanwhile by close_idle_connections().
+    def wait_for_request(self, connection, timeout):
+        with self._lock:
+            self.idle.add(connection)
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(connection, selectors.EVENT_READ)
+                ready = selector.select(timeout)
+        except (OSError, ValueError):
+            ready = []
+        with self._lock:
+            if connection not in self.idle:
+                return False
+            self.idle.discard(connection)
+        return bool(ready)
+
+    # Close the keep-alive connections waiting for their next request
+    def close_idle_connections(self):
+        with self._lock:
+            idle, self.idle = self.idle, set()
+        for connection in idle:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    # Wait for in-flight requests to finish once serve_forever() has returned
+    def drain(self):
+        self.executor.shutdown(wait=True)
+
+
+# Handle the requests of a keep-alive connection, waiting for each one after
+# the first through the server so it can close the connection while idle.
+# While other connections wait for a thread, responses say Connection: close
+# so the client reconnects and takes its turn in the queue.
+class _KeepAliveMixin:
+    def end_headers(self):
+        if not self.close_connection and self.server.connections > self.server.workers:
+            self.send_header("Connection", "close")
+        super().end_headers()
+
+    def handle(self):
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self._next_request():
+            self.handle_one_request()
+
+    def _next_request(self):
+        # A pipelined request may already be buffered, where select can't see it
+        self.connection.settimeout(0.0)
+        try:
+            buffered = self.rfile.peek(1)
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+        return bool(buffered) or self.server.wait_for_request(self.connection, self.timeout)
+
+
+# Give a request handler class HTTP/1.1 keep-alive with an idle timeout, for
+# use with PooledHTTPServer. Handlers must send a Content-Length header on
+# every response. Responses are buffered into one write and Nagle is
+# disabled, otherwise headers and body go out as separate packets and
+# delayed ACKs add ~40 ms per response.
+def keepalive_handler(handler_class, timeout=KEEPALIVE_TIMEOUT):
+    return type(handler_class.__name__, (_KeepAliveMixin, handler_class), {
+        "protocol_version": "HTTP/1.1",
+        "timeout": timeout,
+        "wbufsize": -1,
+        "disable_nagle_algorithm": True,
+    })
+
+
+# Stop accepting connections when the process receives SIGTERM or SIGINT.
+# shutdown() blocks until serve_forever() returns, so it runs on its own thread.
+def _install_signal_handlers(server):
+    def handle(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, handle)
+    signal.signal(signal.SIGINT, handle)
+
+
+# Serve on a thread pool in this process until SIGTERM/SIGINT
+def serve_threaded(handler_class, port, workers=WORKERS, backlog=BACKLOG, on_start=None, queue_size=QUEUE_SIZE):
+    server = PooledHTTPServer(("", port), keepalive_handler(handler_class), workers=workers, backlog=backlog,
+                              queue_size=queue_size)
+    _install_signal_handlers(server)
+    if on_start:
+        on_start()
+    print(f"Serving on port {port} ({workers} threads)")
+    try:
+        server.serve_forever()
+        server.drain()
+    finally:
+        server.server_close()
+
+
+# Bind once, then fork worker processes that all accept on the shared socket.
+# The parent restarts workers that die and forwards SIGTERM/SIGINT to them.
+# on_start runs in each worker after the fork, so background threads it
+# starts exist in every serving process. If it raises, the worker prints the
+# traceback and the server stops, since every worker would fail the same way.
+# Workers that crash or exit soon after starting are restarted after a delay
+# that doubles up to MAX_RESTART_DELAY, instead of in a tight fork loop.
+def serve_forked(handler_class, port, workers=WORKERS, threads=THREADS_PER_PROCESS, backlog=BACKLOG,
+                 on_start=None, queue_size=QUEUE_SIZE):
+    listener = socket.create_server(("", port), backlog=backlog)
+    children = {}  # pid -> time.monotonic() when forked
+    stopping = False
+    startup_failed = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            server = PooledHTTPServer(("", port), keepalive_handler(handler_class), workers=threads,
+                                      queue_size=queue_size, bind_and_activate=False)
+            server.socket.close()
+            server.socket = listener
+            _install_signal_handlers(server)
+            status = _STARTUP_FAILED
+            try:
+                if on_start:
+                    on_start()
+                status = 1
+                server.serve_forever()
+                server.drain()
+                status = 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(status)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(workers):
+        spawn()
+    print(f"Serving on port {port} ({workers} processes x {threads} threads)")
+
+    delay = 0
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        forked_at = children.pop(pid, None)
+        if stopping or forked_at is None:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        if code == _STARTUP_FAILED:
+            print(f"Worker {pid} failed to start; stopping the server", file=sys.stderr)
+            startup_failed = True
+            stop(None, None)
+            continue
+        if code != 0 or time.monotonic() - forked_at < MIN_UPTIME:
+            delay = min(max(delay * 2, 1), MAX_RESTART_DELAY)
+            print(f"Worker {pid} exited with status {code}; restarting it in {delay}s", file=sys.stderr)
+            deadline = time.monotonic() + delay
+            while not stopping and time.monotonic() < deadline:
+                time.sleep(0.1)
+        else:
+            delay = 0
+        if not stopping:
+            spawn()
+    listener.close()
+    if startup_failed:
+        raise Exception("A worker process failed to start (see the traceback above)")
+
+
+# Command-line entry point shared by the converter servers. on_start is called
+# in every serving process before it starts accepting requests.
+def main(handler_class, port, on_start=None):
+    parser = argparse.ArgumentParser(description="Run the converter web server")
+    parser.add_argument("--port", type=int, default=port, help="port to listen on")
+    parser.add_argument("--mode", choices=["thread", "fork"], default="thread",
+                        help="thread pool in one process, or pre-forked worker processes")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="threads (thread mode) or processes (fork mode)")
+    parser.add_argument("--threads", type=int, default=THREADS_PER_PROCESS,
+                        help="threads per process in fork mode")
+    parser.add_argument("--backlog", type=int, default=BACKLOG, help="listen backlog")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE,
+                        help="accepted connections waiting for a thread, per process")
+    args = parser.parse_args()
+
+    if args.mode == "fork":
+        serve_forked(handler_class, args.port, args.workers, args.threads, args.backlog, on_start, args.queue_size)
+    else:
+        serve_threaded(handler_class, args.port, args.workers, args.backlog, on_start, args.queue_size)
@@ -0,0 +1,120 @@
+import asyncio
+import threading
+
+from rxnav_client import HISTORY, RELATED_TTYS
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Coalesces concurrent calls for the same key: the first caller runs the
+# function and every caller that arrives while it is in flight waits for and
+# shares its result or exception. For threaded callers.
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {"executions": self.executions, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+# Same as SingleFlight for asyncio callers; fn is an async function. Must be
+# used from a single event loop. The shared call runs as its own task and
+# every caller, the first one included, awaits it through asyncio.shield, so
+# cancelling one caller never cancels the call the others are waiting on.
+class AsyncSingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved so a call whose callers all left doesn't log a warning
+
+    def stats(self):
+        return {"executions": self.executions, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+# Wraps an RxNav client so concurrent lookups of the same code share one
+# upstream fetch. Sits below the in-process cache, where a burst of misses
+# (e.g. right after an entry expires) would otherwise each go to RxNav.
+class SingleFlightRxNavClient:
+    def __init__(self, client, single_flight=None):
+        self.client = client
+        self.single_flight = single_flight if single_flight is not None else SingleFlight()
+
+    def ndc_to_rxcui(self, ndc):
+        return self.single_flight.do(("ndcstatus", str(ndc).strip()), lambda: self.client.ndc_to_rxcui(ndc))
+
+    def get_rxcui_info(self, rxcui):
+        return self.single_flight.do(("properties", str(rxcui).strip()), lambda: self.client.get_rxcui_info(rxcui))
+
+    def rxcui_to_ndc(self, rxcui):
+        return self.single_flight.do(("ndcs", str(rxcui).strip()), lambda: self.client.rxcui_to_ndc(rxcui))
+
+    def rxcui_to_historical_ndcs(self, rxcui, history=HISTORY):
+        return self.single_flight.do((f"historicalndcs{int(history)}", str(rxcui).strip()),
+                                     lambda: self.client.rxcui_to_historical_ndcs(rxcui, history))
+
+    def get_related(self, rxcui, ttys=RELATED_TTYS):
+        return self.single_flight.do((f"related:{'+'.join(ttys)}", str(rxcui).strip()),
+                                     lambda: self.client.get_related(rxcui, ttys))
+
+    def get_version(self):
+        return self.client.get_version()
+
+    def stats(self):
+        return self.single_flight.stats()
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from benchmarks.mock_rxnav import start_mock_server
+from rxnorm_index import build_index
+
+
+# Mock RxNav on a background thread; tests inject faults through its handler
+# class (latency, stall_rate, error_rate)
+@pytest.fixture
+def mock_rxnav():
+    server, base_url = start_mock_server()
+    server.RequestHandlerClass.stall = 5.0
+    try:
+        yield server.RequestHandlerClass, base_url
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+SAMPLE_RRF = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks", "fixtures", "rxnorm_sample", "rrf")
+
+
+# RxNorm index built from the sample release in benchmarks/fixtures
+@pytest.fixture
+def sample_index(tmp_path):
+    index_path = str(tmp_path / "rxnorm_index.sqlite3")
+    build_index(SAMPLE_RRF, index_path)
+    return index_path
@@ -0,0 +1,49 @@
+import http.client
+import http.server
+import json
+import threading
+
+import pytest
+
+from api import JsonApiMixin
+from serving import PooledHTTPServer, keepalive_handler
+
+
+class Handler(JsonApiMixin, http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.do_POST_api()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def api_server():
+    server = PooledHTTPServer(("127.0.0.1", 0), keepalive_handler(Handler), workers=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.drain()
+    server.server_close()
+
+
+def post(server, path, body):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    conn.request("POST", path, json.dumps(body), {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    payload = response.read()
+    conn.close()
+    return response.status, payload
+
+
+@pytest.mark.parametrize("path", ["/api/bulk", "/api/expand", "/api/rollup"])
+@pytest.mark.parametrize("body", [
+    {"ndcs": "00002322730", "rxcuis": "861007"},
+    {"rxcuis": {"861007": 1}},
+    ["00002322730"],
+    "00002322730",
+])
+def test_code_lists_must_be_arrays_in_an_object(api_server, path, body):
+    status, payload = post(api_server, path, body)
+    assert status == 400
+    assert json.loads(payload)["error"].startswith("Body must be JSON like")
@@ -0,0 +1,62 @@
+import csv
+import json
+
+import pytest
+
+from batch import run_batch
+from rxnav_client import NotFoundError
+
+
+# Lookup whose failing codes the tests control
+class FlakyLookup:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+
+    def __call__(self, code):
+        self.calls.append(code)
+        if code in self.failing:
+            raise Exception("API request failed with status code 500")
+        if code == "0":
+            raise NotFoundError("No RXCUI found for the given NDC")
+        return {"rxcui": code * 2}
+
+
+def read_rows(path, fmt):
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "jsonl":
+            return [json.loads(line) for line in f]
+        return list(csv.DictReader(f))
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_resume_retries_errors_and_replaces_their_rows(tmp_path, fmt):
+    codes = tmp_path / "codes.txt"
+    codes.write_text("1\n2\n0\n3\n")
+    output = str(tmp_path / f"out.{fmt}")
+
+    lookup = FlakyLookup(failing={"2", "3"})
+    counts = run_batch(lookup, "code", ["rxcui"], str(codes), output, workers=1)
+    assert counts == {"skipped": 0, "ok": 1, "not_found": 1, "error": 2}
+
+    lookup = FlakyLookup(failing={"3"})
+    counts = run_batch(lookup, "code", ["rxcui"], str(codes), output, workers=1, resume=True)
+    assert sorted(lookup.calls) == ["2", "3"]
+    assert counts == {"skipped": 2, "ok": 1, "error": 1}
+
+    rows = read_rows(output, fmt)
+    assert sorted((row["code"], row["status"]) for row in rows) == \
+        [("0", "not_found"), ("1", "ok"), ("2", "ok"), ("3", "error")]
+    assert not (tmp_path / f"out.{fmt}.tmp").exists()
+
+
+def test_resume_drops_a_line_cut_off_by_a_crash(tmp_path):
+    codes = tmp_path / "codes.txt"
+    codes.write_text("1\n2\n")
+    output = tmp_path / "out.jsonl"
+    output.write_text(json.dumps({"code": "1", "status": "ok", "rxcui": "11", "error": ""}) + '\n{"code": "2", "sta')
+
+    lookup = FlakyLookup()
+    run_batch(lookup, "code", ["rxcui"], str(codes), str(output), workers=1, resume=True)
+    assert lookup.calls == ["2"]
+    assert [row["code"] for row in read_rows(output, "jsonl")] == ["1", "2"]
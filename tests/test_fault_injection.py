@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import pytest
+
+from async_resolver import AsyncRxNavClient
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from lookup_cache import CachedRxNavClient, TTLCache
+from rxnav_client import RxNavClient
+
+# Resilience of the RxNav clients against faults injected by the mock RxNav:
+# timeouts on a hanging upstream, the circuit breaker opening and failing
+# fast, stale cache entries served while it is open, and recovery through
+# half-open.
+
+NDC = "00002322730"  # In the recorded fixtures; maps to 861007
+RESET_TIMEOUT = 0.3
+
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker(name="test", window=10, min_requests=5, reset_timeout=RESET_TIMEOUT)
+
+
+@pytest.fixture
+def upstream(mock_rxnav, breaker):
+    _, base_url = mock_rxnav
+    client = RxNavClient(base_url=base_url, read_timeout=0.3, retries=1, backoff_factor=0.01, breaker=breaker)
+    yield client
+    client.close()
+
+
+def open_breaker(handler, upstream, breaker):
+    handler.error_rate = 1.0
+    for i in range(breaker.min_requests):
+        with pytest.raises(Exception):
+            upstream.ndc_to_rxcui(f"5058004880{i}")
+    assert breaker.state == OPEN
+
+
+def test_hanging_upstream_hits_the_read_timeout(mock_rxnav, upstream):
+    handler, _ = mock_rxnav
+    handler.stall_rate = 1.0
+    start = time.perf_counter()
+    with pytest.raises(Exception):
+        upstream.ndc_to_rxcui("00093717101")
+    assert time.perf_counter() - start < handler.stall
+
+
+def test_breaker_opens_after_repeated_errors_and_fails_fast(mock_rxnav, upstream, breaker):
+    handler, _ = mock_rxnav
+    open_breaker(handler, upstream, breaker)
+
+    start = time.perf_counter()
+    with pytest.raises(CircuitOpenError):
+        upstream.ndc_to_rxcui(NDC)
+    assert time.perf_counter() - start < 0.05
+
+
+def test_expired_entry_is_served_stale_while_open(mock_rxnav, upstream, breaker):
+    handler, _ = mock_rxnav
+    client = CachedRxNavClient(upstream, TTLCache(ttl=0.1))
+    rxcui, _ = client.ndc_to_rxcui(NDC)
+    assert rxcui == "861007"
+
+    open_breaker(handler, upstream, breaker)
+    time.sleep(0.2)  # let the cached entry expire
+    assert client.ndc_to_rxcui(NDC)[0] == "861007"
+
+
+def test_half_open_trial_failure_reopens_and_success_closes(mock_rxnav, upstream, breaker):
+    handler, _ = mock_rxnav
+    open_breaker(handler, upstream, breaker)
+
+    time.sleep(RESET_TIMEOUT)
+    with pytest.raises(Exception):
+        upstream.ndc_to_rxcui(NDC)  # the trial, still failing
+    assert breaker.state == OPEN
+
+    handler.error_rate = 0.0
+    time.sleep(RESET_TIMEOUT)
+    assert upstream.ndc_to_rxcui(NDC)[0] == "861007"
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_one_trial_through(breaker):
+    breaker._transition(OPEN)
+    time.sleep(RESET_TIMEOUT)
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_cancelled_trial_does_not_leave_the_breaker_stuck(mock_rxnav, breaker):
+    handler, base_url = mock_rxnav
+
+    async def run():
+        async with AsyncRxNavClient(base_url=base_url, rate_limit=None, breaker=breaker) as client:
+            handler.latency = 1.0
+            # get_json directly: lookups share their fetch, which a cancelled caller leaves running
+            trial = asyncio.ensure_future(client.get_json(f"{base_url}/rxcui/1/properties.json"))
+            await asyncio.sleep(0.1)
+            assert breaker.state == HALF_OPEN and breaker.trial_in_flight
+            trial.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await trial
+
+            handler.latency = 0.0
+            return await client.get_rxcui_info("2")
+
+    breaker._transition(OPEN)
+    time.sleep(RESET_TIMEOUT)
+    properties, _ = asyncio.run(run())
+    assert properties["rxcui"] == "2"
+    assert breaker.state == CLOSED
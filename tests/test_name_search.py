@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+import ndc_to_rxcui_asgi
+import prewarm
+from name_search import MIN_SIMILARITY, NameIndex, build_name_index, loaded_name_index, suggest_response, trigrams
+
+
+def test_prefix_and_misspelled_queries(sample_index):
+    name_index = build_name_index(sample_index)
+    assert [s["rxcui"] for s in name_index.suggest("acet", 2)] == ["161", "198440"]
+    assert name_index.suggest("tylenl", 1) == [{"rxcui": "202433", "name": "Tylenol", "tty": "BN"}]
+    assert name_index.suggest("") == []
+
+
+def test_correction_needs_min_similarity_of_trigram_sets():
+    name_index = NameIndex([("11289", "warfarin", "IN"), ("7052", "morphine", "IN")])
+
+    def similarity(a, b):
+        return len(trigrams(a) & trigrams(b)) / len(trigrams(a) | trigrams(b))
+
+    assert similarity("warrinq", "warfarin") > MIN_SIMILARITY
+    assert name_index.correct_word("warrinq") == "warfarin"
+    assert similarity("wxrxixq", "warfarin") < MIN_SIMILARITY
+    assert name_index.correct_word("wxrxixq") is None
+
+
+def test_suggest_response_errors(sample_index, tmp_path):
+    assert suggest_response("q=tyl&k=x", sample_index)[0] == 400
+    assert suggest_response("q=tyl", None)[0] == 503
+    status, payload = suggest_response("q=tyl", str(tmp_path / "missing.sqlite3"))
+    assert status == 503 and "not readable" in payload["error"]
+
+
+def test_asgi_app_builds_the_index_at_startup(sample_index, monkeypatch):
+    monkeypatch.setattr(ndc_to_rxcui_asgi, "NAME_INDEX_PATH", sample_index)
+    app = ndc_to_rxcui_asgi.ConverterApp()
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        messages = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+
+        async def receive():
+            return next(messages)
+
+        await app({"type": "lifespan"}, receive, send)
+        await app({"type": "http", "method": "GET", "path": "/api/suggest", "query_string": b"q=tyl&k=1",
+                   "headers": []}, receive, send)
+
+    asyncio.run(run())
+    assert sent[-2]["status"] == 200
+    assert json.loads(sent[-1]["body"])["suggestions"][0]["rxcui"] == "202433"
+
+
+def test_serving_process_loads_the_index_before_serving(sample_index, tmp_path, capsys):
+    assert loaded_name_index(sample_index) is None
+    prewarm.prepare_process(hot_list_path=None, name_index_path=sample_index)
+    assert loaded_name_index(sample_index) is not None
+
+    missing = str(tmp_path / "missing.sqlite3")
+    prewarm.prepare_process(hot_list_path=None, name_index_path=missing)
+    assert "Could not load the name search index" in capsys.readouterr().err
+    assert suggest_response("q=tyl", missing)[0] == 503
@@ -0,0 +1,116 @@
+import pytest
+
+from disk_cache import SQLiteCache
+from lookup_cache import CachedRxNavClient, TTLCache
+from prewarm import REVALIDATE_LEASE, RefreshScheduler, versioned_layers
+from rxnav_client import NotFoundError
+from single_flight import SingleFlightRxNavClient
+
+
+# Upstream whose data version and failing codes the tests control
+class FakeRxNav:
+    def __init__(self):
+        self.version = "06-Jan-2025"
+        self.failing = set()
+        self.calls = 0
+
+    def get_rxcui_info(self, rxcui):
+        self.calls += 1
+        if rxcui in self.failing:
+            raise Exception("API request failed with status code 500")
+        if rxcui == "0":
+            raise NotFoundError("Properties not found for the given RXCUI")
+        return {"rxcui": rxcui, "name": f"Drug {rxcui} ({self.version})"}, f"fake://{rxcui}"
+
+    def ndc_to_rxcui(self, ndc):
+        return ndc[-4:], f"fake://{ndc}"
+
+    def rxcui_to_ndc(self, rxcui):
+        return [f"{rxcui:0>9}01"], f"fake://{rxcui}/ndcs"
+
+    def get_version(self):
+        return self.version, "fake://version"
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    return FakeRxNav()
+
+
+@pytest.fixture
+def disk_path(tmp_path):
+    return str(tmp_path / "rxnav_cache.sqlite3")
+
+
+def build_client(upstream, disk_path):
+    return CachedRxNavClient(SingleFlightRxNavClient(CachedRxNavClient(upstream, SQLiteCache(disk_path))))
+
+
+def outdated(client):
+    return [len(layer.cache.outdated(1000)) for layer in versioned_layers(client)]
+
+
+def test_new_release_is_revalidated_innermost_first(upstream, disk_path):
+    client = build_client(upstream, disk_path)
+    scheduler = RefreshScheduler(client=client, workers=1)
+    scheduler.check_version(client)
+    for rxcui in ("1", "2", "3"):
+        client.get_rxcui_info(rxcui)
+    with pytest.raises(NotFoundError):
+        client.get_rxcui_info("0")
+
+    upstream.version = "03-Feb-2025"
+    scheduler.check_version(client)
+    memory, disk = versioned_layers(client)
+    assert not memory.settled
+    assert outdated(client) == [3, 3]  # the "not found" answers were dropped at once
+
+    scheduler.revalidate(client)
+    assert outdated(client) == [3, 0]
+    scheduler.revalidate(client)
+    assert outdated(client) == [0, 0] and memory.settled
+    assert client.get_rxcui_info("1")[0]["name"] == "Drug 1 (03-Feb-2025)"
+
+
+def test_entry_that_keeps_failing_is_dropped(upstream, disk_path):
+    client = build_client(upstream, disk_path)
+    scheduler = RefreshScheduler(client=client, workers=1, revalidate_attempts=2)
+    scheduler.check_version(client)
+    client.get_rxcui_info("1")
+    client.get_rxcui_info("2")
+
+    upstream.failing.add("2")
+    upstream.version = "03-Feb-2025"
+    scheduler.check_version(client)
+    for _ in range(4):
+        scheduler.revalidate(client)
+    assert outdated(client) == [0, 0]
+    assert versioned_layers(client)[0].settled
+    assert SQLiteCache(disk_path).get_stale(("properties", "2")) is None
+
+
+def test_disk_cache_is_revalidated_by_the_lease_holder_only(upstream, disk_path):
+    client = build_client(upstream, disk_path)
+    scheduler = RefreshScheduler(client=client, workers=1)
+    scheduler.check_version(client)
+    client.get_rxcui_info("1")
+
+    upstream.version = "03-Feb-2025"
+    scheduler.check_version(client)
+    assert SQLiteCache(disk_path).claim(REVALIDATE_LEASE, "another process", 60)
+    calls = upstream.calls
+    scheduler.revalidate(client)
+    assert upstream.calls == calls
+    assert outdated(client) == [1, 1]
+    assert not versioned_layers(client)[0].settled
+
+
+def test_lease_is_held_until_it_expires(disk_path):
+    first, second = SQLiteCache(disk_path), SQLiteCache(disk_path)
+    assert first.claim("job", "a", 60)
+    assert not second.claim("job", "b", 60)
+    assert first.claim("job", "a", 0)  # renewing, here with an already expired lease
+    assert second.claim("job", "b", 60)
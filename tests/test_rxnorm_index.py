@@ -0,0 +1,66 @@
+import shutil
+
+import pytest
+
+from conftest import SAMPLE_RRF
+from rxnav_client import NotFoundError
+from rxnorm_index import LocalRxNormIndex, build_index
+
+
+@pytest.fixture
+def index(sample_index):
+    index = LocalRxNormIndex(sample_index)
+    yield index
+    index.close()
+
+
+def test_build_reports_rows_added_then_unchanged(tmp_path):
+    index_path = str(tmp_path / "rxnorm_index.sqlite3")
+    summary = build_index(SAMPLE_RRF, index_path)
+    assert summary == {"ndc_rxcui": "+9 -0", "concept": "+16 -0", "relation": "+30 -0",
+                       "release": "rxnorm_sample"}
+
+    summary = build_index(SAMPLE_RRF, index_path)
+    assert summary == {"ndc_rxcui": "unchanged", "concept": "unchanged", "relation": "unchanged",
+                       "release": "rxnorm_sample"}
+
+
+def test_rebuild_writes_only_the_changed_rows(tmp_path):
+    rrf_dir = tmp_path / "release" / "rrf"
+    shutil.copytree(SAMPLE_RRF, rrf_dir)
+    index_path = str(tmp_path / "rxnorm_index.sqlite3")
+    build_index(str(rrf_dir), index_path)
+
+    with open(rrf_dir / "RXNSAT.RRF", "a", encoding="utf-8") as f:
+        f.write("1049621|||1000014|AUI|1049621|||NDC|RXNORM|00406055205|N|4096|\n")
+    summary = build_index(str(rrf_dir), index_path)
+    assert (summary["ndc_rxcui"], summary["concept"]) == ("+1 -0", "unchanged")
+    index = LocalRxNormIndex(index_path)
+    assert index.rxcui_to_ndc("1049621")[0] == ["00406055201", "00406055205"]
+    index.close()
+
+
+def test_ndc_lookups(index):
+    assert index.ndc_to_rxcui("00904198061")[0] == "198440"
+    assert index.ndc_to_rxcui("0093-7171-01")[0] == "197361"  # any NDC format
+    with pytest.raises(NotFoundError):
+        index.ndc_to_rxcui("00904198099")  # obsolete in RXNSAT
+    with pytest.raises(NotFoundError):
+        index.ndc_to_rxcui("09041980610")  # only listed by MTHSPL
+
+
+def test_rxcui_lookups(index):
+    assert index.rxcui_to_ndc("198440")[0] == ["00904198061", "50580048801"]
+    properties, _ = index.get_rxcui_info("209459")
+    assert properties["name"] == "acetaminophen 500 MG Oral Tablet [Tylenol]"
+    assert properties["synonym"] == "Tylenol 500 MG Oral Tablet"
+    assert properties["tty"] == "SBD"
+    assert index.get_rxcui_info("197361")[0]["synonym"] == "amLODIPine 5 MG Oral Tablet"
+    with pytest.raises(NotFoundError):
+        index.get_rxcui_info("999999")
+
+
+def test_suppressed_synonym_is_not_picked(index):
+    properties, _ = index.get_rxcui_info("198440")
+    assert properties["name"] == "acetaminophen 500 MG Oral Tablet"  # the SCD, not its PSN
+    assert properties["synonym"] == ""  # its only SY row is suppressed ("O")
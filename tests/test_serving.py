@@ -0,0 +1,106 @@
+import http.client
+import http.server
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from serving import PooledHTTPServer, keepalive_handler
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    release = threading.Event()
+
+    def do_GET(self):
+        if self.path == "/slow":
+            self.release.wait(5)
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def start_server():
+    servers = []
+
+    def start(workers, queue_size):
+        Handler.release.clear()
+        server = PooledHTTPServer(("127.0.0.1", 0), keepalive_handler(Handler, timeout=5), workers=workers,
+                                  queue_size=queue_size)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    Handler.release.set()
+    for server in servers:
+        server.shutdown()
+        server.drain()
+        server.server_close()
+
+
+def get(server, path="/", conn=None):
+    conn = conn or http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    conn.request("GET", path)
+    response = conn.getresponse()
+    assert response.read() == b"ok"
+    return conn
+
+
+def test_keepalive_connection_serves_several_requests(start_server):
+    server = start_server(workers=2, queue_size=0)
+    conn = get(server)
+    get(server, conn=conn)
+    assert server.connections == 1
+    conn.close()
+
+
+def test_idle_keepalive_connections_are_closed_when_every_thread_is_taken(start_server):
+    server = start_server(workers=2, queue_size=0)
+    idle = [get(server), get(server)]  # both threads now wait for a next request
+
+    start = time.perf_counter()
+    get(server).close()
+    assert time.perf_counter() - start < 1  # not the 5 s keep-alive timeout
+    for conn in idle:
+        conn.close()
+
+
+def test_server_stops_accepting_when_the_queue_is_full(start_server):
+    server = start_server(workers=1, queue_size=1)
+    clients = [threading.Thread(target=lambda: get(server, "/slow").close()) for _ in range(4)]
+    for client in clients:
+        client.start()
+    time.sleep(0.3)
+    assert server.connections == 2  # one handled, one queued; the rest wait in the listen backlog
+
+    Handler.release.set()
+    for client in clients:
+        client.join(5)
+    assert not any(client.is_alive() for client in clients)
+
+
+FAILING_START = """
+import serving
+from tests.test_serving import Handler
+
+def on_start():
+    raise RuntimeError("cannot open the lookup cache")
+
+serving.serve_forked(Handler, 0, workers=4, threads=1, on_start=on_start)
+"""
+
+
+def test_forked_server_stops_when_workers_fail_to_start():
+    result = subprocess.run([sys.executable, "-c", FAILING_START], capture_output=True, text=True, timeout=20)
+    assert result.returncode != 0
+    assert "RuntimeError: cannot open the lookup cache" in result.stderr
+    assert "failed to start; stopping the server" in result.stderr
+    assert result.stderr.count("Traceback") <= 5  # the first workers, not a fork loop
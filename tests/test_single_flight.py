@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(1)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(single_flight.do("key", fetch))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while single_flight.stats()["coalesced"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+
+
+def test_async_cancelled_leader_does_not_cancel_waiters():
+    async def run():
+        single_flight = AsyncSingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return "result"
+
+        leader = asyncio.ensure_future(single_flight.do("key", fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(single_flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter, single_flight.stats()
+
+    result, stats = asyncio.run(run())
+    assert result == "result"
+    assert stats == {"executions": 1, "coalesced": 1, "in_flight": 0}
+
+
+def test_async_errors_reach_every_caller():
+    async def run():
+        single_flight = AsyncSingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        return await asyncio.gather(*(single_flight.do("key", fetch) for _ in range(3)), return_exceptions=True)
+
+    assert [str(error) for error in asyncio.run(run())] == ["upstream failed"] * 3
@@ -0,0 +1,38 @@
+import pytest
+
+from benchmarks.mock_uts import start_mock_server
+from umls_mapper import TermMapper, build_proxy, map_terms
+
+
+@pytest.fixture
+def mapper():
+    server, base_url = start_mock_server()
+    proxy = build_proxy(base_url=base_url, api_key="test", cache_path="", rate_limit=None)
+    yield TermMapper(proxy, candidates=2), server.RequestHandlerClass
+    proxy.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_each_input_spelling_keeps_its_rows_and_terms_are_searched_once(mapper):
+    mapper, handler = mapper
+    terms = ["Type 2 diabetes", "TYPE 2 DIABETES ", "asthma", "Type 2 diabetes", "type 2 diabetes."]
+    results = {row["input_term"]: (row, candidates) for row, candidates in map_terms(terms, mapper, workers=2)}
+
+    assert sorted(results) == sorted(set(terms))
+    row, candidates = results["Type 2 diabetes"]
+    assert row["term"] == "type 2 diabetes" and row["status"] == "ok"
+    assert [candidate[:3] for candidate in candidates] == [("Type 2 diabetes", "type 2 diabetes", 1),
+                                                           ("Type 2 diabetes", "type 2 diabetes", 2)]
+    assert results["TYPE 2 DIABETES "][1][0][3] == candidates[0][3]
+    assert handler.requests == 2
+
+
+def test_spelling_read_after_its_term_was_searched(mapper):
+    mapper, handler = mapper
+    terms = ["fever", "cough", "headache", "nausea", "rash", "FEVER"]
+    results = {row["input_term"]: candidates for row, candidates in map_terms(terms, mapper, workers=1)}
+
+    assert sorted(results) == sorted(terms)
+    assert [candidate[1:] for candidate in results["FEVER"]] == [candidate[1:] for candidate in results["fever"]]
+    assert handler.requests == 5
@@ -0,0 +1,50 @@
+import http.client
+import threading
+
+import pytest
+
+import rxnav_client
+from serving import PooledHTTPServer, keepalive_handler
+from umls_proxy import PROXY_MARKER, UmlsProxyHandler, proxy
+
+
+@pytest.fixture
+def proxy_server():
+    server = PooledHTTPServer(("127.0.0.1", 0), keepalive_handler(UmlsProxyHandler), workers=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.drain()
+    server.server_close()
+
+
+def get(server, path):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    conn.request("GET", path)
+    response = conn.getresponse()
+    body = response.read().decode("utf-8")
+    conn.close()
+    return response.status, body
+
+
+@pytest.mark.parametrize("path", ["/", "/index.html"])
+def test_page_is_marked_as_served_by_the_proxy(proxy_server, path):
+    status, body = get(proxy_server, path)
+    assert status == 200
+    assert body.count(PROXY_MARKER) == 1 and body.index(PROXY_MARKER) < body.index("</head>")
+
+
+def test_static_files_are_served_unchanged(proxy_server):
+    status, body = get(proxy_server, "/script.js")
+    assert status == 200 and 'meta[name="umls-proxy"]' in body
+
+
+def test_metrics_report_the_proxy_caches_only(proxy_server, monkeypatch):
+    monkeypatch.setattr(rxnav_client, "_client", None)
+    proxy.cache.get(("missing",))
+    status, body = get(proxy_server, "/metrics")
+    assert status == 200
+    assert 'umls_cache_lookups_total{cache="TTLCache",result="miss"}' in body
+    assert 'umls_cache_entries{cache="TTLCache"}' in body
+    assert "rxnav_cache_lookups_total" not in body and "rxnav_cache_entries" not in body
+    assert rxnav_client.current_client() is None
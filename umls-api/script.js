@@ -1,5 +1,39 @@
+// When the page is served by umls_proxy.py (which adds a <meta name="umls-proxy">
+// tag to it), UTS requests go to the same origin: the proxy adds its own API key
+// and answers repeat requests from its cache. Opened from disk or any other
+// static host, the page calls UTS directly with the key entered below.
+const UTS_BASE_URL = "https://uts-ws.nlm.nih.gov";
+const USE_PROXY = document.querySelector('meta[name="umls-proxy"]') !== null;
+
+// Build the URL to fetch for a UTS URL: through the proxy, or directly with the API key
+function requestUrl(utsUrl, apiKey) {
+    const url = new URL(USE_PROXY ? String(utsUrl).replace(UTS_BASE_URL, window.location.origin) : utsUrl);
+    if (!USE_PROXY) {
+        url.searchParams.append("apiKey", apiKey);
+    }
+    return url;
+}
+
+// Copy of a request URL that is safe to show on the page (API key masked)
+function maskedUrl(urlObject) {
+    const displayUrl = new URL(urlObject);
+    if (displayUrl.searchParams.has("apiKey")) {
+        displayUrl.searchParams.set("apiKey", "***");
+    }
+    return displayUrl;
+}
+
 // Wait for the page to fully load before running the script
 window.addEventListener("DOMContentLoaded", function () {
+    // The proxy holds the API key, so hide the key field
+    if (USE_PROXY) {
+        const keyInput = document.getElementById("api-key");
+        keyInput.required = false;
+        document.querySelector('label[for="api-key"]').style.display = "none";
+        keyInput.style.display = "none";
+        keyInput.nextElementSibling.style.display = "none";
+    }
+
     // Get the parameters from the URL (e.g., API key, search term, etc.)
     const params = new URLSearchParams(window.location.search);
     const apiKey = params.get("apiKey"); // API key for authentication
@@ -129,7 +163,7 @@ async function searchUMLS() {
     const selectedVocabularies =
         returnIdType === "code" ? getSelectedVocabularies() : [];
 
-    if (!apiKey || !searchString) {
+    if ((!USE_PROXY && !apiKey) || !searchString) {
         alert("Please enter both an API key and a search term.");
         return;
     }
@@ -147,6 +181,7 @@ async function searchUMLS() {
     const recentRequestContainer = document.getElementById("recent-request-output");
     const tableHead = document.querySelector("#info-table thead");
 
+    cancelActiveDetails();
     resultsContainer.textContent = "Loading...";
     tableHead.innerHTML = `<tr>
         <th>UI</th>
@@ -155,16 +190,13 @@ async function searchUMLS() {
     </tr>`;
     infoTableBody.innerHTML = '<tr><td colspan="3">No information yet...</td></tr>';
 
-    const url = new URL("https://uts-ws.nlm.nih.gov/rest/search/current");
+    const url = requestUrl(`${UTS_BASE_URL}/rest/search/current`, apiKey);
     url.searchParams.append("string", searchString);
     url.searchParams.append("returnIdType", returnIdType);
-    url.searchParams.append("apiKey", apiKey);
     if (selectedVocabularies.length > 0) {
         url.searchParams.append("sabs", selectedVocabularies.join(","));
     }
-    const displayUrl = new URL(url);
-    displayUrl.searchParams.set("apiKey", "***");
-    recentRequestContainer.innerHTML = colorizeUrl(displayUrl);
+    recentRequestContainer.innerHTML = colorizeUrl(maskedUrl(url));
 
     try {
         const response = await fetch(url, {
@@ -234,6 +266,159 @@ async function searchUMLS() {
     }
 }
 
+// Rows rendered per animation frame when filling a large table
+const ROWS_PER_FRAME = 200;
+
+// Append rows to a table body in batches, one batch per animation frame, so
+// thousands of rows don't block the page. push() queues items as they arrive;
+// buildRow(item, index) returns the <tr> for one item. cancel() drops the
+// queued rows and stops any batch already scheduled.
+function createBatchRenderer(tableBody, buildRow) {
+    const queue = [];
+    let rendered = 0;
+    let scheduled = false;
+    let cancelled = false;
+
+    function renderBatch() {
+        scheduled = false;
+        if (cancelled) {
+            return;
+        }
+        const fragment = document.createDocumentFragment();
+        queue.splice(0, ROWS_PER_FRAME).forEach(item => {
+            fragment.appendChild(buildRow(item, rendered));
+            rendered += 1;
+        });
+        tableBody.appendChild(fragment);
+        if (queue.length > 0) {
+            schedule();
+        }
+    }
+
+    function schedule() {
+        if (!scheduled) {
+            scheduled = true;
+            window.requestAnimationFrame(renderBatch);
+        }
+    }
+
+    return {
+        push(items) {
+            if (!cancelled) {
+                queue.push(...items);
+                schedule();
+            }
+        },
+        count() {
+            return rendered + queue.length;
+        },
+        cancel() {
+            cancelled = true;
+            queue.length = 0;
+        }
+    };
+}
+
+// The details request that last filled the info table, so a newer request can
+// abort its stream and drop its queued rows before taking over the table
+let activeDetails = null;
+
+function cancelActiveDetails() {
+    if (activeDetails) {
+        activeDetails.controller.abort();
+        activeDetails.renderer.cancel();
+        activeDetails = null;
+    }
+}
+
+// Fetch every page of a paginated UTS endpoint through the proxy's /stream
+// route, which fetches the pages concurrently and sends one NDJSON line per
+// page, in page order. onPage(page) is called for each line as it arrives.
+// Aborting signal stops the download.
+async function streamAllPages(urlObject, onPage, signal) {
+    const streamUrl = new URL(urlObject);
+    streamUrl.pathname = "/stream" + streamUrl.pathname;
+    const response = await fetch(streamUrl, { headers: { Accept: "application/x-ndjson" }, signal });
+    if (!response.ok) {
+        const data = await response.json();
+        throw new Error(data.error || `request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = "";
+    for (;;) {
+        const { done, value } = await reader.read();
+        buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+        const lines = buffered.split("\n");
+        buffered = lines.pop();
+        lines.filter(line => line.trim()).forEach(line => onPage(JSON.parse(line)));
+        if (done) {
+            break;
+        }
+    }
+}
+
+// Make a table cell with text, optionally a link-styled one that runs onClick
+function makeCell(text, onClick) {
+    const td = document.createElement("td");
+    td.textContent = text;
+    if (onClick) {
+        td.style.color = "blue";
+        td.style.textDecoration = "underline";
+        td.style.cursor = "pointer";
+        td.addEventListener("click", onClick);
+    }
+    return td;
+}
+
+// Table header and row builder for each detail type
+function detailTable(detailType, returnIdType) {
+    if (detailType === "atoms") {
+        return {
+            head: `<tr><th>Atom</th><th>Root Source</th></tr>`,
+            buildRow(atom, index) {
+                const tr = document.createElement("tr");
+                tr.appendChild(makeCell(atom.name || `(Atom #${index + 1})`));
+                tr.appendChild(makeCell(atom.rootSource || "(no rootSource)"));
+                return tr;
+            }
+        };
+    }
+    if (detailType === "definitions") {
+        return {
+            head: `<tr><th>Definition</th><th>Root Source</th></tr>`,
+            buildRow(definition, index) {
+                const tr = document.createElement("tr");
+                tr.appendChild(makeCell(definition.value || `(Definition #${index + 1})`));
+                tr.appendChild(makeCell(definition.rootSource || "(no rootSource)"));
+                return tr;
+            }
+        };
+    }
+    return {
+        head: `<tr>
+              <th>From Name</th>
+              <th>Relation Label</th>
+              <th>To Name</th>
+              <th>Root Source</th>
+            </tr>`,
+        buildRow(relation) {
+            const rootSource = returnIdType === "code" ? relation.rootSource : undefined;
+            const tr = document.createElement("tr");
+            tr.appendChild(makeCell(relation.relatedFromIdName || "(no relatedFromIdName)", function () {
+                fetchRelatedDetail(relation.relatedFromId, "from", rootSource);
+            }));
+            tr.appendChild(makeCell(relation.additionalRelationLabel || "(no relation label)"));
+            tr.appendChild(makeCell(relation.relatedIdName || "(no relatedIdName)", function () {
+                fetchRelatedDetail(relation.relatedId, "to", rootSource);
+            }));
+            tr.appendChild(makeCell(relation.rootSource || "(no rootSource)"));
+            return tr;
+        }
+    };
+}
+
 async function fetchConceptDetails(cui, detailType) {
     const apiKey = document.getElementById("api-key").value.trim();
     const returnIdType = document.getElementById("return-id-type").value;
@@ -244,7 +429,7 @@ async function fetchConceptDetails(cui, detailType) {
 
     closeCuiOptionsModal();
 
-    if (!apiKey) {
+    if (!USE_PROXY && !apiKey) {
         alert("Please enter an API key first.");
         return;
     }
@@ -253,119 +438,78 @@ async function fetchConceptDetails(cui, detailType) {
     if (returnIdType === "code") {
         baseUrl = modalCurrentData.uri + "/" + detailType;
     } else {
-        baseUrl = `https://uts-ws.nlm.nih.gov/rest/content/current/CUI/${cui}/${detailType}`;
+        baseUrl = `${UTS_BASE_URL}/rest/content/current/CUI/${cui}/${detailType}`;
     }
-    const apiUrlObj = new URL(baseUrl);
-    apiUrlObj.searchParams.append("apiKey", apiKey);
-
-    const displayApiUrl = new URL(apiUrlObj);
-    displayApiUrl.searchParams.set("apiKey", "***");
+    const apiUrlObj = requestUrl(baseUrl, apiKey);
 
-    recentRequestContainer.innerHTML = colorizeUrl(displayApiUrl);
+    recentRequestContainer.innerHTML = colorizeUrl(maskedUrl(apiUrlObj));
 
     const addressUrl = new URL(window.location.href);
     addressUrl.searchParams.set("endpoint", detailType);
     window.history.pushState({}, "", addressUrl.toString());
 
+    cancelActiveDetails();
     resultsContainer.textContent = `Loading ${detailType} for ${cui}...`;
     infoTableBody.innerHTML = '<tr><td colspan="3">Loading...</td></tr>';
 
+    const table = detailTable(detailType, returnIdType);
+    const renderer = createBatchRenderer(infoTableBody, table.buildRow);
+    const controller = new AbortController();
+    activeDetails = { controller, renderer };  // kept until replaced: rows may still be queued after the fetch
+    const emptyMessage = `<tr><td colspan="3">No ${detailType} found for this ${cui}.</td></tr>`;
+
     try {
+        if (USE_PROXY) {
+            // Every page, streamed: rows are queued for rendering as each page arrives
+            const pages = [];
+            let started = false;
+            await streamAllPages(apiUrlObj, page => {
+                if (!started) {
+                    started = true;
+                    infoTableBody.innerHTML = "";
+                    tableHead.innerHTML = table.head;
+                }
+                pages.push(page);
+                if (page.error) {
+                    console.warn(`Page ${page.pageNumber} of ${detailType} for ${cui} failed: ${page.error}`);
+                    return;
+                }
+                renderer.push(Array.isArray(page.result) ? page.result : []);
+                resultsContainer.textContent =
+                    `Loaded ${renderer.count()} ${detailType} (page ${page.pageNumber} of ${page.pageCount})...`;
+            }, controller.signal);
+            // Say which pages are missing rather than showing a silently short list
+            const failed = pages.filter(page => page.error).map(page => page.pageNumber);
+            resultsContainer.textContent = (failed.length > 0 ? `Pages that failed to load: ${failed.join(", ")}\n\n` : "") +
+                JSON.stringify(pages, null, 2);
+            if (renderer.count() === 0) {
+                infoTableBody.innerHTML = emptyMessage;
+            }
+            return;
+        }
+
         const response = await fetch(apiUrlObj, {
             method: "GET",
-            headers: { Accept: "application/json" }
+            headers: { Accept: "application/json" },
+            signal: controller.signal
         });
         const data = await response.json();
 
         resultsContainer.textContent = JSON.stringify(data, null, 2);
 
         infoTableBody.innerHTML = "";
-
-        if (detailType === "atoms") {
-            tableHead.innerHTML = `<tr><th>Atom</th><th>Root Source</th></tr>`;
-        } else if (detailType === "definitions") {
-            tableHead.innerHTML = `<tr><th>Definition</th><th>Root Source</th></tr>`;
-        } else if (detailType === "relations") {
-            tableHead.innerHTML = `<tr>
-              <th>From Name</th>
-              <th>Relation Label</th>
-              <th>To Name</th>
-              <th>Root Source</th>
-            </tr>`;
-        }
+        tableHead.innerHTML = table.head;
 
         const detailArray = Array.isArray(data.result) ? data.result : [];
-        if (!Array.isArray(detailArray) || detailArray.length === 0) {
-            infoTableBody.innerHTML = `<tr><td colspan="3">No ${detailType} found for this ${cui}.</td></tr>`;
+        if (detailArray.length === 0) {
+            infoTableBody.innerHTML = emptyMessage;
             return;
         }
-
-        if (detailType === "atoms") {
-            detailArray.forEach((atom, index) => {
-                const tr = document.createElement("tr");
-                const col1 = document.createElement("td");
-                col1.textContent = atom.name || `(Atom #${index + 1})`;
-                tr.appendChild(col1);
-                const col2 = document.createElement("td");
-                col2.textContent = atom.rootSource || "(no rootSource)";
-                tr.appendChild(col2);
-                infoTableBody.appendChild(tr);
-            });
-        } else if (detailType === "definitions") {
-            detailArray.forEach((definition, index) => {
-                const tr = document.createElement("tr");
-                const col1 = document.createElement("td");
-                col1.textContent = definition.value || `(Definition #${index + 1})`;
-                tr.appendChild(col1);
-                const col2 = document.createElement("td");
-                col2.textContent = definition.rootSource || "(no rootSource)";
-                tr.appendChild(col2);
-                infoTableBody.appendChild(tr);
-            });
-        } else if (detailType === "relations") {
-            detailArray.forEach((relation) => {
-                const tr = document.createElement("tr");
-
-                const col1 = document.createElement("td");
-                col1.style.color = "blue";
-                col1.style.textDecoration = "underline";
-                col1.style.cursor = "pointer";
-                col1.textContent = relation.relatedFromIdName || "(no relatedFromIdName)";
-                col1.addEventListener("click", function () {
-                    if (returnIdType === "code") {
-                        fetchRelatedDetail(relation.relatedFromId, "from", relation.rootSource);
-                    } else {
-                        fetchRelatedDetail(relation.relatedFromId, "from");
-                    }
-                });
-                tr.appendChild(col1);
-
-                const col2 = document.createElement("td");
-                col2.textContent = relation.additionalRelationLabel || "(no relation label)";
-                tr.appendChild(col2);
-
-                const col3 = document.createElement("td");
-                col3.style.color = "blue";
-                col3.style.textDecoration = "underline";
-                col3.style.cursor = "pointer";
-                col3.textContent = relation.relatedIdName || "(no relatedIdName)";
-                col3.addEventListener("click", function () {
-                    if (returnIdType === "code") {
-                        fetchRelatedDetail(relation.relatedId, "to", relation.rootSource);
-                    } else {
-                        fetchRelatedDetail(relation.relatedId, "to");
-                    }
-                });
-                tr.appendChild(col3);
-
-                const col4 = document.createElement("td");
-                col4.textContent = relation.rootSource || "(no rootSource)";
-                tr.appendChild(col4);
-
-                infoTableBody.appendChild(tr);
-            });
-        }
+        renderer.push(detailArray);
     } catch (error) {
+        if (controller.signal.aborted) {
+            return; // replaced by a newer request, which owns the table now
+        }
         resultsContainer.textContent = `Error fetching ${detailType}: ${error}`;
         infoTableBody.innerHTML = `<tr><td colspan="3">Error loading ${detailType}.</td></tr>`;
     }
@@ -373,18 +517,14 @@ async function fetchConceptDetails(cui, detailType) {
 
 async function fetchRelatedDetail(apiUrl, relatedType, rootSource) {
     const apiKey = document.getElementById("api-key").value.trim();
-    if (!apiKey) {
+    if (!USE_PROXY && !apiKey) {
         alert("Please enter an API key first.");
         return;
     }
 
-    const urlObj = new URL(apiUrl);
-    urlObj.searchParams.append("apiKey", apiKey);
-
-    const displayUrlObj = new URL(urlObj);
-    displayUrlObj.searchParams.set("apiKey", "***");
+    const urlObj = requestUrl(apiUrl, apiKey);
 
-    document.getElementById("recent-request-output").innerHTML = colorizeUrl(displayUrlObj);
+    document.getElementById("recent-request-output").innerHTML = colorizeUrl(maskedUrl(urlObj));
 
     const currentUrl = new URL(window.location.href);
     currentUrl.searchParams.set("related", relatedType);
@@ -395,6 +535,7 @@ async function fetchRelatedDetail(apiUrl, relatedType, rootSource) {
     const infoTableBody = document.querySelector("#info-table tbody");
     const tableHead = document.querySelector("#info-table thead");
 
+    cancelActiveDetails();
     resultsContainer.textContent = `Loading related ${relatedType} information...`;
     infoTableBody.innerHTML = '<tr><td colspan="3">Loading...</td></tr>';
     tableHead.innerHTML = `<tr>
@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import re
+import sys
+import unicodedata
+import urllib.parse
+
+from batch import RowWriter, dedupe, read_codes, resolve_concurrently
+from disk_cache import SQLiteCache
+from ndc_expansion import open_edge_writer
+from rxnav_client import NotFoundError
+from umls_proxy import API_KEY, UTS_BASE_URL, UmlsProxy
+
+# Mapper defaults (change these if needed)
+CANDIDATES = 5  # Ranked candidates kept per term
+WORKERS = 8  # Searches in flight at once
+RATE_LIMIT = 20  # Searches per second; UTS allows 20 requests per second per IP address
+CACHE_PATH = os.environ.get("UMLS_CACHE_PATH", "umls_cache.sqlite3")  # Persistent search cache; reruns are free
+CACHE_TTL = 30 * 24 * 60 * 60  # Seconds a search result stays cached (UMLS is released twice a year)
+
+CANDIDATE_FIELDS = ["input_term", "term", "rank", "ui", "name", "root_source", "uri"]
+
+_SPACES = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t.,;:!?\"'`()[]{}-*"
+
+
+# Canonical form of a free-text term, so spellings that differ only in case,
+# spacing, Unicode form or surrounding punctuation are searched once
+def normalize_term(term):
+    term = unicodedata.normalize("NFKC", str(term))
+    return _SPACES.sub(" ", term).strip(_EDGE_PUNCTUATION).casefold()
+
+
+# Maps terms to ranked UMLS candidates with the same search parameters as the
+# umls-api page (string, returnIdType, sabs; optionally searchType). Searches
+# go through a UmlsProxy, so they share its rate limit, retries, circuit
+# breaker and response caches.
+class TermMapper:
+    def __init__(self, proxy, return_id_type="concept", sabs=(), candidates=CANDIDATES, search_type=None):
+        self.proxy = proxy
+        self.return_id_type = return_id_type
+        self.sabs = ",".join(sabs)
+        self.candidates = candidates
+        self.search_type = search_type
+
+    def search_query(self, term):
+        params = [("string", term), ("returnIdType", self.return_id_type), ("pageSize", self.candidates)]
+        if self.sabs:
+            params.append(("sabs", self.sabs))
+        if self.search_type:
+            params.append(("searchType", self.search_type))
+        return urllib.parse.urlencode(params)
+
+    # Return the ranked candidates for a normalized term as
+    # (term, rank, ui, name, root_source, uri) tuples, best first
+    def map_term(self, term):
+        status, body, _ = self.proxy.get("/rest/search/current", self.search_query(term))
+        if status != 200:
+            raise Exception(f"UTS search failed with status code {status}")
+        results = (json.loads(body).get("result") or {}).get("results", [])
+        results = [result for result in results if result.get("ui") not in (None, "NONE")]
+        if not results:
+            raise NotFoundError("No UMLS match for the given term")
+        return [(term, rank, result["ui"], result.get("name", ""), result.get("rootSource", ""),
+                 result.get("uri", ""))
+                for rank, result in enumerate(results[:self.candidates], start=1)]
+
+
+# Normalize and dedupe terms as they stream in and search each normalized
+# term once, concurrently. Yields (row, candidates) for every distinct input
+# spelling once its term has been searched, so results can be joined back to
+# the input: row is the batch status row with the spelling as input_term,
+# candidates the CANDIDATE_FIELDS tuples (empty when the search failed or
+# found nothing).
+def map_terms(terms, mapper, workers=WORKERS):
+    spellings = {}  # normalized term -> its input spellings not yet yielded
+    searched = {}  # normalized term -> (row, candidates) once searched
+    late = []  # spellings read after their term had been searched
+    seen = set()
+
+    def lookup(term):
+        return {"candidates": mapper.map_term(term)}
+
+    def normalized_terms():
+        for term in terms:
+            spelling = str(term)
+            normalized = normalize_term(spelling)
+            if normalized and spelling not in seen:
+                seen.add(spelling)
+                if normalized in searched:
+                    late.append(spelling)
+                else:
+                    spellings.setdefault(normalized, []).append(spelling)
+            yield normalized
+
+    def for_spelling(spelling, row, candidates):
+        return {"input_term": spelling, **row}, [(spelling, *candidate) for candidate in candidates]
+
+    for row in resolve_concurrently(dedupe(normalized_terms(), set()), lookup, "term", workers):
+        candidates = row.pop("candidates", [])
+        searched[row["term"]] = row, candidates
+        for spelling in spellings.pop(row["term"], []):
+            yield for_spelling(spelling, row, candidates)
+        while late:
+            spelling = late.pop()
+            yield for_spelling(spelling, *searched[normalize_term(spelling)])
+    for spelling in late:
+        yield for_spelling(spelling, *searched[normalize_term(spelling)])
+
+
+# Map every term in input_path and write the ranked candidates to output_path
+# (CSV, or Parquet for .parquet files). Terms without candidates go to
+# errors_path if given. Returns counts by status.
+def run_mapping(input_path, output_path="-", mapper=None, workers=WORKERS, column=None, errors_path=None):
+    writer = open_edge_writer(output_path, CANDIDATE_FIELDS)
+    errors = RowWriter(errors_path, "csv", ["input_term", "term", "status", "error"]) if errors_path else None
+    counts = {"candidates": 0}
+    try:
+        for row, candidates in map_terms(read_codes(input_path, column), mapper, workers):
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+            if candidates:
+                writer.write(candidates)
+                counts["candidates"] += len(candidates)
+            elif errors is not None:
+                errors.write(row)
+    finally:
+        writer.close()
+        if errors is not None:
+            errors.close()
+    return counts
+
+
+# Build the proxy used for a mapping run: rate limited, with the persistent
+# search cache at cache_path (none if empty)
+def build_proxy(base_url=UTS_BASE_URL, api_key=API_KEY, cache_path=CACHE_PATH, rate_limit=RATE_LIMIT,
+                pool_size=WORKERS):
+    disk_cache = SQLiteCache(cache_path, ttl=CACHE_TTL) if cache_path else None
+    return UmlsProxy(base_url=base_url, api_key=api_key, disk_cache=disk_cache, pool_size=pool_size,
+                     search_ttl=CACHE_TTL, rate_limit=rate_limit)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Map free-text terms to ranked UMLS candidates (CUIs or codes)")
+    parser.add_argument("--input", required=True, help="file of terms (CSV, JSONL or one per line; '-' for stdin)")
+    parser.add_argument("--output", default="-", help="CSV or .parquet file to write (default: CSV on stdout)")
+    parser.add_argument("--column", help="CSV column or JSON key holding the terms")
+    parser.add_argument("--return-id-type", choices=["concept", "code"], default="concept",
+                        help="concept = CUIs, code = source codes (use with --sabs)")
+    parser.add_argument("--sabs", default="", help="comma-separated vocabularies, e.g. SNOMEDCT_US,ICD10CM")
+    parser.add_argument("--search-type", help="UTS searchType (e.g. exact, words, normalizedString)")
+    parser.add_argument("--candidates", type=int, default=CANDIDATES, help="ranked candidates kept per term")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="searches in flight at once")
+    parser.add_argument("--rate-limit", type=float, default=RATE_LIMIT, help="searches per second (0 = unlimited)")
+    parser.add_argument("--cache", default=CACHE_PATH, help="persistent search cache file ('' for none)")
+    parser.add_argument("--errors", help="CSV file for terms with no candidates or failed searches")
+    args = parser.parse_args()
+
+    proxy = build_proxy(cache_path=args.cache, rate_limit=args.rate_limit or None, pool_size=args.workers)
+    mapper = TermMapper(proxy, args.return_id_type, tuple(filter(None, args.sabs.split(","))), args.candidates,
+                        args.search_type)
+    try:
+        counts = run_mapping(args.input, args.output, mapper, workers=args.workers, column=args.column,
+                             errors_path=args.errors)
+    finally:
+        proxy.close()
+    print(", ".join(f"{status}: {count}" for status, count in counts.items()), file=sys.stderr)
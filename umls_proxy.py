@@ -0,0 +1,378 @@
+import http.server
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+import serving
+from api import JsonApiMixin
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from disk_cache import SQLiteCache
+from instrumentation import MetricsMixin, record_error
+from lookup_cache import TTLCache
+from single_flight import SingleFlight
+
+# Define the port number for the server
+PORT = 8082  # Change the port number here if needed
+
+# UMLS proxy settings (override with environment variables)
+UTS_BASE_URL = os.environ.get("UMLS_BASE_URL", "https://uts-ws.nlm.nih.gov")  # UTS REST API (or a stub server)
+API_KEY = os.environ.get("UMLS_API_KEY")  # Sent with every upstream request; browsers never see it
+CACHE_PATH = os.environ.get("UMLS_CACHE_PATH")  # On-disk cache shared by worker processes, if set
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "umls-api")  # The web interface
+
+# Cache and connection defaults (change these if needed)
+SEARCH_TTL = 60 * 60  # Seconds a search result stays cached
+CONTENT_TTL = 24 * 60 * 60  # Seconds concept content (atoms, relations, definitions) stays cached
+NEGATIVE_TTL = 10 * 60  # Seconds a 404 from UTS stays cached
+MAX_ENTRIES = 20000  # Responses kept in memory before the least recently used one is evicted
+POOL_SIZE = 16  # Keep-alive connections kept open to UTS
+CONNECT_TIMEOUT = 3.05  # Seconds to wait for the TCP/TLS connection
+READ_TIMEOUT = 20  # Seconds to wait for UTS to send a response
+RETRIES = 2  # Number of retries for failed GET requests
+BACKOFF_FACTOR = 0.5  # Exponential backoff factor between retries
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RATE_LIMIT = None  # Upstream requests per second (UTS allows 20 per IP); None = unlimited
+PAGE_SIZE = 200  # Items requested per page when fetching every page of a list
+PAGE_WORKERS = 4  # Pages of one list fetched at the same time (UTS allows ~20 requests/s per IP)
+
+# Paginated UTS lists that /stream/... can fetch in full
+PAGINATED = ("atoms", "relations", "definitions", "parents", "children")
+
+# UTS paths the proxy forwards: searches, and concepts, atoms and source codes
+# with their atoms, relations and definitions. Anything else is a 404.
+PROXY_PATHS = (
+    re.compile(r"/rest/search/[\w.]+"),
+    re.compile(r"/rest/content/[\w.]+/(CUI|AUI)/[\w.-]+(/(atoms|relations|definitions))?"),
+    re.compile(r"/rest/content/[\w.]+/source/[\w.-]+/[^/]+(/(atoms|relations|definitions|parents|children))?"),
+)
+
+UPSTREAM_SECONDS = metrics.histogram(
+    "umls_upstream_request_seconds", "Time spent in UTS requests, by endpoint", ("endpoint",))
+CACHE_RESULTS = metrics.counter(
+    "umls_proxy_cache_total", "Proxied requests by cache result (hit, miss, stale)", ("result",))
+
+_MISSING = object()
+
+
+# Thread-safe token bucket that lets at most `rate` requests per second
+# through, with bursts of up to `capacity` requests. acquire() blocks until a
+# request may go.
+class RateLimiter:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                time.sleep((1 - self.tokens) / self.rate)
+
+
+def is_proxied(path):
+    return any(pattern.fullmatch(path) for pattern in PROXY_PATHS)
+
+
+def _endpoint(path):
+    if path.startswith("/rest/search/"):
+        return "search"
+    last = path.rsplit("/", 1)[-1]
+    return last if last in PAGINATED else "concept"
+
+
+# Forwards UTS REST requests over one keep-alive connection pool with the
+# server's API key, and answers repeat requests from a shared response cache.
+# Responses are cached by path and query (without any apiKey the browser sent):
+# searches for search_ttl seconds, concept content for content_ttl, 404s for
+# negative_ttl. Concurrent misses for the same request share one upstream
+# fetch, and when UTS fails (or the circuit breaker is open) an expired entry
+# still in the stale window is served instead.
+class UmlsProxy:
+    def __init__(self, base_url=UTS_BASE_URL, api_key=API_KEY, cache=None, disk_cache=None, pool_size=POOL_SIZE,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, retries=RETRIES,
+                 backoff_factor=BACKOFF_FACTOR, search_ttl=SEARCH_TTL, content_ttl=CONTENT_TTL,
+                 negative_ttl=NEGATIVE_TTL, breaker=None, rate_limit=RATE_LIMIT):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.cache = cache if cache is not None else TTLCache(max_entries=MAX_ENTRIES)
+        self.disk_cache = disk_cache
+        self.timeout = (connect_timeout, read_timeout)
+        self.search_ttl = search_ttl
+        self.content_ttl = content_ttl
+        self.negative_ttl = negative_ttl
+        self.breaker = breaker if breaker is not None else CircuitBreaker(name="uts")
+        self.single_flight = SingleFlight()
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        self.page_executor = ThreadPoolExecutor(max_workers=PAGE_WORKERS, thread_name_prefix="uts-page")
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    # Cache key for a request: the path and its sorted query, minus apiKey
+    def cache_key(self, path, query):
+        params = sorted((name, value) for name, value in urllib.parse.parse_qsl(query) if name != "apiKey")
+        return "umls", (f"{path}?{urllib.parse.urlencode(params)}" if params else path)
+
+    def ttl_for(self, path, status):
+        if status == 404:
+            return self.negative_ttl
+        return self.search_ttl if path.startswith("/rest/search/") else self.content_ttl
+
+    def _cached(self, key, stale=False):
+        for cache in (self.cache, self.disk_cache):
+            if cache is None:
+                continue
+            value = cache.get_stale(key, _MISSING) if stale else cache.get(key, _MISSING)
+            if value is not _MISSING:
+                if cache is self.disk_cache and not stale:
+                    (status, _), _ = value
+                    self.cache.set(key, value, ttl=self.ttl_for(key[1].split("?")[0], status))
+                return value
+        return _MISSING
+
+    def _store(self, key, value, ttl):
+        for cache in (self.cache, self.disk_cache):
+            if cache is not None:
+                cache.set(key, value, ttl=ttl)
+
+    # Fetch path?query from UTS and return ([status, body], url) where url is
+    # the upstream URL without the key. Only 200s and 404s are cached.
+    def fetch(self, path, query):
+        if not self.api_key:
+            raise Exception("UMLS_API_KEY is not set on the proxy server")
+        params = [(name, value) for name, value in urllib.parse.parse_qsl(query) if name != "apiKey"]
+        url = f"{self.base_url}{path}" + (f"?{urllib.parse.urlencode(params)}" if params else "")
+
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        self.breaker.check()
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, params={"apiKey": self.api_key}, timeout=self.timeout,
+                                        headers={"Accept": "application/json"})
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, endpoint=_endpoint(path))
+
+        if response.status_code in RETRY_STATUSES:
+            self.breaker.record_failure()
+            raise Exception(f"UTS request failed with status code {response.status_code}")
+        self.breaker.record_success()
+
+        value = [response.status_code, response.text], url
+        if response.status_code in (200, 404):
+            self._store(self.cache_key(path, query), value, self.ttl_for(path, response.status_code))
+        return value
+
+    # Answer a proxied request: returns (status, body, cache result)
+    def get(self, path, query):
+        key = self.cache_key(path, query)
+        cached = self._cached(key)
+        if cached is not _MISSING:
+            CACHE_RESULTS.inc(result="hit")
+            (status, body), _ = cached
+            return status, body, "hit"
+
+        try:
+            (status, body), _ = self.single_flight.do(key, lambda: self.fetch(path, query))
+        except Exception:
+            stale = self._cached(key, stale=True)
+            if stale is _MISSING:
+                raise
+            CACHE_RESULTS.inc(result="stale")
+            (status, body), _ = stale
+            return status, body, "stale"
+        CACHE_RESULTS.inc(result="miss")
+        return status, body, "miss"
+
+    # Fetch every page of a paginated list and yield one dict per page, in
+    # page order: {"pageNumber", "pageCount", "result"} or, for a page that
+    # failed, {"pageNumber", "pageCount", "error"}. The first page gives the
+    # page count; the rest are fetched on the page pool with at most `ahead`
+    # pages in flight, so memory stays bounded however long the list is.
+    # Each page goes through get(), so pages are cached individually. If the
+    # first page fails or is not a 200, returns (status, body) for it instead
+    # of streaming, so the caller can pass the error on.
+    def iter_pages(self, path, query, page_size=PAGE_SIZE, ahead=2 * PAGE_WORKERS):
+        params = [(name, value) for name, value in urllib.parse.parse_qsl(query)
+                  if name not in ("apiKey", "pageNumber", "pageSize")]
+
+        def page_query(number):
+            return urllib.parse.urlencode(params + [("pageNumber", number), ("pageSize", page_size)])
+
+        status, body, _ = self.get(path, page_query(1))
+        if status != 200:
+            return status, body
+        first = json.loads(body)
+        page_count = max(int(first.get("pageCount") or 1), 1)
+
+        def pages():
+            yield {"pageNumber": 1, "pageCount": page_count, "result": first.get("result", [])}
+            pending = deque()
+            next_page = 2
+            while pending or next_page <= page_count:
+                while next_page <= page_count and len(pending) < ahead:
+                    pending.append((next_page, self.page_executor.submit(self.get, path, page_query(next_page))))
+                    next_page += 1
+                number, future = pending.popleft()
+                try:
+                    status, body, _ = future.result()
+                    if status != 200:
+                        raise Exception(f"UTS returned status {status}")
+                    page = {"pageNumber": number, "pageCount": page_count,
+                            "result": json.loads(body).get("result", [])}
+                except Exception as e:
+                    page = {"pageNumber": number, "pageCount": page_count, "error": str(e)}
+                yield page
+
+        return 200, pages()
+
+    # Stats of each cache layer (TTLCache, and SQLiteCache when configured) by class name
+    def stats(self):
+        return {type(cache).__name__: cache.stats() for cache in (self.cache, self.disk_cache) if cache is not None}
+
+    def close(self):
+        self.page_executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+PROXY_MARKER = '<meta name="umls-proxy" content="1">\n'
+
+proxy = UmlsProxy(disk_cache=SQLiteCache(CACHE_PATH, ttl=CONTENT_TTL) if CACHE_PATH else None)
+
+
+# Build metrics for the proxy's cache layers at scrape time (see
+# instrumentation.collect_cache_metrics for the RxNav lookup caches)
+def collect_proxy_metrics():
+    lookups = metrics.Counter("umls_cache_lookups_total", "UTS response cache lookups by layer and result",
+                              ("cache", "result"))
+    hit_ratio = metrics.Gauge("umls_cache_hit_ratio", "Share of UTS response cache lookups that were hits", ("cache",))
+    size = metrics.Gauge("umls_cache_entries", "UTS responses held in the cache", ("cache",))
+    for name, stats in proxy.stats().items():
+        lookups.set(stats["hits"], cache=name, result="hit")
+        lookups.set(stats["misses"], cache=name, result="miss")
+        hit_ratio.set(stats["hit_ratio"], cache=name)
+        size.set(stats["size"], cache=name)
+    return [lookups, hit_ratio, size]
+
+
+metrics.REGISTRY.add_collector(collect_proxy_metrics)
+
+
+# Serves the umls-api web interface and forwards its UTS requests through the
+# proxy, so the page needs no API key of its own:
+#   GET /rest/...          one UTS response, from the cache when possible
+#   GET /stream/rest/...   every page of an atoms/relations/definitions list as
+#                          NDJSON, one line per page, streamed as pages arrive
+class UmlsProxyHandler(MetricsMixin, JsonApiMixin, http.server.SimpleHTTPRequestHandler):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=STATIC_DIR, **kwargs)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == "/metrics":
+            return self.send_metrics()
+        if url.path.startswith("/rest/"):
+            return self.send_proxied(url.path, url.query)
+        if url.path.startswith("/stream/rest/"):
+            return self.send_all_pages(url.path[len("/stream"):], url.query)
+        if url.path in ("/", "/index.html"):
+            return self.send_page()
+        super().do_GET()
+
+    # The web interface, marked with <meta name="umls-proxy"> so its script
+    # sends UTS requests here instead of asking for an API key
+    def send_page(self):
+        with open(os.path.join(STATIC_DIR, "index.html"), encoding="utf-8") as f:
+            page = f.read()
+        body = page.replace("</head>", PROXY_MARKER + "</head>", 1).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Run a proxy call and map failures to HTTP statuses; returns None after
+    # sending the error response
+    def call_proxy(self, fn):
+        try:
+            with self.trace.stage("upstream"):
+                return fn()
+        except CircuitOpenError as e:
+            record_error(e)
+            self.send_json(503, {"error": str(e)})
+        except Exception as e:
+            record_error(e)
+            self.send_json(502, {"error": str(e)})
+        return None
+
+    def send_proxied(self, path, query):
+        if not is_proxied(path):
+            return self.send_json(404, {"error": "Not a proxied UTS endpoint"})
+        answer = self.call_proxy(lambda: proxy.get(path, query))
+        if answer is not None:
+            status, body, cache_result = answer
+            self.send_body(status, body.encode('utf-8'), cache_result)
+
+    def send_all_pages(self, path, query):
+        if not is_proxied(path) or _endpoint(path) not in PAGINATED:
+            return self.send_json(404, {"error": "Not a paginated UTS endpoint"})
+        answer = self.call_proxy(lambda: proxy.iter_pages(path, query))
+        if answer is None:
+            return
+        status, pages = answer
+        if status != 200:
+            return self.send_body(status, pages.encode('utf-8'))
+
+        self.start_stream("application/x-ndjson")
+        with self.trace.stage("stream"):
+            for page in pages:
+                self.write_chunk(json.dumps(page) + "\n")
+        self.write_chunk("")
+
+    def send_body(self, status, body, cache_result=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if cache_result:
+            self.send_header("X-Cache", cache_result)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# Start the proxy (see serving.py for --mode, --workers and --backlog). Set
+# UMLS_API_KEY first; UMLS_CACHE_PATH shares cached responses across workers
+# and restarts.
+if __name__ == "__main__":
+    serving.main(UmlsProxyHandler, PORT)